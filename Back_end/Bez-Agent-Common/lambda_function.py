@@ -16,12 +16,21 @@ ROUTE_MAP = {
     "/chat_history": {"GET": "bez_agent_history._chat_history"},
     "/agent_response": {"GET": "bez_agent_response._agent_response"},
     "/agent_response_status": {"GET": "bez_agent_response._agent_response_status"},
-    "/retrieve_chat": {"GET": "bez_agent_history._retrieve_chat"}
+    "/retrieve_chat": {"GET": "bez_agent_history._retrieve_chat"},
+    "/chat_updates": {"GET": "bez_agent_history._chat_updates"}
 }
 
 FUNCTION_MAP = {
     "_update_sfunc_status_in_ddb": "bez_agent_response._update_agent_status",
-    "_error_handler": "bez_agent_errorhandler._error_handler"
+    "_error_handler": "bez_agent_errorhandler._error_handler",
+    "_backfill_chat_owner": "bez_backfill_jobs._backfill_chat_owner",
+    "_backfill_starred_owner": "bez_backfill_jobs._backfill_starred_owner",
+    "_backfill_message_root": "bez_backfill_jobs._backfill_message_root",
+    "_process_theme_records": "bez_chat_theme_worker._process_theme_records",
+    "_backfill_ttl": "bez_backfill_jobs._backfill_ttl",
+    "_archive_chats": "bez_backfill_jobs._archive_chats",
+    "_offload_ai_responses": "bez_backfill_jobs._offload_ai_responses",
+    "_backfill_answer": "bez_backfill_jobs._backfill_answer"
 }
 
 # Standard CORS headers for all responses
@@ -67,6 +76,9 @@ def lambda_handler(event, context):
         path = event.get("resource")
         method = event.get("httpMethod")
         function = event.get("function")
+        if not path and not function and event.get("Records"):
+            # SQS deliveries from the chat theme queue
+            function = "_process_theme_records"
         handler_func = _get_handler_function(path, method, function, event)
         if handler_func:
             response = handler_func(event)
@@ -14,5 +14,5 @@ def _error_handler(event):
     object_key = f'{event["integration_id"]}/{event["agent_int_uid"]}/chat_history/{event["message_id"]}'
     ai_response = json.dumps({"statusCode": 400, "body": json.dumps(event["error"])})
     _write_s3(BUCKET_NAME,object_key,ai_response)
-    _update_msg_output(event["message_id"], ai_response)
+    _update_msg_output(event["message_id"], ai_response, stored={"bucket": BUCKET_NAME, "key": object_key})
     raise Exception(f"Error Handler: {event["error"]}")
@@ -2,36 +2,119 @@ import json, logging
 from datetime import datetime, timedelta, timezone
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _check_user_agent_access
-from bez_utility.bez_metadata_chats import _get_chats_by_userid_by_agent, _check_user_chat_access, _get_chat_by_chatid
-from bez_utility.bez_metadata_messages import _get_messages, _get_msg_by_msgid
+from bez_utility.bez_metadata_chats import _get_chats_by_userid_by_agent, _get_chats_page_by_userid_by_agent
+from bez_utility.bez_metadata_messages import _get_messages, _iter_conversation_messages, _get_conversation_page, _get_conversation_delta, _initial_watermark
+from bez_utility.bez_metadata_archive import _get_archived_chats, _get_archived_conversation, _get_archived_lineage_messages
+from bez_utility.bez_message_bodies import _resolve_message_bodies, _resolve_param
+from bez_utility.bez_request_context import RequestContext
+from bez_utility.bez_utils_aws import _decode_cursor
+from bez_utility.bez_utils_common import _json_default
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+MAX_PAGE_LIMIT = 500
+# created_at is a 10 digit epoch-seconds string and is compared as a string, so bounds must be 10 digits too
+MIN_EPOCH_SECONDS, MAX_EPOCH_SECONDS = 10 ** 9, 10 ** 10 - 1
+# next_token of a history page served from the chat archive: "archive.<created_at>.<chat_id>" of the last chat sent
+ARCHIVE_TOKEN_PREFIX = "archive."
+
+def _page_params(params):
+    """limit, before, after (epoch seconds, exclusive) and next_token from the query string."""
+    try:
+        limit = int(params["limit"]) if params.get("limit") else None
+        before = int(params["before"]) if params.get("before") else None
+        after = int(params["after"]) if params.get("after") else None
+    except ValueError:
+        raise Exception("Function Error: limit, before and after must be whole numbers.")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise Exception(f"Function Error: limit must be between 1 and {MAX_PAGE_LIMIT}.")
+    for bound in (before, after):
+        if bound is not None and not MIN_EPOCH_SECONDS <= bound <= MAX_EPOCH_SECONDS:
+            raise Exception(f"Function Error: before and after must be epoch seconds between {MIN_EPOCH_SECONDS} and {MAX_EPOCH_SECONDS}.")
+    return limit, before, after, params.get("next_token")
+
+def _window(messages, before, after, limit):
+    """In-memory counterpart of the ranged queries for messages already sorted oldest first."""
+    messages = [msg for msg in messages
+                if (before is None or int(msg["created_at"]) < before) and (after is None or int(msg["created_at"]) > after)]
+    return messages[-limit:] if limit else messages
+
+def _archived_page(messages, before, after, limit, boundary=None):
+    """Newest limit archived messages (oldest first) older than boundary, the (created_at, message_id) of the
+    oldest message already sent, and the next_token to continue from when older ones remain."""
+    messages = [msg for msg in _window(messages, before, after, None)
+                if boundary is None or (int(msg["created_at"]), msg["message_id"]) < boundary]
+    page = messages[-limit:] if limit else messages
+    if not limit or len(messages) <= limit:
+        return page, None
+    return page, f"{ARCHIVE_TOKEN_PREFIX}{page[0]['created_at']}.{page[0]['message_id']}"
+
+def _older_archived_chats(user_id, agent_int_uid, before, after, boundary):
+    """Archived chats with a theme that sort after boundary, the (created_at, chat_id) of the oldest chat
+    already sent. Archived chats that have not expired yet are still served from DynamoDB, so they never
+    sort after it."""
+    return [chat for chat in _get_archived_chats(user_id, agent_int_uid, before, after)
+            if chat.get("chat_theme") and (boundary is None or (int(chat["created_at"]), chat["chat_id"]) < boundary)]
+
 def _chat_history(event):
     try:
         logger.info(f'Received event: {event}')
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         agent_int_uid = event.get('queryStringParameters').get('agent_int_uid', None)
         if not user_id:
             return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
         if not agent_int_uid:
             return {"statusCode": 400, "body": "Please select an agent to continue."}
-        user_access = _check_user_agent_access(user_id, agent_int_uid)
-        chats = _get_chats_by_userid_by_agent(user_id, agent_int_uid)
-        chats = sorted(chats, key=lambda x: int(x["created_at"]), reverse=True)
+        user_access = ctx.check_agent_access(agent_int_uid)
+        limit, before, after, next_token = _page_params(event.get('queryStringParameters') or {})
         now = datetime.now(timezone.utc)
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         yesterday_start = today_start - timedelta(days=1)
         last_week_start = today_start - timedelta(days=7)
         last_30_days_start = now - timedelta(days=30)
+        projection = ["chat_id", "created_at", "chat_theme"]
+        if limit:
+            if next_token and next_token.startswith(ARCHIVE_TOKEN_PREFIX):
+                # DynamoDB was exhausted on an earlier page; continue in the archive
+                created_at, chat_id = next_token[len(ARCHIVE_TOKEN_PREFIX):].split(".", 1)
+                chats, next_token, boundary = [], None, (int(created_at), chat_id)
+            else:
+                # One page, newest first; chats without a theme yet are not shown, so they do not use up the page
+                cursor = _decode_cursor(next_token)
+                page = _get_chats_page_by_userid_by_agent(user_id, agent_int_uid, limit, next_token, projection,
+                                                          before, after, item_filter=lambda chat: chat.get("chat_theme"))
+                chats, next_token = page["items"], page["next_token"]
+                oldest = chats[-1] if chats else cursor
+                boundary = (int(oldest["created_at"]), oldest["chat_id"]) if oldest else None
+            if not next_token:
+                # Older than anything DynamoDB still holds: fill the page from the archive
+                archived = _older_archived_chats(user_id, agent_int_uid, before, after, boundary)
+                room = limit - len(chats)
+                chats += archived[:room]
+                if len(archived) > room:
+                    last = chats[-1]
+                    next_token = f"{ARCHIVE_TOKEN_PREFIX}{last['created_at']}.{last['chat_id']}"
+        else:
+            explicit_window = before is not None or after is not None
+            if not explicit_window:
+                # Only as far back as the oldest bucket shown
+                after = int(last_30_days_start.timestamp()) - 1
+            chats = _get_chats_by_userid_by_agent(user_id, agent_int_uid, projection, before, after)
+            if explicit_window:
+                # Older history was asked for: add what has moved to the archive
+                themed = [chat for chat in chats if chat.get("chat_theme")]
+                boundary = (int(themed[-1]["created_at"]), themed[-1]["chat_id"]) if themed else None
+                chats += _older_archived_chats(user_id, agent_int_uid, before, after, boundary)
+            next_token = None
         categorized_chats = {
             "today": [],
             "yesterday": [],
             "previous_7_days": [],
-            "previous_30_days": []
+            "previous_30_days": [],
+            "older": []
             }
         chat_history = []
         for chat in chats:
@@ -52,9 +135,11 @@ def _chat_history(event):
                     categorized_chats["previous_7_days"].append(chat_data)
                 elif created_at >= last_30_days_start:
                     categorized_chats["previous_30_days"].append(chat_data)
+                else:
+                    categorized_chats["older"].append(chat_data)
         return {
             'statusCode': 200,
-            'body': json.dumps({'chat_history': categorized_chats})}
+            'body': json.dumps({'chat_history': categorized_chats, 'next_token': next_token}, default=_json_default)}
     except Exception as e:
         if "Function Error:" in str(e):
             return {"statusCode": 400, "body": json.dumps({"error": str(e)[len("Function Error: "):]})}
@@ -65,49 +150,120 @@ def _chat_history(event):
 def _retrieve_chat(event):
     try:
         logger.info(f'Received event: {event}')
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         agent_int_uid = event.get('queryStringParameters').get('agent_int_uid', None)
         if not user_id:
             return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
         if not agent_int_uid:
             return {"statusCode": 400, "body": "Please select an agent to continue."}
-        user_access = _check_user_agent_access(user_id, agent_int_uid)
+        user_access = ctx.check_agent_access(agent_int_uid)
         chat_id = event['queryStringParameters'].get('chat_id', None)
         from_star = event['queryStringParameters'].get('from_star', False)
         message_id = event['queryStringParameters'].get('message_id', None)
         if message_id:
-            message = _get_msg_by_msgid(message_id)
+            message = ctx.get_message(message_id, ["chat_id", "created_at"])
             chat_id = message["chat_id"]
         if not chat_id:
             return {"statusCode": 400, "body": "Please select a chat to continue."}
-        chat_access = _check_user_chat_access(user_id, chat_id)
-        has_historical_chat = True
-        current_chat_id = chat_id
-        all_messages = []
-        next_chat_start = 9999999999999
-        while has_historical_chat:
-            messages = _get_messages(current_chat_id)
-            logger.info(messages)
-            if messages:
-                for msg in messages:
+        limit, before, after, next_token = _page_params(event['queryStringParameters'])
+        # Taken before reading, so anything written from here on comes back from /chat_updates
+        watermark = _initial_watermark()
+        if from_star:
+            # Up to and including the starred message
+            star_bound = int(message["created_at"]) + 1
+            before = star_bound if before is None else min(before, star_bound)
+        boundary = None
+        if limit and next_token and next_token.startswith(ARCHIVE_TOKEN_PREFIX):
+            # DynamoDB was exhausted on an earlier page; continue in the archive
+            created_at, last_message_id = next_token[len(ARCHIVE_TOKEN_PREFIX):].split(".", 1)
+            boundary = (int(created_at), last_message_id)
+        try:
+            chat = ctx.check_chat_access(chat_id)
+        except IndexError:
+            chat = None
+        if chat is None:
+            # Expired from DynamoDB. The archive is keyed by the caller's user id, so finding it there
+            # is the access check.
+            chat, archived_messages = _get_archived_conversation(user_id, agent_int_uid, chat_id)
+            if not chat:
+                raise Exception("Function Error: This chat is no longer available.")
+            all_messages, next_token = _archived_page(archived_messages, before, after, limit, boundary)
+        elif chat.get("root_chat_id") or not chat.get("hist_chat_id"):
+            # A single ranged query: the chat's own messages, or the whole restored lineage from the root index
+            if boundary:
+                all_messages, next_token = [], None
+            elif limit:
+                page = _get_conversation_page(chat, limit, next_token, before, after)
+                all_messages, next_token = page["items"], page["next_token"]
+            else:
+                all_messages = list(_iter_conversation_messages(chat, before, after))
+            if chat.get("lineage") and not next_token and (not limit or len(all_messages) < limit):
+                # Reached the start of what DynamoDB holds: ancestors may continue in the archive. Chats
+                # still in DynamoDB are skipped, so nothing already sent comes back.
+                hot_chat_ids = {msg["chat_id"] for msg in all_messages}
+                if all_messages:
+                    first = all_messages[0]
+                    boundary = (int(first["created_at"]), first["message_id"])
+                older, next_token = _archived_page(
+                    _get_archived_lineage_messages(user_id, agent_int_uid, chat, hot_chat_ids),
+                    before, after, limit - len(all_messages) if limit else None, boundary)
+                all_messages = older + all_messages
+        else:
+            # Restored before lineages were recorded: walk hist_chat_id one link at a time and
+            # window in memory. No next_token; older pages are fetched with before.
+            all_messages = []
+            current_chat_id = chat_id
+            next_chat_start = 9999999999999
+            while current_chat_id:
+                for msg in _get_messages(current_chat_id):
                     if int(msg["created_at"]) <= int(next_chat_start):
                         all_messages.append(msg)
-            chat = _get_chat_by_chatid(current_chat_id)
-            if chat.get("hist_chat_id"):
+                chat = ctx.get_chat(current_chat_id)
                 current_chat_id = chat.get("hist_chat_id")
                 next_chat_start = chat.get("created_at")
-                has_historical_chat = True
-            else:
-                has_historical_chat = False
-        if from_star:
-            star_time = message["created_at"]
-            all_messages = [msg for msg in all_messages if msg["created_at"] <=  star_time]
-        all_messages.sort(key=lambda msg: int(msg["created_at"]))
+            all_messages.sort(key=lambda msg: int(msg["created_at"]))
+            all_messages = _window(all_messages, before, after, limit)
+            next_token = None
+        # Responses stored in S3 come back as ai_response_ref unless the client asks for them
+        resolve_bodies, body_ids = _resolve_param(event['queryStringParameters'].get('resolve_bodies'))
+        if resolve_bodies:
+            _resolve_message_bodies(all_messages, body_ids)
         logger.info(f"All messages: {all_messages}")
-        return {"statusCode": 200, "body": json.dumps({"data": all_messages})}
+        result = {"data": all_messages, "watermark": watermark}
+        if limit:
+            result["next_token"] = next_token
+        return {"statusCode": 200, "body": json.dumps(result, default=_json_default)}
     except Exception as e:
         if "Function Error:" in str(e):
             return {"statusCode": 400, "body": json.dumps({"error": str(e)[len("Function Error: "):]})}
         else:
             logger.error(f"Error fetching agent info: {str(e)}", exc_info=True)
-            return {"statusCode": 500, "body": json.dumps({"error": f"Error fetching agent info: {str(e)}"})}
\ No newline at end of file
+            return {"statusCode": 500, "body": json.dumps({"error": f"Error fetching agent info: {str(e)}"})}
+
+def _chat_updates(event):
+    try:
+        logger.info(f'Received event: {event}')
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
+        params = event.get('queryStringParameters') or {}
+        agent_int_uid = params.get('agent_int_uid', None)
+        if not user_id:
+            return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
+        if not agent_int_uid:
+            return {"statusCode": 400, "body": "Please select an agent to continue."}
+        chat_id = params.get('chat_id', None)
+        if not chat_id:
+            return {"statusCode": 400, "body": "Please select a chat to continue."}
+        user_access = ctx.check_agent_access(agent_int_uid)
+        chat = ctx.check_chat_access(chat_id)
+        # New messages and status/response changes since the watermark from /retrieve_chat or the last call
+        resolve_bodies, body_ids = _resolve_param(params.get('resolve_bodies'))
+        delta = _get_conversation_delta(chat, params.get('watermark'), resolve_bodies=resolve_bodies, body_ids=body_ids)
+        return {"statusCode": 200, "body": json.dumps(delta, separators=(",", ":"), default=_json_default)}
+    except Exception as e:
+        if "Function Error:" in str(e):
+            return {"statusCode": 400, "body": json.dumps({"error": str(e)[len("Function Error: "):]})}
+        else:
+            logger.error(f"Error fetching chat updates: {str(e)}", exc_info=True)
+            return {"statusCode": 500, "body": json.dumps({"error": f"Error fetching chat updates: {str(e)}"})}
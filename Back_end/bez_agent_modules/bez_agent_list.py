@@ -1,10 +1,10 @@
 import json, logging
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _get_agent_privileges_by_user, _get_details_for_agentintuid, _get_agent_details_by_status
+from bez_utility.bez_metadata_agents import _get_agent_privileges_by_user, _get_details_for_agentintuids, _get_agent_details_by_status
 from bez_utility.bez_utils_aws import _get_presigned_url
-from bez_utility.bez_metadata_int import _get_int_by_intid
-from bez_utility.bez_metadata_clients import _get_client_by_clientid
+from bez_utility.bez_metadata_int import _get_ints_by_intids
+from bez_utility.bez_metadata_clients import _get_clients_by_clientids
 
 # Configure logging
 logger = logging.getLogger()
@@ -63,22 +63,24 @@ def _agent_hired_list(event, sort_by):
         if not agent_privileges:
             return {"statusCode": 400, "body": json.dumps({"error":"No agents are currently assigned to this user"})}
         
+        active_uids = [privilege.get("agent_int_uid") for privilege in agent_privileges
+                       if privilege.get("is_active", True) and not privilege.get("is_deleted", False)]
+        # Resolve agents, then their integrations, then their clients in batched reads
+        agent_details_by_uid = _get_details_for_agentintuids(active_uids)
+        integrations = _get_ints_by_intids({details.get("int_id") for details in agent_details_by_uid.values()})
+        clients = _get_clients_by_clientids({integration.get("client_id") for integration in integrations.values()},
+                                            ["client_name"])
         agent = []
-        for privilege in agent_privileges:
-            agent_int_uid = privilege.get("agent_int_uid")
+        for agent_int_uid in active_uids:
             try:
-                agent_details = _get_details_for_agentintuid(agent_int_uid)
-                logger.info(f"Agent details: {agent_details}")
-                print(f"Agent details: {agent_details}")
-
-                is_active = privilege.get("is_active", True)
-                is_deleted = privilege.get("is_deleted", False)
-
-                if not (is_active and not is_deleted):
+                agent_details = agent_details_by_uid.get(str(agent_int_uid))
+                if not agent_details:
+                    logger.warning(f"Skipping agent_int_uid {agent_int_uid}: agent not found")
                     continue
+                logger.info(f"Agent details: {agent_details}")
 
                 integration_id = agent_details.get("int_id")
-                integration = _get_int_by_intid(integration_id)
+                integration = integrations.get(integration_id)
 
                 if not integration:
                     logger.warning(f"Skipping agent_int_uid {agent_int_uid} due to missing integration for int_id {integration_id}")
@@ -89,7 +91,7 @@ def _agent_hired_list(event, sort_by):
 
                 client_id = integration.get("client_id")
                 if client_id:
-                    client = _get_client_by_clientid(client_id)
+                    client = clients.get(client_id)
                     if not client:
                         logger.warning(f"Client not found for client_id {client_id}, skipping agent_int_uid {agent_int_uid}")
                         continue
@@ -97,8 +99,6 @@ def _agent_hired_list(event, sort_by):
                 else:
                     client_name = "Unknown"
 
-                print(f"Integration: {client_id}, client: {client}")
-
                 agent.append({
                     "agent_int_uid": agent_details["agent_int_uid"],
                     "agent_id": agent_details["agent_int_uid"][:3],
@@ -1,7 +1,7 @@
 import logging, json
-import boto3
 
-dynamodb = boto3.resource('dynamodb')
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
+dynamodb = _get_dynamodb_resource()
 agent_privileges_table = dynamodb.Table('agent_privileges')
 agent_list = dynamodb.Table('agent_list')
 
@@ -1,10 +1,9 @@
 import json, logging
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _check_user_agent_access
 from bez_utility.bez_utils_aws import _get_presigned_url
-from bez_utility.bez_metadata_chats import _check_user_chat_access
-from bez_utility.bez_metadata_messages import _update_msg_status, _get_msg_by_msgid
+from bez_utility.bez_metadata_messages import _update_msg_status
+from bez_utility.bez_request_context import RequestContext
 BUCKET_NAME = "bez"
 
 # Configure logging
@@ -27,17 +26,18 @@ def _update_agent_status(event):
 def _agent_response_status(event):
     try:
         logger.info(f'Received event: {event}')
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         if not user_id:
             return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
         agent_int_uid = event['queryStringParameters'].get('agent_int_uid', None)
         if not agent_int_uid:
             return {"statusCode": 400, "body": json.dumps({"error": "Agent selection is required to proceed. Please select an agent to continue."})}
-        user_access = _check_user_agent_access(user_id, agent_int_uid)
+        user_access = ctx.check_agent_access(agent_int_uid)
         message_id = event['queryStringParameters'].get('message_id', None)
         if not message_id:
             return {"statusCode": 400, "body": json.dumps({"error": "Please select a message and try again."})}
-        message = _get_msg_by_msgid(message_id)
+        message = ctx.get_message(message_id, ["status"])
         msg_status = message['status']
         return {"statusCode": 200, "body": json.dumps({"status": msg_status})}
     except Exception as e:
@@ -47,19 +47,20 @@ def _agent_response_status(event):
 def _agent_response(event):
     try:
         logger.info(f'Received event: {event}')
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         if not user_id:
             return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
         agent_int_uid = event['queryStringParameters'].get('agent_int_uid', None)
         if not agent_int_uid:
             return {"statusCode": 400, "body": json.dumps({"error": "Agent selection is required to proceed. Please select an agent to continue."})}
-        user_access = _check_user_agent_access(user_id, agent_int_uid)
+        user_access = ctx.check_agent_access(agent_int_uid)
         chat_id = event['queryStringParameters'].get('chat_id', None)
-        chat_access = _check_user_chat_access(user_id, chat_id)
+        chat_access = ctx.check_chat_access(chat_id)
         message_id = event['queryStringParameters'].get('message_id', None)
         if not message_id:
             return {"statusCode": 400, "body": json.dumps({"error": "Please select a message and try again."})}
-        message = _get_msg_by_msgid(message_id)
+        message = ctx.get_message(message_id, ["chat_id", "status"])
         if message["chat_id"] != chat_id:
             return {"statusCode": 400, "body": json.dumps({"error": "User does not have access to this response."})}
         env = event.get("headers", {}).get("env", None)
@@ -5,7 +5,7 @@ from bez_utility.bez_metadata_agents import _get_details_for_agentintuid, _check
 from bez_utility.bez_metadata_users import _get_user_by_id
 from bez_utility.bez_utils_bedrock import _get_ai_response
 from bez_utility.bez_metadata_chats import _create_chat
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_utils_cache import _get_reference_record
 
 # Configure logging
 logger = logging.getLogger()
@@ -30,7 +30,7 @@ def _agent_welcome(event):
         logger.info(f"User: {user}")
         agent_persona = _get_details_for_agentintuid(agent_int_uid)
         agent_id = agent_int_uid[:3]
-        agent_record = _get_record_from_table({
+        agent_record = _get_reference_record({
             "table_name": "agent_list",
             "keys": {"agent_id": agent_id},
             "gsi_name": ""
@@ -57,6 +57,7 @@ def _agent_welcome(event):
         # Create chat session
         chat_id = _create_chat({
             "expiry_in_days": 7,
+            "user_id": user_id,
             "agent_int_uid": agent_int_uid,
             "session_id": session_id
         })
@@ -0,0 +1,58 @@
+import json, logging
+
+# import from bez resources
+from bez_utility.bez_metadata_chats import _backfill_chat_owners
+from bez_utility.bez_metadata_messages import _backfill_starred_owners, _backfill_message_roots, _offload_large_responses, _backfill_answers
+from bez_utility.bez_metadata_archive import _backfill_numeric_ttl, _archive_cold_chats
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Each job handles one batch per invocation. Invoke it with {"function": "<job name>"} and re-invoke
+# with the returned resume_key until done is true. Jobs are safe to re-run: records already
+# backfilled are skipped. To fan a job out over a large table, start total_segments chains, each
+# with {"segment": i, "total_segments": n} and its own resume_key.
+
+TTL_TABLE_KEYS = {"chat_details": ["chat_id"], "message_details": ["message_id"]}
+
+def _run_backfill(event, backfill, **options):
+    try:
+        logger.info(f'Received event: {event}')
+        result = backfill(dict(options, resume_key=event.get("resume_key"), max_pages=event.get("max_pages"),
+                               segment=event.get("segment"), total_segments=event.get("total_segments")))
+        result["done"] = result["resume_key"] is None
+        return {"statusCode": 200, "body": json.dumps(result)}
+    except Exception as e:
+        logger.error(f"Error running {backfill.__name__}: {str(e)}", exc_info=True)
+        raise e
+
+def _backfill_chat_owner(event):
+    return _run_backfill(event, _backfill_chat_owners)
+
+def _backfill_starred_owner(event):
+    # Run after _backfill_chat_owner so owners resolve from chat_details without session reads
+    return _run_backfill(event, _backfill_starred_owners)
+
+def _backfill_message_root(event):
+    return _run_backfill(event, _backfill_message_roots)
+
+def _backfill_ttl(event):
+    # {"table_name": "chat_details" | "message_details"}
+    table_name = event.get("table_name")
+    if table_name not in TTL_TABLE_KEYS:
+        raise ValueError(f"table_name must be one of {sorted(TTL_TABLE_KEYS)}")
+    return _run_backfill(event, _backfill_numeric_ttl, table_name=table_name, key_names=TTL_TABLE_KEYS[table_name])
+
+def _archive_chats(event):
+    # Scheduled daily; run _backfill_ttl on chat_details first so string ttls are seen. Not segmented:
+    # manifests are read, appended and written back, so only one instance may run
+    if int(event.get("total_segments") or 1) > 1:
+        raise ValueError("_archive_chats runs as a single scan; total_segments is not supported")
+    return _run_backfill(event, _archive_cold_chats)
+
+def _offload_ai_responses(event):
+    return _run_backfill(event, _offload_large_responses)
+
+def _backfill_answer(event):
+    return _run_backfill(event, _backfill_answers)
@@ -0,0 +1,24 @@
+import json, logging
+
+# import from bez resources
+from bez_utility.bez_metadata_chats import _generate_chat_theme
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+def _process_theme_records(event):
+    """SQS batch handler for the chat theme queue.
+
+    Failed records are reported through batchItemFailures so only they are retried.
+    """
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            body = json.loads(record["body"])
+            chat_theme = _generate_chat_theme(body["chat_id"], body["theme_request_id"])
+            logger.info(f"Chat theme for {body['chat_id']}: {chat_theme}")
+        except Exception as e:
+            logger.error(f"Error generating chat theme: {str(e)}", exc_info=True)
+            failures.append({"itemIdentifier": record.get("messageId")})
+    return {"batchItemFailures": failures}
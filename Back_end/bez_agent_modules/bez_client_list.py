@@ -1,8 +1,7 @@
 import json, logging
 
 # import from bez resources
-from bez_utility.bez_metadata_clients import _active_clients_by_userid
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_metadata_clients import _active_clients_by_userid, _get_clients_by_clientids
 
 # Configure logging
 logger = logging.getLogger()
@@ -22,11 +21,11 @@ def _client_list(event):
                 "statusCode": 200,
                 "body": json.dumps({"message": "No active clients found", "clients": []})
             }
-        # Fetch client names one by one from clients table
+        # Fetch client names from clients table in batches
+        clients = _get_clients_by_clientids(client_ids, ["client_name"])
         clients_data = []
         for client_id in client_ids:
-            client_response = _get_record_from_table({"table_name": "clients", "keys": {"client_id": client_id}, "gsi_name": ""})
-            logger.info(f"Client response: {client_response}")
+            client_response = clients.get(client_id)
             if client_response:
                 clients_data.append({
                     "client_id": client_id,
@@ -1,7 +1,7 @@
 import json, logging, os
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _get_agent_details, _create_agent_ai_name, _get_agent_int_uid, _create_record_agent_by_int, _get_agent_privilege_id, _create_agent_privilege_record, _save_mda_default_sections, _save_agent_pic
+from bez_utility.bez_metadata_agents import _get_agent_details, _create_agent_ai_name, _get_agent_int_uid, _agent_by_int_item, _agent_privilege_item, _mda_default_section_items, _provision_agent, _save_agent_pic
 from bez_utility.bez_metadata_clients import _check_user_client_access
 from bez_utility.bez_metadata_int import _get_int_by_intid, _check_user_access
 from bez_utility.bez_utils_bedrock import _generate_avatar_prompt
@@ -58,11 +58,11 @@ def _create_agent_profile(event):
         presigned_url = None
         if s3_path:
             presigned_url = _get_presigned_url(bucket_name, s3_path, 3600)
-        _create_record_agent_by_int(int_id, agent_int_uid, agent_name, agent_data["agent_type"], agent_data["skillset"], agent_data["welcome_prompt"], s3_path)
-        agent_privilege_id = _get_agent_privilege_id()
-        _create_agent_privilege_record(agent_privilege_id, agent_int_uid, agent_data["agent_persona"], user_id, '')
-        if agent_id == "001":
-             _save_mda_default_sections(agent_int_uid)
+        section_items = _mda_default_section_items(agent_int_uid) if agent_id == "001" else []
+        _provision_agent(
+            _agent_by_int_item(int_id, agent_int_uid, agent_name, agent_data["agent_type"], agent_data["skillset"], agent_data["welcome_prompt"], s3_path),
+            _agent_privilege_item(agent_int_uid, agent_data["agent_persona"], user_id, ''),
+            section_items)
         return {"statusCode": 200,
                 "body": json.dumps({"message": "Agent details saved successfully.",
                                 "agent_int_uid": agent_int_uid,
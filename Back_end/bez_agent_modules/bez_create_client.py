@@ -1,7 +1,7 @@
 import json, logging
 
 # import from bez resources
-from bez_utility.bez_metadata_clients import _get_client_id, _check_client_name_exists, _create_client_table_record, _create_client_privileges
+from bez_utility.bez_metadata_clients import _check_client_name_exists, _create_client_table_record, _create_client_privileges
 from bez_utility.bez_validation import PayloadValidator
 # Configure logging
 logger = logging.getLogger()
@@ -31,8 +31,7 @@ def _create_client(event):
                     "body": json.dumps({"error": "This client already exists. If you need access to this client's data, please contact client admin or Bez admin. Else, please proceed by creating another client."})
                     }
         else:
-            client_id = _get_client_id()
-            _create_client_table_record(client_id, client_name, user_id)
+            client_id = _create_client_table_record(client_name, user_id)
             _create_client_privileges(client_id, user_id)
             result = {"client_id": client_id, "client_name": client_name}
             return {"statusCode": 200, "body": json.dumps(result)}
@@ -1,7 +1,7 @@
 import json, logging
 
 # import from bez resources
-from bez_utility.bez_metadata_int import _get_int_list_by_clientid, _get_int_id, _create_int_table_record, _create_int_privileges
+from bez_utility.bez_metadata_int import _get_int_list_by_clientid, _create_int_table_record, _create_int_privileges
 from bez_utility.bez_validation import PayloadValidator
 from bez_utility.bez_metadata_clients import _check_user_client_access, _check_client_id_exists
 
@@ -42,8 +42,7 @@ def _create_int(event):
         int_name_exists = any(item.get("integration_name").lower() == integration_name.lower() for item in integrations_list)
         if int_name_exists:
             return {"statusCode": 400, "body": json.dumps({"error":"The selected integration name already exists. Please try with a unique name."})}
-        int_id = _get_int_id()
-        _create_int_table_record(int_id, client_id, erp_name, integration_name, user_id)
+        int_id = _create_int_table_record(client_id, erp_name, integration_name, user_id)
         _create_int_privileges(int_id, client_id, user_id)
         result = {"integration_id": int_id, "integration_name": integration_name}
         return {"statusCode": 200, "body": json.dumps(result)}
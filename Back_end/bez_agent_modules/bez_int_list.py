@@ -2,8 +2,8 @@ import json, logging
 
 # import from bez resources
 from bez_utility.bez_utils_aws import _get_record_from_table
-from bez_utility.bez_metadata_int import _get_int_by_clientid, _get_int_by_userid
-from bez_utility.bez_metadata_clients import _check_user_client_access,_check_client_id_exists, _active_clients_by_userid
+from bez_utility.bez_metadata_int import _get_int_by_clientid, _get_int_privileges_for_user
+from bez_utility.bez_metadata_clients import _check_user_client_access, _active_clients_by_userid
 
 # Configure logging
 logger = logging.getLogger()
@@ -25,8 +25,7 @@ def _int_list_by_client(event):
             erp_name = "quickbooks"
         else:
             erp_name = erp
-        client_exists = _check_client_id_exists(client_id)
-        if not client_exists:
+        if not client:
             return {"statusCode": 400, "body": json.dumps({"error":"The selected client does not exist. Please select a different client and try again."})}        
         has_access = _check_user_client_access(user_id, client_id)
         if not has_access:
@@ -36,11 +35,11 @@ def _int_list_by_client(event):
         logger.info(f"integrations: {integrations}")
         #Check permissions of the user on the integrations 
         integrations_data = [] 
-        if integrations: 
+        if integrations:
+            int_privileges = _get_int_privileges_for_user(user_id, [(integration["integration_id"], client_id) for integration in integrations])
             for integration in integrations:
-                include_integration = _get_int_by_userid(user_id, integration["integration_id"])                                                                        
-                selected_integrations = include_integration.get('Items', [])
-                if selected_integrations:
+                privilege = int_privileges.get(f'{integration["integration_id"]}-{client_id}-{user_id}')
+                if privilege and privilege.get("is_active") and not privilege.get("is_deleted"):
                     integrations_data.append({
                     "integration_id": integration["integration_id"],
                     "integration_name": integration["integration_name"]
@@ -1,7 +1,7 @@
 import json, logging, os
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _get_agent_details, _get_agent_int_uid, _create_agent_by_int_table_record, _get_agent_privilege_id, _create_agent_privilege_record, _get_clean_folder_name, _save_agent_pic
+from bez_utility.bez_metadata_agents import _get_agent_details, _get_agent_int_uid, _agent_by_int_item, _agent_privilege_item, _provision_agent, _get_clean_folder_name, _save_agent_pic
 from bez_utility.bez_metadata_clients import _check_user_client_access
 from bez_utility.bez_metadata_int import _get_int_by_intid, _check_user_access
 from bez_utility.bez_validation import PayloadValidator
@@ -67,9 +67,10 @@ def _save_agent_profile(event):
         cleaned_agent_type  = _get_clean_folder_name(agent_type)
         image_data  = event_body.get('agent_pic')
         profile_pic = _save_agent_pic(image_data, agent_name, agent_int_uid, env, agent_type)
-        _create_agent_by_int_table_record(int_id, agent_int_uid, agent_age, agent_gender, agent_name, agent_type, example_welcome_prompt, skillset, welcome_prompt, profile_pic)
-        agent_privilege_id = _get_agent_privilege_id()
-        _create_agent_privilege_record(agent_privilege_id, agent_int_uid, user_id)
+        _provision_agent(
+            _agent_by_int_item(int_id, agent_int_uid, agent_name, agent_type, skillset, welcome_prompt, profile_pic,
+                               agent_age=agent_age, agent_gender=agent_gender, example_welcome_prompt=example_welcome_prompt),
+            _agent_privilege_item(agent_int_uid, agent_data.get("agent_persona"), user_id))
         return {
             "statusCode": 200,
             "body": json.dumps({
@@ -2,7 +2,7 @@ import json, logging
 
 # import from bez resources
 from bez_utility.bez_metadata_users import _get_user_by_id
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_utils_cache import _get_reference_record
 from bez_utility.bez_utils_bedrock import _get_ai_response
 
 # Configure logging
@@ -25,9 +25,9 @@ def _setup_welcome(event):
         user = _get_user_by_id({"user_id": user_id})
         first_name = user.get("first_name", "User")
         logger.info(f"First name: {first_name}") 
-        admin_agent = _get_record_from_table({"table_name": "agent_list", "keys": {"agent_id": "admin"}, "gsi_name": ""})
+        admin_agent = _get_reference_record({"table_name": "agent_list", "keys": {"agent_id": "admin"}, "gsi_name": ""})
         admin_welcome_prompt = admin_agent.get("welcome_prompt", "").replace("{first_name}", first_name)
-        agent = _get_record_from_table({"table_name": "agent_list", "keys": {"agent_id": agent_id}, "gsi_name": ""})
+        agent = _get_reference_record({"table_name": "agent_list", "keys": {"agent_id": agent_id}, "gsi_name": ""})
         system_prompt = admin_welcome_prompt + "/n Don't leave additional spaces in the response."
         ai_response = _get_ai_response({"prompt": system_prompt})
         logger.info(f"Admin prompt: {ai_response}")
@@ -1,10 +1,13 @@
-import json, logging, boto3
+import json, logging
+
+# import from bez resources
+from bez_utility.bez_utils_backend import _get_s3_client
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client('s3')
+s3_client = _get_s3_client()
 
 
 def _get_doc(event):
@@ -1,9 +1,11 @@
 import json, logging, os
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _check_user_agent_access, _get_details_for_agentintuid
-from bez_utility.bez_metadata_chats import _check_user_chat_access
+from bez_utility.bez_metadata_agents import _get_details_for_agentintuid
+from bez_utility.bez_request_context import RequestContext
 from bez_utility.bez_metadata_messages import _get_messages
+from bez_utility.bez_message_bodies import _resolve_message_bodies
+from bez_utility.bez_answer_format import _normalize_answer
 from bez_utility.bez_metadata_users import _get_user_by_id
 from bez_utility.bez_utils_pdf import _convert_to_pdf
 from bez_utility.bez_utils_aws import _write_s3, _get_presigned_url
@@ -16,47 +18,27 @@ BUCKET_NAME = "bez"
 def _download_chat(event):
     try:
         logger.info(f"Received event: {event}")
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         env = event.get("headers", {}).get("env", None)
         if not user_id:
             return {"statusCode": 400, "body": "User Id is a required field. Please re-login to try again."}
         agent_int_uid = event['queryStringParameters'].get('agent_int_uid', None)
-        _check_user_agent_access(user_id, agent_int_uid)
+        ctx.check_agent_access(agent_int_uid)
         chat_id = event.get('queryStringParameters').get('chat_id')
-        chat_access = _check_user_chat_access(user_id, chat_id)
-        msgs = _get_messages(chat_id)
-        agent_details = _get_details_for_agentintuid(agent_int_uid)
-        user_details = _get_user_by_id({"user_id":user_id})
+        chat_access = ctx.check_chat_access(chat_id)
+        msgs = _resolve_message_bodies(_get_messages(chat_id, ["message_id", "user_input", "ai_response", "ai_response_ref",
+                                                               "answer", "answer_ref", "answer_version", "created_at"]))
+        agent_details = _get_details_for_agentintuid(agent_int_uid, ["agent_name"])
+        user_details = _get_user_by_id({"user_id": user_id, "projection": ["first_name", "last_name"]})
         msg_data = []
         user_name = f"{user_details["first_name"]} {user_details["last_name"]}"
         for msg in msgs:
-            ai_response = msg.get("ai_response",None)
-            if ai_response:
-                ai_response = json.loads(msg['ai_response'])
-                ai_body = ai_response['body']
-                cleaned = ai_body.strip().lstrip('"').rstrip('"')
-                normalized = cleaned.replace('\\\\n', '\\n').replace('\\n', '\n')
-
-                # Extract JSON part after 'json\n'
-                json_part = normalized.split('json\n', 1)[-1]
-
-                # Remove real newlines (they break JSON parsing)
-                json_part = json_part.replace('\n', '')
-
-                # Decode escape sequences
-                json_part = bytes(json_part, "utf-8").decode("unicode_escape")
-
-                # Keep only up to the first closing brace
-                json_part = json_part[:json_part.find('}')+1]
-                try:
-                # Now parse the JSON
-                    data = json.loads(json_part)
-                     # Get the Answer
-                    ai_answer = data["Answer"]
-                except Exception as e:
-                    ai_answer = ai_body
+            if "answer_version" in msg:
+                ai_answer = msg.get("answer", "")
             else:
-                ai_answer =   ""
+                # Not yet migrated by the _backfill_answer job
+                ai_answer = _normalize_answer(msg.get("ai_response"))["answer"]
             msg_data.append({
                 f"User {user_name}" : msg["user_input"],
                 f"Agent {agent_details["agent_name"]}" : ai_answer,
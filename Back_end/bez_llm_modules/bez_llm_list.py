@@ -1,7 +1,8 @@
 import boto3,logging,json
 
 # Import from bez resources
-from bez_utility.bez_utils_aws import _scan_table_with_filter, _get_presigned_url, _get_record_from_table, _update_data_in_table
+from bez_utility.bez_utils_aws import _get_presigned_url, _get_record_from_table, _update_data_in_table
+from bez_utility.bez_utils_cache import _scan_reference_table
 from bez_utility.bez_metadata_agents import _check_user_agent_access
 from bez_utility.bez_validation import PayloadValidator
 
@@ -15,7 +16,7 @@ def _list_of_llms(event):
         logger.info(f"Received event: {event}")
         env = event.get("headers", {}).get("env", "dev")
         bucket_name = f"{BUCKET_NAME}-{env}"
-        items = _scan_table_with_filter({"table_name":"list_of_llm"})
+        items = _scan_reference_table("list_of_llm")
         result = []
         for item in items:
             llm_name = item.get("llm_name", "")
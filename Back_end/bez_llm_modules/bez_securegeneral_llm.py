@@ -2,11 +2,11 @@ import json, logging
 from datetime import datetime
 
 # Import from bez resources
-from bez_utility.bez_metadata_messages import _create_message, _get_msg_by_msgid, _update_msg_output
-from bez_utility.bez_metadata_chats import _check_user_chat_access, _create_chat, _get_chat_by_chatid
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_metadata_messages import _create_message, _update_msg_output
+from bez_utility.bez_metadata_chats import _create_chat
+from bez_utility.bez_request_context import RequestContext
+from bez_utility.bez_utils_cache import _get_reference_record
 from bez_utility.bez_utils_bedrock import _get_ai_response_with_llm
-from bez_utility.bez_metadata_agents import _check_user_agent_access,_get_privileges_by_user_for_agent
 
 # Configure logging
 logger = logging.getLogger()
@@ -16,45 +16,46 @@ BUCKET_NAME = "bez"
 def _secure_chat(event):
     try:
         logger.info(f"Received event: {event}")
-        user_id = event.get("requestContext", {}).get("authorizer", {}).get("user_id", None)
+        ctx = RequestContext(event)
+        user_id = ctx.user_id
         agent_int_uid = event.get('queryStringParameters').get('agent_int_uid')
         if not user_id:
             return {"statusCode": 400,
                     "body": json.dumps({"error": "User Id is a required field. Please re-login to try again."})}
         if not agent_int_uid:
             return {"statusCode": 400, "body": json.dumps({"error": "Please select an agent to continue."})}
-        user_access = _check_user_agent_access(user_id, agent_int_uid)
-        session_id = event.get("requestContext", {}).get("authorizer", {}).get("session_id", None)
+        user_access = ctx.check_agent_access(agent_int_uid)
+        session_id = ctx.session_id
         is_restore = event.get('queryStringParameters').get('is_restore', False)
         message_id = event.get('queryStringParameters').get('message_id', '')
         chat_id = event.get('queryStringParameters').get('chat_id', '')
         if message_id:
-            message = _get_msg_by_msgid(message_id)
+            message = ctx.get_message(message_id, ["chat_id"])
             chat_id = message["chat_id"]
         if not chat_id:
             return {"statusCode": 400, "body": "Please select a chat to continue."}
-        chat_access = _check_user_chat_access(user_id, chat_id)
+        chat_access = ctx.check_chat_access(chat_id)
         if is_restore:
             hist_chat_id = chat_id
-            hist_chat = _get_chat_by_chatid(hist_chat_id)
+            hist_chat = ctx.get_chat(hist_chat_id)
             hist_session_id = hist_chat["session_id"]
             if (chat_id and hist_session_id != session_id) or message_id:
                 new_chat_data = {
+                    "user_id": user_id,
                     "agent_int_uid": agent_int_uid,
                     "session_id": session_id,
                     "hist_chat_id": hist_chat_id
                 }
-                chat_id = _create_chat(new_chat_data)
+                chat_id = _create_chat(new_chat_data, ctx)
         logger.info(f'Chat ID: {chat_id}')
         body = json.loads(event.get("body", "{}"))
         user_prompt = body["user_prompt"]
         if not user_prompt:
             return {"statusCode": 400,
                     "body": json.dumps({"error": "User Input is a required field. Please try again."})}
-        agent = _get_privileges_by_user_for_agent(user_id,agent_int_uid)
-        agent_record = agent[0]
+        agent_record = ctx.check_agent_access(agent_int_uid)[0]
         llm_id = agent_record.get("llm_id")
-        llm_model = _get_record_from_table({"table_name": "list_of_llm",
+        llm_model = _get_reference_record({"table_name": "list_of_llm",
                                         "keys": {"llm_id": llm_id}})
         logger.info(llm_model)
         if not llm_model:
@@ -67,7 +68,7 @@ def _secure_chat(event):
             "expiry_in_days": 30,
             "status": "in_progress"
         }
-        message_id = _create_message(message_data)
+        message_id = _create_message(message_data, ctx)
         logger.info(f"Message stored with ID: {message_id}")
         current_date = datetime.now().strftime("%d %B %Y")
         prompt = f"\n\nHuman: {user_prompt}\n\n(Current date is: {current_date}\n\nAssistant:"
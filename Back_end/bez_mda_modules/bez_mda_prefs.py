@@ -1,11 +1,7 @@
 import logging, json
-import boto3
-
-dynamodb = boto3.resource('dynamodb')
-mda_prefs_table = dynamodb.Table("agent_mda_section_report_map")
 
 # import from bez resources
-from bez_utility.bez_metadata_agents import _check_user_agent_access
+from bez_utility.bez_metadata_agents import _check_user_agent_access, _get_mda_prefs, _get_mda_prefs_version, _replace_mda_prefs
 
 # Configure logging
 logger = logging.getLogger()
@@ -21,10 +17,7 @@ def _get_prefs(event):
         if not agent_int_uid:
             return {"statusCode": 400, "body": json.dumps({"error": "Agent selection is required to proceed. Please select an agent to continue."})}
         user_access = _check_user_agent_access(user_id, agent_int_uid)
-        preferences_result = mda_prefs_table.query(IndexName="agent_int_uid-index",
-                                       KeyConditionExpression= "agent_int_uid = :ag_id",
-                                       ExpressionAttributeValues = {":ag_id": agent_int_uid})
-        preferences = preferences_result.get("Items", [])
+        preferences = _get_mda_prefs(agent_int_uid)
         if not preferences:
             return {"statusCode": 400, "body": json.dumps({"error": "No data found for the given agent_int_uid"})}
         default_prefs = []
@@ -35,7 +28,8 @@ def _get_prefs(event):
                 "report_data": preference.get("report_data"),
                 "instruction": preference.get("instruction")})
         logger.info(default_prefs)
-        return {"statusCode": 200, "body": json.dumps({"data": default_prefs})}
+        return {"statusCode": 200, "body": json.dumps({"data": default_prefs,
+                                                       "version": _get_mda_prefs_version(agent_int_uid)})}
     except Exception as e:
         if "Function Error:" in str(e):
             error_message = str(e)[str(e).find("Function Error:") + len("Function Error: "):]
@@ -60,27 +54,9 @@ def _update_prefs(event):
         logger.info(preferences)
         if not preferences:
             return {"statusCode": 400, "body": json.dumps({"error": "No report preferences to update."})}
-        prefix_to_match = agent_int_uid
-        existing = mda_prefs_table.scan(FilterExpression=boto3.dynamodb.conditions.Attr('pk').begins_with(prefix_to_match),
-                                        ProjectionExpression='pk')
-        items_to_delete = existing['Items']
-        with mda_prefs_table.batch_writer() as batch:
-            for item in items_to_delete:
-                batch.delete_item(Key={'pk': item['pk']})
-        next_section_id = 1
-        for preference in preferences:
-            print(preference)
-            item = {
-                "agent_int_uid_secid": f"{agent_int_uid}-{next_section_id}",
-                "agent_int_uid": agent_int_uid,
-                "instruction": preference["instruction"],
-                "report_data": preference.get("report_data"),
-                "section_title":preference.get("mda_section"),
-                "section_order": preference["section_order"]
-            }
-            mda_prefs_table.put_item(Item=item)
-            next_section_id += 1
-        return {"statusCode": 200, "body": json.dumps({"message": "Records inserted successfully"})}
+        result = _replace_mda_prefs(agent_int_uid, preferences, event_body.get("version"))
+        return {"statusCode": 200, "body": json.dumps({"message": "Records inserted successfully",
+                                                       "version": result["version"]})}
     except Exception as e:
         if "Function Error:" in str(e):
             error_message = str(e)[str(e).find("Function Error:") + len("Function Error: "):]
@@ -1,6 +1,6 @@
 import logging, json
 
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_utils_cache import _get_reference_record
 
 # Configure logging
 logger = logging.getLogger()
@@ -18,7 +18,7 @@ def _get_mda_source_report_params(event):
             "table_name": "report_source",
             "keys": {"source_name": source_name}
         }
-        record = _get_record_from_table(data)
+        record = _get_reference_record(data)
         if not record or "source_report_params" not in record:
             return {"error": "No data found for the given source_name"}
 
@@ -2,7 +2,7 @@ import json, logging
 from botocore.exceptions import ClientError
 
 # import from bez resources
-from bez_utility.bez_utils_qbo import _get_secret_from_intid, _get_qbo_creds_from_secret, _get_refresh_token_from_intid, _get_new_refresh_token, _save_updated_refresh_token, _connect_to_qbo, _create_qbo_refresh_token_record
+from bez_utility.bez_utils_qbo import _get_secret_from_intid, _get_qbo_creds_from_secret, _get_refresh_token_from_intid, _get_new_refresh_token, _save_updated_refresh_token, _connect_to_qbo, _create_qbo_refresh_token_record, _get_qbo_access_token
 from bez_utility.bez_metadata_int import _get_int_by_intid, _check_user_access
 from bez_utility.bez_utils_aws import _update_secret, _get_secret_value, _create_secret, _update_data_in_table
 from bez_utility.bez_validation import PayloadValidator
@@ -68,14 +68,15 @@ def _existing_connect_to_qbo(event):
         user_access = _check_user_access(user_id, integration_id)
         secret_name = _get_secret_from_intid(integration_id)
         client_id, client_secret, realm_id, sandbox = _get_qbo_creds_from_secret(secret_name)
+        # Shares the stored access token and refresh lease with the workflows, so this check never
+        # rotates the refresh token underneath them
+        access_token = _get_qbo_access_token(integration_id)["access_token"]
         refresh_token = _get_refresh_token_from_intid(integration_id)
-        new_refresh_token, access_token = _get_new_refresh_token(client_id, client_secret, refresh_token)
-        update_status = _save_updated_refresh_token(refresh_token, new_refresh_token, integration_id)
         connection_response = _connect_to_qbo(client_id, client_secret, realm_id, sandbox, access_token)
         return {
             "statusCode": 200,
             "body": json.dumps({"message": "Successfully connected to QuickBooks.",
-                                "refresh_token": new_refresh_token})
+                                "refresh_token": refresh_token})
         }
     except Exception as e:
         if "Function Error:" in str(e):
@@ -0,0 +1,93 @@
+import json, re, logging
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Bump when _normalize_answer changes what it produces; the answer backfill rewrites older rows
+# 2: fenced JSON is only unwrapped when the fence is the whole text
+ANSWER_FORMAT_VERSION = 2
+# Answers are JSON-in-JSON at most a few levels deep; stop unwrapping after this many
+MAX_UNWRAP_DEPTH = 6
+ANSWER_KEYS = ("Answer", "answer")
+ERROR_KEYS = ("error", "errorMessage", "Cause", "Error")
+# A fence only counts when it is the whole answer; markdown answers quote JSON examples in code blocks
+JSON_FENCE = re.compile(r"```(?:json)?\s*(\{.*\})\s*```", re.DOTALL)
+
+
+def _parse_json_prefix(text):
+    """The JSON value text starts with, ignoring anything after it, or None."""
+    try:
+        return json.JSONDecoder().raw_decode(text)[0]
+    except ValueError:
+        return None
+
+
+def _status_ok(status):
+    """Whether an envelope statusCode is a success; one that is not a number counts as a failure."""
+    try:
+        return int(status) < 400
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_answer_object(value):
+    return isinstance(value, dict) and (("statusCode" in value and "body" in value)
+                                        or any(key in value for key in ANSWER_KEYS + ERROR_KEYS))
+
+
+def _normalize_answer(raw, usage=None):
+    """Canonical form of a stored ai_response: the plain markdown answer and whether it is a real one.
+
+    Accepts every shape the workflows have written: plain model text, a JSON string of it, a
+    {"Answer": ...} object (bare or in a ```json fence), and the Step Functions
+    {"statusCode": ..., "body": ...} envelope around any of those, including error bodies. A fenced
+    object is only unwrapped when the fence is the whole text.
+    Returns {"answer", "valid", "format_version", "tokens"}; tokens is None when usage is unknown.
+    """
+    valid, value = True, raw
+    for _ in range(MAX_UNWRAP_DEPTH):
+        if isinstance(value, dict):
+            if "statusCode" in value and "body" in value:
+                # Step Functions / Lambda envelope
+                valid = valid and _status_ok(value["statusCode"])
+                value = value["body"]
+                continue
+            key = next((key for key in ANSWER_KEYS if key in value), None)
+            if key:
+                value = value[key]
+                continue
+            key = next((key for key in ERROR_KEYS if key in value), None)
+            if key:
+                valid, value = False, value[key]
+                continue
+            value = json.dumps(value, indent=2, default=str)
+            break
+        if not isinstance(value, str):
+            value = "" if value is None else str(value)
+            break
+        text = value.strip()
+        # An object is only taken when it is one of the shapes above; models also answer with
+        # commentary after the JSON, so anything following it is dropped
+        fenced = JSON_FENCE.fullmatch(text)
+        parsed = _parse_json_prefix(fenced.group(1)) if fenced else None
+        if not _is_answer_object(parsed) and text.startswith("{"):
+            parsed = _parse_json_prefix(text)
+        if _is_answer_object(parsed):
+            value = parsed
+            continue
+        if text.startswith('"'):
+            # A JSON encoded string; it has to be the whole text, a markdown answer can open with a quote
+            try:
+                value = json.loads(text)
+                continue
+            except ValueError:
+                pass
+        value = text
+        break
+    answer = value.strip() if isinstance(value, str) else ""
+    tokens = None
+    if usage:
+        tokens = {"input": int(usage.get("input_tokens") or 0), "output": int(usage.get("output_tokens") or 0)}
+    return {"answer": answer, "valid": valid and bool(answer), "format_version": ANSWER_FORMAT_VERSION,
+            "tokens": tokens}
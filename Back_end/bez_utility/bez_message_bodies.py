@@ -0,0 +1,87 @@
+import os, json, gzip, hashlib, logging
+from concurrent.futures import ThreadPoolExecutor
+
+# import from bez resources
+from bez_utility.bez_utils_aws import _read_s3_bytes, _write_s3
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Claim check for the large text attributes of message_details: bodies larger than the threshold are
+# written to S3 gzipped and the item keeps only <attribute>_ref {bucket, key, bytes, sha256, encoding}.
+# A body the workflow already wrote to S3 (its chat_history object) is pointed at instead of copied.
+# Defaults to the bucket the workflows write to; set MESSAGE_BODY_BUCKET to keep bodies elsewhere.
+MESSAGE_BODY_BUCKET = os.environ.get("MESSAGE_BODY_BUCKET", "bez-dev")
+MESSAGE_BODY_PREFIX = "message_bodies"
+AI_RESPONSE_INLINE_BYTES = int(os.environ.get("AI_RESPONSE_INLINE_BYTES", str(16 * 1024)))
+BODY_FETCH_WORKERS = 8
+# Attributes that may be stored behind a pointer
+BODY_ATTRIBUTES = ("ai_response", "answer")
+
+
+def _body_update(msg_id, attribute, text, stored=None):
+    """(update_data, remove_attributes) that store text in attribute inline or behind an S3 pointer.
+
+    stored is {"bucket", "key"} of an object the workflow already wrote holding exactly text, or a JSON
+    object holding it under "json_field"; a large body then points at it rather than being written again.
+    """
+    body = text.encode("utf-8")
+    if len(body) <= AI_RESPONSE_INLINE_BYTES:
+        return {attribute: text}, [f"{attribute}_ref"]
+    digest = hashlib.sha256(body).hexdigest()
+    if stored:
+        ref = dict(stored, bytes=len(body), sha256=digest, encoding="identity")
+        return {f"{attribute}_ref": ref}, [attribute]
+    # Keyed by content, so a retried write lands on the same object
+    key = f"{MESSAGE_BODY_PREFIX}/{msg_id}/{digest[:16]}.gz"
+    _write_s3(MESSAGE_BODY_BUCKET, key, gzip.compress(body))
+    ref = {"bucket": MESSAGE_BODY_BUCKET, "key": key, "bytes": len(body), "sha256": digest, "encoding": "gzip"}
+    return {f"{attribute}_ref": ref}, [attribute]
+
+
+def _stored_text(stored, text):
+    """The body a stored object read through a ref would give, where the object's content is text."""
+    if not stored.get("json_field"):
+        return text
+    try:
+        return json.loads(text)[stored["json_field"]]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _read_body(ref):
+    body = _read_s3_bytes(ref["bucket"], ref["key"])
+    if ref.get("encoding") == "gzip":
+        body = gzip.decompress(body)
+    if ref.get("json_field"):
+        body = json.loads(body)[ref["json_field"]].encode("utf-8")
+    if hashlib.sha256(body).hexdigest() != ref["sha256"]:
+        raise Exception(f"Stored response {ref['key']} does not match its checksum.")
+    return body.decode("utf-8")
+
+
+def _resolve_message_bodies(messages, message_ids=None):
+    """Replace each <attribute>_ref with the attribute it points to, fetching the bodies in parallel.
+
+    message_ids limits this to those messages; None resolves every message. Messages are changed in place.
+    """
+    pending = [(msg, attribute) for msg in messages for attribute in BODY_ATTRIBUTES
+               if msg.get(f"{attribute}_ref") and (message_ids is None or msg["message_id"] in message_ids)]
+    if not pending:
+        return messages
+    with ThreadPoolExecutor(max_workers=min(BODY_FETCH_WORKERS, len(pending))) as executor:
+        bodies = list(executor.map(lambda entry: _read_body(entry[0][f"{entry[1]}_ref"]), pending))
+    for (msg, attribute), body in zip(pending, bodies):
+        msg[attribute] = body
+        del msg[f"{attribute}_ref"]
+    return messages
+
+
+def _resolve_param(value):
+    """The resolve_bodies query parameter: "true" for every message, or a comma separated list of message ids."""
+    if not value:
+        return False, None
+    if value.lower() == "true":
+        return True, None
+    return True, {message_id.strip() for message_id in value.split(",") if message_id.strip()}
@@ -1,14 +1,17 @@
-import logging, boto3, re, time, os, base64
+import logging, re, time, os, base64
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 
 # import from bez resources
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists, _query_dynamodb, _scan_table_with_filter, _get_presigned_url
+from bez_utility.bez_utils_common import _generate_sortable_id
+from bez_utility.bez_utils_aws import _query_dynamodb, _transact_write_items, _get_presigned_url, _iter_query_pages, _batch_get_records, _apply_projection
 from bez_utility.bez_utils_bedrock import _get_ai_response, _generate_avatar_prompt
+from bez_utility.bez_utils_cache import _cached_read, _scan_reference_table
+from bez_utility.bez_utils_backend import _get_dynamodb_resource, _get_s3_client
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
+dynamodb = _get_dynamodb_resource()
+s3 = _get_s3_client()
 
 #environment variables
 BUCKET_NAME = os.environ.get("BUCKET_NAME", "bez")
@@ -19,16 +22,20 @@ MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024  # 2MB
 agent_table = dynamodb.Table("agent_list")
 agent_by_int_table = dynamodb.Table("agent_list_by_int")
 agent_privileges_table = dynamodb.Table("agent_privileges")
+workflow_mapping_table = dynamodb.Table("agent_workflow_mapping")
 agent_mda_sections_table = dynamodb.Table("agent_mda_section_report_map")
 
+# Attributes compared when deciding whether a submitted MD&A section differs from the stored row
+MDA_SECTION_FIELDS = ("instruction", "report_data", "section_title", "section_order")
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 def _get_agent_details(agent_id):
     try:
-        agent_response = agent_table.get_item(Key={"agent_id": agent_id})
-        agent_data = agent_response.get("Item")
+        agent_data = _cached_read("agent_list", agent_id,
+                                  lambda: agent_table.get_item(Key={"agent_id": agent_id}).get("Item"))
         if not agent_data:
             raise Exception("Function Error: Agent not found")
         return agent_data
@@ -37,95 +44,72 @@ def _get_agent_details(agent_id):
         raise error
 
 def _get_agent_int_uid(agent_id, int_id):
-    try:
-        uid = _generate_uid({"n": "8"})
-        logger.info(f'Unique id is: {uid}')
-        agent_int_uid = f"{agent_id}-{int_id}-{uid}"
-        agent_int_uid_exists = _check_record_exists({"table_name": "agent_list_by_int", "keys": {"agent_int_uid": agent_int_uid}, "gsi_name": ""})
-        if agent_int_uid_exists:
-            _get_agent_int_uid(agent_id, int_id)
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
+    # Uniqueness is enforced when the agent_list_by_int record is written
+    agent_int_uid = f"{agent_id}-{int_id}-{_generate_sortable_id()}"
     logger.info(f'Unique Agent id is:{agent_int_uid}')
     return agent_int_uid
 
-def _create_agent_by_int_table_record(int_id, agent_int_uid, agent_age, agent_gender, agent_name, agent_type, example_welcome_prompt, skillset, welcome_prompt, profile_pic=None):
-    try:
-        item = {
-            "agent_int_uid": agent_int_uid,
-            "agent_age": agent_age,
-            "agent_gender": agent_gender,
-            "agent_name": agent_name,
-            "agent_type": agent_type,
-            "example_welcome_prompt": example_welcome_prompt,
-            "int_id":  int_id,
-            "skillset": skillset,
-            "welcome_prompt": welcome_prompt,
-            "profile_pic": profile_pic
-        }
-        agent_by_int_table.put_item(Item=item)
-        logger.info(f"Agent list by Int table record created: {item}")
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
+def _agent_by_int_item(int_id, agent_int_uid, agent_name, agent_type, skillset, welcome_prompt, profile_pic=None, **profile):
+    """agent_list_by_int item; profile carries the optional agent_age, agent_gender and example_welcome_prompt."""
+    item = {
+        "agent_int_uid": agent_int_uid,
+        "agent_name": agent_name,
+        "agent_type": agent_type,
+        "int_id":  int_id,
+        "skillset": skillset,
+        "welcome_prompt": welcome_prompt,
+        "profile_pic": profile_pic
+    }
+    item.update(profile)
+    return item
 
-def _create_record_agent_by_int(int_id, agent_int_uid, agent_name, agent_type, skillset, welcome_prompt, profile_pic=None):
-    try:
-        item = {
-            "agent_int_uid": agent_int_uid,
-            "agent_name": agent_name,
-            "agent_type": agent_type,
-            "int_id":  int_id,
-            "skillset": skillset,
-            "welcome_prompt": welcome_prompt,
-            "profile_pic": profile_pic
-        }
-        agent_by_int_table.put_item(Item=item)
-        logger.info(f"Agent list by Int table record created: {item}")
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
+def _agent_privilege_item(agent_int_uid, agent_persona, user_id, llm_id=None):
+    return {
+        "agent_privilege_id": _generate_sortable_id(),
+        "agent_int_uid": agent_int_uid,
+        "agent_persona": agent_persona,
+        "is_active": True,
+        "is_deleted": False,
+        "is_owner": True,
+        "user_id": user_id,
+        "llm_id": llm_id
+    }
 
-def _get_agent_privilege_id():
-    try:
-        agent_privilege_id = _generate_uid({"n": "8"})
-        logger.info(f'Unique id is: {agent_privilege_id}')
-        agent_privilege_id_exists = _check_record_exists({"table_name": "agent_privileges", "keys": {"agent_privilege_id": agent_privilege_id}, "gsi_name": ""})
-        if agent_privilege_id_exists:
-            _get_agent_privilege_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
-    logger.info(f'Unique Agent Privilege id is:{agent_privilege_id}')
-    return agent_privilege_id
+def _provision_agent(agent_item, privilege_item, section_items=None):
+    """Create the agent record, its owner privilege and any default section rows in one transaction.
 
-def _create_agent_privilege_record(agent_privilege_id, agent_int_uid,agent_persona,  user_id, llm_id=None):
+    All three are new rows, so each put is guarded by attribute_not_exists on its key; a hire either
+    lands completely or not at all. Returns the agent_privilege_id.
+    """
     try:
-        item = {
-            "agent_privilege_id": agent_privilege_id,
-            "agent_int_uid": agent_int_uid,
-            "agent_persona":agent_persona,
-            "is_active": True,
-            "is_deleted": False,
-            "is_owner": True,
-        "user_id": user_id,
-            "llm_id":llm_id
-        }
-        agent_privileges_table.put_item(Item=item)
-        logger.info(f"Agent Privileges record created: {item}")
+        rows = [("agent_list_by_int", "agent_int_uid", agent_item),
+                ("agent_privileges", "agent_privilege_id", privilege_item)]
+        rows += [("agent_mda_section_report_map", "agent_int_uid_secid", item) for item in section_items or []]
+        actions = [{"Put": {"TableName": table_name,
+                            "Item": item,
+                            "ConditionExpression": "attribute_not_exists(#pk)",
+                            "ExpressionAttributeNames": {"#pk": key_name}}}
+                   for table_name, key_name, item in rows]
+        _transact_write_items(actions)
+        logger.info(f"Agent {agent_item['agent_int_uid']} provisioned with {len(rows)} records")
+        return privilege_item["agent_privilege_id"]
     except Exception as error:
-        logger.error(f"Unexpected error: {error}")
+        logger.error(f"Unexpected error while provisioning agent: {error}")
         raise error
 
+def _iter_agent_privileges_by_user(user_id):
+    """Yield agent privileges for a given user_id, page by page."""
+    query_args = {
+        "IndexName": "user_id-index",
+        "KeyConditionExpression": Key("user_id").eq(str(user_id))
+    }
+    for page in _iter_query_pages(agent_privileges_table, query_args):
+        yield from page.get("Items", [])
+
 def _get_agent_privileges_by_user(user_id):
     """Fetch agent privileges for a given user_id."""
     try:
-        response = agent_privileges_table.query(
-            IndexName="user_id-index",
-            KeyConditionExpression=boto3.dynamodb.conditions.Key("user_id").eq(str(user_id))
-        )
-        return response.get("Items", [])
+        return list(_iter_agent_privileges_by_user(user_id))
     except Exception as e:
         logger.info(f"Error fetching agent privileges: {e}")
         raise e
@@ -144,10 +128,10 @@ def _get_privileges_by_user_for_agent(user_id, agent_int_uid):
         logger.info(f"Error fetching agent privileges: {e}")
         raise e
 
-def _get_details_for_agentintuid(agent_int_uid):
+def _get_details_for_agentintuid(agent_int_uid, projection=None):
     """Fetch agent details from agent_list_by_int."""
     try:
-        response = agent_by_int_table.get_item(Key={"agent_int_uid": str(agent_int_uid)})
+        response = agent_by_int_table.get_item(**_apply_projection({"Key": {"agent_int_uid": str(agent_int_uid)}}, projection))
         agent_data = response.get("Item")
         if not agent_data:
             raise Exception("Function Error: Agent not found")
@@ -156,20 +140,46 @@ def _get_details_for_agentintuid(agent_int_uid):
         logger.info(f"Error fetching agent {agent_int_uid} details: {e}")
         raise e
 
+def _get_details_for_agentintuids(agent_int_uids, projection=None):
+    """Batch fetch agent details from agent_list_by_int, keyed by agent_int_uid."""
+    try:
+        keys = [{"agent_int_uid": str(agent_int_uid)} for agent_int_uid in agent_int_uids if agent_int_uid]
+        return _batch_get_records("agent_list_by_int", keys, projection)
+    except Exception as e:
+        logger.info(f"Error fetching agent details: {e}")
+        raise e
+
 def _get_agent_details_by_status(status):
     try:
         logger.info(f"Fetching agent details for status: {status}")
-        response = agent_table.query(
-            IndexName="agent_status-index",
-            KeyConditionExpression=Key("agent_status").eq(status)
-        )
-        logger.info(f"Agent details fetched successfully: {response}")
-        agents_list = response.get("Items", [])
+        query_args = {
+            "IndexName": "agent_status-index",
+            "KeyConditionExpression": Key("agent_status").eq(status)
+        }
+        agents_list = _cached_read("agent_list", ("agent_status", status),
+                                   lambda: [item for page in _iter_query_pages(agent_table, query_args)
+                                            for item in page.get("Items", [])])
+        logger.info(f"Agent details fetched successfully: {agents_list}")
         return agents_list
     except Exception as e:
         logger.info(f"Error fetching agent details: {e}")
         raise e
 
+def _get_workflow_mapping(agent_id):
+    """Workflow steps configured for an agent, ordered by workflow_id."""
+    try:
+        query_args = {
+            "IndexName": "agent_id-index",
+            "KeyConditionExpression": Key("agent_id").eq(agent_id)
+        }
+        wkflow_mapping = _cached_read("agent_workflow_mapping", agent_id,
+                                      lambda: [item for page in _iter_query_pages(workflow_mapping_table, query_args)
+                                               for item in page.get("Items", [])])
+        return sorted(wkflow_mapping, key=lambda x: x['workflow_id'])
+    except Exception as e:
+        logger.info(f"Error fetching workflow mapping: {e}")
+        raise e
+
 def _get_clean_folder_name(name):
     return re.sub(r'[^a-z0-9]', '', name.lower())
 
@@ -256,36 +266,89 @@ def _create_agent_ai_name(agent_id, user_id):
     logger.info(f"AI Name {ai_response}")
     return ai_response
 
-def _save_mda_default_sections(agent_int_uid):
+def _mda_default_section_items(agent_int_uid):
+    """Per agent copies of the default MD&A sections, ready to be written with the agent."""
+    mda_default_sections = _scan_reference_table("mda_section_report_map_default")
+    logger.info(f"MDA Default Sections: {mda_default_sections}")
+    if not mda_default_sections:
+        raise Exception("Function Error: MD&A Default Sections not found.")
+    return [{
+        "agent_int_uid_secid": f"{agent_int_uid}-{section['section_id']}",
+        "agent_int_uid": agent_int_uid,
+        "section_order": section['section_order'],
+        "instruction": section['instruction'],
+        "report_data": section['report_data'],
+        "section_title": section['section_title']
+    } for section in mda_default_sections]
+
+
+def _get_mda_prefs(agent_int_uid):
+    """All MD&A section rows of an agent, read through the agent_int_uid-index GSI."""
+    query_args = {
+        "IndexName": "agent_int_uid-index",
+        "KeyConditionExpression": Key("agent_int_uid").eq(agent_int_uid)
+    }
+    rows = []
+    for page in _iter_query_pages(agent_mda_sections_table, query_args):
+        rows.extend(page.get("Items", []))
+    return rows
+
+def _get_mda_prefs_version(agent_int_uid):
+    agent = _get_details_for_agentintuid(agent_int_uid, ["agent_int_uid", "mda_prefs_version"])
+    return int(agent.get("mda_prefs_version", 0))
+
+def _replace_mda_prefs(agent_int_uid, preferences, expected_version=None):
+    """Make the agent's MD&A section rows match `preferences`, writing only what changed.
+
+    The mda_prefs_version counter on the agent_list_by_int record is bumped with a conditional
+    update before any row is touched, so two concurrent replaces cannot interleave; the loser
+    (or a caller whose expected_version is stale) gets a Function Error and should reload.
+    """
+    current_version = _get_mda_prefs_version(agent_int_uid)
+    if expected_version not in (None, "") and int(expected_version) != current_version:
+        raise Exception("Function Error: Report preferences were changed by someone else. Please reload and try again.")
+    existing = {row["agent_int_uid_secid"]: row for row in _get_mda_prefs(agent_int_uid)}
+    desired = {}
+    for section_id, preference in enumerate(preferences, start=1):
+        item = {
+            "agent_int_uid_secid": f"{agent_int_uid}-{section_id}",
+            "agent_int_uid": agent_int_uid,
+            "instruction": preference["instruction"],
+            "report_data": preference.get("report_data"),
+            "section_title": preference.get("mda_section"),
+            "section_order": preference["section_order"]
+        }
+        desired[item["agent_int_uid_secid"]] = item
+    to_put = [item for key, item in desired.items()
+              if key not in existing or any(existing[key].get(field) != item[field] for field in MDA_SECTION_FIELDS)]
+    to_delete = [key for key in existing if key not in desired]
+    new_version = current_version + 1
+    version_condition = "#v = :current" if current_version else "attribute_not_exists(#v)"
+    version_values = {":new": new_version}
+    if current_version:
+        version_values[":current"] = current_version
     try:
-        mda_default_sections = _scan_table_with_filter({"table_name": "mda_section_report_map_default"})
-        logger.info(f"MDA Default Sections: {mda_default_sections}")
-        if not mda_default_sections:
-            raise Exception("Function Error: MD&A Default Sections not found.")
-        if mda_default_sections:
-            for section in mda_default_sections:
-                try:
-                    item = {
-                        "agent_int_uid_secid": f"{agent_int_uid}-{section['section_id']}",
-                        "agent_int_uid": agent_int_uid,
-                        "section_order": section['section_order'],
-                        "instruction": section['instruction'],
-                        "report_data": section['report_data'],
-                        "section_title": section['section_title']
-                    }
-                    agent_mda_sections_table.put_item(Item=item)
-                except Exception as error:
-                    logger.error(f"Function Error: Unexpected error While Saving MDA Section data: {error}")
-                    raise Exception(f"Function Error: Unexpected error While Saving MDA Section data: {error}")
-        return True
-    except Exception as e:
-        logger.error(f"Unexpected error While Saving MDA Section data: {e}")
+        agent_by_int_table.update_item(
+            Key={"agent_int_uid": agent_int_uid},
+            UpdateExpression="SET #v = :new",
+            ConditionExpression=f"attribute_exists(agent_int_uid) AND {version_condition}",
+            ExpressionAttributeNames={"#v": "mda_prefs_version"},
+            ExpressionAttributeValues=version_values)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            raise Exception("Function Error: Report preferences were changed by someone else. Please reload and try again.")
         raise e
+    with agent_mda_sections_table.batch_writer() as batch:
+        for key in to_delete:
+            batch.delete_item(Key={"agent_int_uid_secid": key})
+        for item in to_put:
+            batch.put_item(Item=item)
+    logger.info(f"MD&A prefs for {agent_int_uid} at version {new_version}: {len(to_put)} written, {len(to_delete)} deleted")
+    return {"version": new_version, "written": len(to_put), "deleted": len(to_delete)}
 
 
 def _create_securellm_agent_if_needed(user, env):
-    user_agents = _get_agent_privileges_by_user(user["user_id"])
-    for agent in user_agents:
+    for agent in _iter_agent_privileges_by_user(user["user_id"]):
         if agent.get("agent_int_uid", "").startswith("000"):
             agent_int_uid = agent["agent_int_uid"]
             agent_details = _get_details_for_agentintuid(agent_int_uid)
@@ -307,13 +370,12 @@ def _create_securellm_agent_if_needed(user, env):
     bucket_name = f"{BUCKET_NAME}-{env}"
     presigned_url = _get_presigned_url(bucket_name, s3_path, 3600) if s3_path else None
 
-    _create_record_agent_by_int(
-        int_id, agent_int_uid, agent_name,
-        agent_data["agent_type"], agent_data["skillset"],
-        agent_data["welcome_prompt"], s3_path
+    _provision_agent(
+        _agent_by_int_item(int_id, agent_int_uid, agent_name,
+                           agent_data["agent_type"], agent_data["skillset"],
+                           agent_data["welcome_prompt"], s3_path),
+        _agent_privilege_item(agent_int_uid, agent_data["agent_persona"], user["user_id"], agent_data["llm_id"])
     )
-    agent_privilege_id = _get_agent_privilege_id()
-    _create_agent_privilege_record(agent_privilege_id, agent_int_uid,agent_data["agent_persona"], user["user_id"], agent_data["llm_id"])
     return {
         "agent_int_uid": agent_int_uid,
         "agent_name": agent_name,
@@ -0,0 +1,197 @@
+import json, os, gzip, time, logging
+from botocore.exceptions import ClientError
+
+# import from bez resources
+from bez_utility.bez_utils_aws import _read_s3_bytes, _write_s3, _run_resumable_scan
+from bez_utility.bez_utils_common import _generate_sortable_id, _json_default
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
+from bez_utility.bez_metadata_messages import _iter_messages
+
+# Initialize resources
+dynamodb = _get_dynamodb_resource()
+
+# Calling resources
+chats_table = dynamodb.Table("chat_details")
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Cold chats are written to S3 as gzipped NDJSON segments, one prefix per user and agent:
+#   <prefix>/<user_id>/<agent_int_uid>/manifest.json
+#   <prefix>/<user_id>/<agent_int_uid>/segments/<segment_id>.ndjson.gz
+# Each segment line is a chat or message item tagged with "kind". The manifest lists the segments
+# with the chats each one holds, so history can be served without opening any segment.
+ARCHIVE_BUCKET = os.environ.get("CHAT_ARCHIVE_BUCKET", "bez-chat-archive")
+ARCHIVE_PREFIX = "chat_archive"
+# A chat is archived once its ttl is this close; it stays readable from DynamoDB until it expires
+ARCHIVE_LEAD_SECONDS = int(os.environ.get("CHAT_ARCHIVE_LEAD_DAYS", "3")) * 24 * 60 * 60
+
+
+def _archive_prefix(user_id, agent_int_uid):
+    return f"{ARCHIVE_PREFIX}/{user_id}/{agent_int_uid}"
+
+
+def _read_manifest(user_id, agent_int_uid):
+    body = _read_s3_bytes(ARCHIVE_BUCKET, f"{_archive_prefix(user_id, agent_int_uid)}/manifest.json", missing_ok=True)
+    return json.loads(body) if body else {"version": 1, "segments": []}
+
+
+def _write_manifest(user_id, agent_int_uid, manifest):
+    _write_s3(ARCHIVE_BUCKET, f"{_archive_prefix(user_id, agent_int_uid)}/manifest.json",
+              json.dumps(manifest, separators=(",", ":")))
+
+
+def _write_segment(user_id, agent_int_uid, chats, messages_by_chat):
+    """Write one compressed segment and return its manifest entry."""
+    lines = []
+    for chat in chats:
+        lines.append(json.dumps(dict(chat, kind="chat"), default=_json_default))
+        lines.extend(json.dumps(dict(msg, kind="message"), default=_json_default)
+                     for msg in messages_by_chat.get(chat["chat_id"], []))
+    body = gzip.compress(("\n".join(lines) + "\n").encode("utf-8"))
+    key = f"{_archive_prefix(user_id, agent_int_uid)}/segments/{_generate_sortable_id()}.ndjson.gz"
+    _write_s3(ARCHIVE_BUCKET, key, body)
+    created = [int(chat["created_at"]) for chat in chats]
+    return {"key": key, "from": min(created), "to": max(created), "bytes": len(body),
+            "messages": sum(len(messages_by_chat.get(chat["chat_id"], [])) for chat in chats),
+            # [chat_id, created_at, chat_theme] per chat, enough for chat history
+            "chats": [[chat["chat_id"], int(chat["created_at"]), chat.get("chat_theme", "")] for chat in chats]}
+
+
+def _read_segment(key):
+    records = {"chat": [], "message": []}
+    body = gzip.decompress(_read_s3_bytes(ARCHIVE_BUCKET, key)).decode("utf-8")
+    for line in body.splitlines():
+        if line:
+            record = json.loads(line)
+            records[record.pop("kind")].append(record)
+    return records
+
+
+def _archived_chat_index(manifest):
+    """chat_id -> (segment key, created_at, chat_theme); a chat archived again is read from its latest segment."""
+    index = {}
+    for segment in manifest.get("segments", []):
+        for chat_id, created_at, chat_theme in segment["chats"]:
+            index[chat_id] = (segment["key"], created_at, chat_theme)
+    return index
+
+
+def _get_archived_chats(user_id, agent_int_uid, before=None, after=None):
+    """Archived chat summaries with created_at in (after, before), newest first."""
+    chats = [{"chat_id": chat_id, "created_at": str(created_at), "chat_theme": chat_theme}
+             for chat_id, (_, created_at, chat_theme) in _archived_chat_index(_read_manifest(user_id, agent_int_uid)).items()
+             if (before is None or created_at < before) and (after is None or created_at > after)]
+    chats.sort(key=lambda chat: (int(chat["created_at"]), chat["chat_id"]), reverse=True)
+    return chats
+
+
+def _archived_lineage_messages(chat, index, segments, skip_chat_ids=()):
+    """Archived messages of chat's restored ancestors, each cut off where the conversation branched."""
+    messages = []
+    for link in chat.get("lineage", []):
+        if link["chat_id"] in skip_chat_ids or link["chat_id"] not in index:
+            continue
+        key = index[link["chat_id"]][0]
+        if key not in segments:
+            segments[key] = _read_segment(key)
+        messages.extend(msg for msg in segments[key]["message"]
+                        if msg["chat_id"] == link["chat_id"] and int(msg["created_at"]) <= int(link["until"]))
+    return messages
+
+
+def _get_archived_conversation(user_id, agent_int_uid, chat_id):
+    """(chat, messages oldest first) for a chat that only survives in the archive, or (None, [])."""
+    index = _archived_chat_index(_read_manifest(user_id, agent_int_uid))
+    if chat_id not in index:
+        return None, []
+    segments = {index[chat_id][0]: _read_segment(index[chat_id][0])}
+    records = segments[index[chat_id][0]]
+    chat = next(chat for chat in records["chat"] if chat["chat_id"] == chat_id)
+    messages = [msg for msg in records["message"] if msg["chat_id"] == chat_id]
+    messages += _archived_lineage_messages(chat, index, segments)
+    messages.sort(key=lambda msg: (int(msg["created_at"]), msg["message_id"]))
+    return chat, messages
+
+
+def _get_archived_lineage_messages(user_id, agent_int_uid, chat, hot_chat_ids=()):
+    """Archived ancestor messages of a live restored chat, for history older than DynamoDB still holds."""
+    if not chat.get("lineage"):
+        return []
+    index = _archived_chat_index(_read_manifest(user_id, agent_int_uid))
+    messages = _archived_lineage_messages(chat, index, {}, skip_chat_ids=set(hot_chat_ids))
+    messages.sort(key=lambda msg: (int(msg["created_at"]), msg["message_id"]))
+    return messages
+
+
+def _archive_cold_chats(data):
+    """Archive chats whose ttl falls within ARCHIVE_LEAD_SECONDS, one resumable batch at a time.
+
+    Chats are grouped by user and agent; each group becomes one segment appended to that
+    manifest. archived_count records how many messages were archived, so a chat that gets more
+    messages before it expires is picked up and archived again. Manifests are read, appended and
+    written back, so run a single instance of this job at a time.
+    """
+    now = int(time.time())
+
+    def _archive(chats, result):
+        groups = {}
+        for chat in chats:
+            groups.setdefault((chat["user_id"], chat["agent_int_uid"]), []).append(chat)
+        for (user_id, agent_int_uid), group in groups.items():
+            messages_by_chat = {chat["chat_id"]: list(_iter_messages(chat["chat_id"])) for chat in group}
+            manifest = _read_manifest(user_id, agent_int_uid)
+            manifest["segments"].append(_write_segment(user_id, agent_int_uid, group, messages_by_chat))
+            _write_manifest(user_id, agent_int_uid, manifest)
+            result["segments"] = result.get("segments", 0) + 1
+            for chat in group:
+                try:
+                    chats_table.update_item(
+                        Key={"chat_id": chat["chat_id"]},
+                        UpdateExpression="SET archived_count = :n, archived_at = :now",
+                        ConditionExpression="attribute_exists(chat_id)",
+                        ExpressionAttributeValues={":n": len(messages_by_chat[chat["chat_id"]]), ":now": now})
+                    result["updated"] += 1
+                except ClientError as e:
+                    # Expired between the scan and the write; the segment already holds it
+                    if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                        raise
+                    result["skipped"] += 1
+
+    scan_args = {
+        "FilterExpression": ("#ttl < :horizon AND attribute_exists(user_agent) AND "
+                             "(attribute_not_exists(archived_count) OR archived_count < message_count)"),
+        "ExpressionAttributeNames": {"#ttl": "ttl"},
+        "ExpressionAttributeValues": {":horizon": now + ARCHIVE_LEAD_SECONDS}
+    }
+    return _run_resumable_scan(dict(data, table_name="chat_details", scan_args=scan_args), _archive)
+
+
+def _backfill_numeric_ttl(data):
+    """Rewrite string ttl values (which DynamoDB TTL ignores) as numbers on chat_details or message_details."""
+    table = dynamodb.Table(data["table_name"])
+
+    def _convert(items, result):
+        for item in items:
+            try:
+                table.update_item(
+                    Key={key: item[key] for key in data["key_names"]},
+                    UpdateExpression="SET #ttl = :ttl",
+                    ConditionExpression="attribute_type(#ttl, :s)",
+                    ExpressionAttributeNames={"#ttl": "ttl"},
+                    ExpressionAttributeValues={":ttl": int(float(item["ttl"])), ":s": "S"})
+                result["updated"] += 1
+            except (ClientError, ValueError) as e:
+                # Already numeric, deleted, or not a number at all
+                if isinstance(e, ClientError) and e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                result["skipped"] += 1
+
+    scan_args = {
+        "FilterExpression": "attribute_type(#ttl, :s)",
+        "ProjectionExpression": ", ".join(data["key_names"]) + ", #ttl",
+        "ExpressionAttributeNames": {"#ttl": "ttl"},
+        "ExpressionAttributeValues": {":s": "S"}
+    }
+    return _run_resumable_scan(dict(data, scan_args=scan_args), _convert)
@@ -1,14 +1,13 @@
-import json, time, logging
-import boto3
+import json, os, time, logging
 from botocore.exceptions import ClientError
 
 #import from bez functions
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists, _update_data_in_table
+from bez_utility.bez_utils_aws import _create_record_with_unique_id, _update_data_in_table, _apply_projection, _batch_get_records, _run_resumable_scan, _iter_query_dynamodb, _query_dynamodb_page, _time_window, _empty_window
 from bez_utility.bez_utils_bedrock import _get_ai_response
+from bez_utility.bez_utils_backend import _get_dynamodb_resource, _is_memory_backend
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 chats_table = dynamodb.Table("chat_details")
@@ -18,115 +17,232 @@ sessions_table = dynamodb.Table("sessions")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def _get_chat_id():
-    try:
-        chat_id = _generate_uid({"n": "8"})
-        print('Chat id is:', chat_id)
-        chat_id_exists = _check_record_exists({"table_name": "chat_details", "keys": {"chat_id": chat_id}, "gsi_name": ""})
-        # print('Chat Exists:', chat_id)
-        if chat_id_exists:
-            _get_chat_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
-    logger.info(f'Unique Chat id is:{chat_id}')
-    return chat_id
+# Chat history reads one user's chats with one agent from this index, newest first
+USER_AGENT_INDEX = "user_agent-created_at-index"
 
-def _create_chat(data):
+# Theme generation runs in the Bez-Agent-Common queue worker. Without a queue it falls back to
+# running inline on the message write, as before.
+CHAT_THEME_QUEUE_URL = os.environ.get("CHAT_THEME_QUEUE_URL") or (
+    "https://sqs.local/000000000000/bez-chat-theme" if _is_memory_backend() else "")
+# Messages arriving within this window collapse into one theme update
+CHAT_THEME_DEBOUNCE_SECONDS = int(os.environ.get("CHAT_THEME_DEBOUNCE_SECONDS", "5"))
+
+def _user_agent_key(user_id, agent_int_uid):
+    """Partition key of the user_agent index; a GSI key is a single attribute, so user and agent are joined."""
+    return f"{user_id}#{agent_int_uid}"
+
+def _create_chat(data, ctx=None):
     try:
-        chat_id = _get_chat_id() 
         current_time = int(time.time())
         expiry_in_days = data.get("expiry_in_days", 30)
         logger.info(f'Expiry in days: {expiry_in_days}')
         ttl_time = current_time + (int(expiry_in_days) * 24 * 60 * 60) 
+        agent_int_uid = data.get("agent_int_uid", "")
+        user_id = data.get("user_id") or (ctx.user_id if ctx else None)
         item = {
-            "chat_id": chat_id,
-            "agent_int_uid": data.get("agent_int_uid", ""),
+            "agent_int_uid": agent_int_uid,
             "created_at": str(int(time.time())),
-            "ttl": str(ttl_time),
+            "ttl": ttl_time,  # numeric: DynamoDB TTL ignores string values
             "summarized": False,
+            "message_count": 0,
             "session_id": data.get("session_id", ""),
             "hist_chat_id":data.get("hist_chat_id","")
         }
-        logger.info(f'Item inserted to Chat table: {item}')
-        response = chats_table.put_item(Item=item)
+        if user_id:
+            item["user_id"] = user_id
+            item["user_agent"] = _user_agent_key(user_id, agent_int_uid)
+        if item["hist_chat_id"]:
+            item.update(_restored_lineage(item["hist_chat_id"], item["created_at"], ctx))
+        chat_id = _create_record_with_unique_id({"table_name": "chat_details", "key_name": "chat_id", "item": item})
+        logger.info(f'Item inserted to Chat table: {chat_id} {item}')
         logger.info('Chat created in Chats table')
+        if ctx:
+            ctx.remember_chat({**item, "chat_id": chat_id})
         return chat_id
     except ClientError as e:
         logger.error(f"Error storing Chat: {e.response['Error']['Message']}")
         return {"error": e.response['Error']['Message']}
 
-def _get_chat_by_chatid(chat_id):
+def _restored_lineage(hist_chat_id, created_at, ctx=None):
+    """root_chat_id and lineage for a chat restored from hist_chat_id.
+
+    lineage lists every ancestor with the time ("until") after which its messages are no longer part
+    of this conversation. Left empty when the parent is itself a restore from before lineages were
+    recorded; such chats keep being read by walking hist_chat_id.
+    """
+    parent = ctx.get_chat(hist_chat_id) if ctx else _get_chat_by_chatid(hist_chat_id, ["hist_chat_id", "root_chat_id", "lineage"])
+    if isinstance(parent, Exception):
+        raise parent
+    if parent.get("hist_chat_id") and not parent.get("root_chat_id"):
+        return {}
+    return {
+        "root_chat_id": parent.get("root_chat_id") or hist_chat_id,
+        "lineage": list(parent.get("lineage", [])) + [{"chat_id": hist_chat_id, "until": created_at}]
+    }
+
+def _get_chat_by_chatid(chat_id, projection=None):
     try:
-        chat = chats_table.query(
-            KeyConditionExpression= "chat_id = :c_id",
-            ExpressionAttributeValues={
-                ":c_id": chat_id})
+        chat = chats_table.query(**_apply_projection({
+            "KeyConditionExpression": "chat_id = :c_id",
+            "ExpressionAttributeValues": {
+                ":c_id": chat_id}}, projection))
         logger.info(chat["Items"][0])
         return chat["Items"][0]
     except Exception as e:
         return e
 
+def _get_session_by_sessionid(session_id, projection=None):
+    session = sessions_table.query(**_apply_projection({
+        "KeyConditionExpression": "session_id = :s_id",
+        "ExpressionAttributeValues": {
+            ":s_id": session_id}}, projection))["Items"]
+    logger.info(f"Session: {session}")
+    return session[0] if session else None
+
 def _check_user_chat_access(user_id, chat_id):
     try:
         chat = _get_chat_by_chatid(chat_id)
         logger.info(chat)
-        session_id = chat["session_id"]
-        session = sessions_table.query(KeyConditionExpression= "session_id = :s_id",
-            ExpressionAttributeValues={
-                ":s_id": session_id})["Items"][0]
-        logger.info(f"Session: {session}")
-        if session["user_id"] != user_id:
+        owner = chat.get("user_id")
+        if not owner:
+            # Chats created before user_id was stored on them
+            session = _get_session_by_sessionid(chat["session_id"], ["user_id"])
+            owner = session["user_id"] if session else None
+        if owner != user_id:
             raise Exception("Function Error: User does not have access to the chat.")
         return chat
     except Exception as error:
         logger.error(f"Unexpected error: {error}")
         raise error
 
-def _get_chats_by_userid_by_agent(user_id, agent_int_uid):
+def _chats_query(user_id, agent_int_uid, projection=None, before=None, after=None):
+    """Query on the user_agent index, newest first, optionally bounded to created_at in (after, before)."""
+    query = {
+        "table_name": "chat_details",
+        "gsi_name": USER_AGENT_INDEX,
+        "query_params": {"user_agent": _user_agent_key(user_id, agent_int_uid)},
+        "scan_index_forward": False,
+        "projection": projection,
+        # Table key and index keys, for cursors of filtered pages
+        "cursor_keys": ["chat_id", "user_agent", "created_at"]
+    }
+    window = _time_window(before, after)
+    if window:
+        query["query_params"]["created_at"] = window[1]
+        query["comparison_ops"] = {"created_at": window[0]}
+    return query
+
+def _iter_chats_by_userid_by_agent(user_id, agent_int_uid, projection=None, before=None, after=None):
+    """Yield the user's chats with an agent, newest first, page by page, from a single ranged query."""
+    if _empty_window(before, after):
+        return
+    yield from _iter_query_dynamodb(_chats_query(user_id, agent_int_uid, projection, before, after))
+
+def _get_chats_by_userid_by_agent(user_id, agent_int_uid, projection=None, before=None, after=None):
     try:
-        chats = chats_table.query(
-            IndexName="agent_int_uid-index",
-            KeyConditionExpression="agent_int_uid = :a_id",
-            ExpressionAttributeValues={":a_id": agent_int_uid}
-        )["Items"]
-        valid_chats = []
-        for chat in chats:
-            session_id = chat["session_id"]
-            session_result = sessions_table.query(
-                KeyConditionExpression="session_id = :s_id",
-                ExpressionAttributeValues={":s_id": session_id}
-            )
-            if session_result["Items"]:
-                session = session_result["Items"][0]
-                if session["user_id"] == user_id:
-                    valid_chats.append(chat)
+        valid_chats = list(_iter_chats_by_userid_by_agent(user_id, agent_int_uid, projection, before, after))
         logger.info(f"Chats: {valid_chats}")
         return valid_chats
     except Exception as e:
         logger.error(f"Function Error: {e}")
         raise Exception(f"Function Error: {e}")
 
-def _populate_chat_theme(chat_id, user_input):
+def _get_chats_page_by_userid_by_agent(user_id, agent_int_uid, limit, next_token=None, projection=None,
+                                       before=None, after=None, item_filter=None):
+    """One page of the user's chats with an agent, newest first: {"items": [...], "next_token": ...}."""
+    if _empty_window(before, after):
+        return {"items": [], "next_token": None}
+    query = _chats_query(user_id, agent_int_uid, projection, before, after)
+    return _query_dynamodb_page(dict(query, limit=limit, next_token=next_token, item_filter=item_filter))
+
+def _backfill_chat_owners(data):
+    """Copy the owning user_id (and the user_agent key) from the session onto chats created without it.
+
+    One resumable batch (see _run_resumable_scan); chats whose session no longer exists are skipped.
+    """
+    def _set_owners(chats, result):
+        sessions = _batch_get_records("sessions", [{"session_id": chat["session_id"]} for chat in chats
+                                                   if chat.get("session_id")], ["user_id"])
+        for chat in chats:
+            user_id = sessions.get(chat.get("session_id"), {}).get("user_id")
+            if not user_id:
+                result["skipped"] += 1
+                continue
+            try:
+                chats_table.update_item(
+                    Key={"chat_id": chat["chat_id"]},
+                    UpdateExpression="SET user_id = :u, user_agent = :ua",
+                    ConditionExpression="attribute_exists(chat_id) AND attribute_not_exists(user_agent)",
+                    ExpressionAttributeValues={":u": user_id,
+                                               ":ua": _user_agent_key(user_id, chat.get("agent_int_uid", ""))})
+                result["updated"] += 1
+            except ClientError as e:
+                # Deleted or already backfilled by a concurrent run since the page was read
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                result["skipped"] += 1
+
+    scan_args = _apply_projection({"FilterExpression": "attribute_not_exists(user_agent)"},
+                                  ["chat_id", "session_id", "agent_int_uid"])
+    return _run_resumable_scan(dict(data, table_name="chat_details", scan_args=scan_args), _set_owners)
+
+def _chat_theme_prompt(historical_theme, user_input):
+    if not historical_theme:
+        return (
+            "Summarize the following message with a theme in 3-5 words. "
+            f"The message is: '{user_input}'. "
+            "Return a concise and relevant theme."
+        )
+    return (
+        "Summarize the following conversation with a theme in 3-5 words. Keep it concise. "
+        f"The historical theme of the conversation is: '{historical_theme}'. "
+        f"The follow-up question is: '{user_input}'. "
+        "If the theme between the historical theme and follow-up question differs, prioritize the historical theme. "
+        "If the follow-up question aligns with the historical theme, refine the theme to better reflect the new input."
+    )
+
+def _populate_chat_theme(chat_id, user_input, chat=None):
     try:
-        chat = _get_chat_by_chatid(chat_id)
+        if chat is None:
+            chat = _get_chat_by_chatid(chat_id)
         historical_theme = chat.get("chat_theme", "").strip()
-        if not historical_theme:
-            system_prompt = (
-                "Summarize the following message with a theme in 3-5 words. "
-                f"The message is: '{user_input}'. "
-                "Return a concise and relevant theme."
-            )
-        else:
-            system_prompt = (
-                "Summarize the following conversation with a theme in 3-5 words. Keep it concise. "
-                f"The historical theme of the conversation is: '{historical_theme}'. "
-                f"The follow-up question is: '{user_input}'. "
-                "If the theme between the historical theme and follow-up question differs, prioritize the historical theme. "
-                "If the follow-up question aligns with the historical theme, refine the theme to better reflect the new input."
-            )
-        chat_theme = _get_ai_response({"prompt":system_prompt})
+        chat_theme = _get_ai_response({"prompt": _chat_theme_prompt(historical_theme, user_input)})
         updated_response = _update_data_in_table({"table_name": "chat_details", "key": "chat_id", "key_value": chat_id, "update_data": {"chat_theme": chat_theme}})
         return chat_theme
     except Exception as e:
-        raise Exception(f"Function Error: {e}")
\ No newline at end of file
+        raise Exception(f"Function Error: {e}")
+
+def _generate_chat_theme(chat_id, theme_request_id):
+    """Queue worker side of the theme update requested by _create_message.
+
+    Only the latest request for a chat does any work; it folds in every input queued since the
+    last theme. The write is conditioned on the request still being the latest, so a message that
+    arrives during generation gets its own pass. Returns the theme, or None when superseded or the
+    chat is gone.
+    """
+    try:
+        chat = _get_chat_by_chatid(chat_id, ["chat_id", "chat_theme", "theme_request_id", "theme_inputs"])
+        if isinstance(chat, IndexError):
+            # Deleted or expired since the request was queued; nothing left to theme
+            logger.info(f"Theme request {theme_request_id} for chat {chat_id} dropped, chat no longer exists")
+            return None
+        if isinstance(chat, Exception):
+            raise chat
+        if chat.get("theme_request_id") != theme_request_id:
+            logger.info(f"Theme request {theme_request_id} for chat {chat_id} superseded")
+            return None
+        user_input = "\n".join(chat.get("theme_inputs", []))
+        chat_theme = _get_ai_response({"prompt": _chat_theme_prompt(chat.get("chat_theme", "").strip(), user_input)})
+        chats_table.update_item(
+            Key={"chat_id": chat_id},
+            UpdateExpression="SET chat_theme = :theme REMOVE theme_request_id, theme_inputs",
+            ConditionExpression="theme_request_id = :req",
+            ExpressionAttributeValues={":theme": chat_theme, ":req": theme_request_id})
+        return chat_theme
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.info(f"Theme request {theme_request_id} for chat {chat_id} superseded during generation")
+            return None
+        raise Exception(f"Function Error: {e}")
+    except Exception as e:
+        raise Exception(f"Function Error: {e}")
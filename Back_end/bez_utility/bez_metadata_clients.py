@@ -1,13 +1,13 @@
-import json, logging, boto3, re, string
+import json, logging, re, string
 from botocore.exceptions import ClientError
 import time
 # import from bez resources
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists, _scan_table_with_filter
+from bez_utility.bez_utils_aws import _check_record_exists, _scan_table_with_filter, _batch_get_records, _create_record_with_unique_id
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
 from boto3.dynamodb.conditions import Attr
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 clients_table = dynamodb.Table("clients")
@@ -17,20 +17,6 @@ clients_privileges_table = dynamodb.Table("client_privileges")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def _get_client_id():
-    try:
-        client_id = _generate_uid({"n": "8"})
-        print('Client id is:', client_id)
-        client_id_exists = _check_record_exists({"table_name": "clients", "keys": {"client_id": client_id}, "gsi_name": ""})
-        # print('User Exists:', user_id_exists)
-        if client_id_exists:
-            _get_client_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise Exception(error)
-    logger.info(f'Unique Client id is:{client_id}')
-    return client_id
-
 def _make_short_name(client_name):
         common_terms = r'\b(The|Inc|LLC|Incorporated|Enterprises?|Services?|Ltd|Limited|Group|Management|' \
                     r'Capital|Partners|Associates|Company|Co|Ltd|Corp|Corporation|First|New|Of|And|Or|' \
@@ -70,11 +56,10 @@ def _check_client_name_short_exists(short_name):
     return short_name
     
 
-def _create_client_table_record(client_id, client_name, user_id):
+def _create_client_table_record(client_name, user_id):
     try:
         client_short_name = _check_client_name_short_exists(_make_short_name(client_name))
         item = {
-            "client_id": client_id,
             "client_name": client_name,
             "client_name_lower": client_name.lower(),
             "client_short_name": client_short_name,
@@ -84,8 +69,9 @@ def _create_client_table_record(client_id, client_name, user_id):
             "created_at": str(int(time.time())),
             "created_by": str(user_id),
         }
-        clients_table.put_item(Item=item)
-        logger.info(f"Client table record created: {item}")
+        client_id = _create_record_with_unique_id({"table_name": "clients", "key_name": "client_id", "item": item})
+        logger.info(f"Client table record created: {client_id} {item}")
+        return client_id
     except Exception as error:
         logger.error(f"Unexpected error: {error}")
         raise error
@@ -133,7 +119,7 @@ def _check_client_id_exists(client_id):
 def _get_all_client():
     try:
         filters = Attr('is_active').eq(True) & Attr('is_deleted').eq(False)
-        return _scan_table_with_filter({"table_name": "clients", "filters": filters})            
+        return _scan_table_with_filter({"table_name": "clients", "filter_expression": filters})
     except Exception as e:
         raise e
 
@@ -183,4 +169,12 @@ def _get_client_by_clientid(client_id):
             raise Exception(f"Function Error: Client not found.")
         return client["Item"]
     except Exception as e:
-        raise e
\ No newline at end of file
+        raise e
+
+def _get_clients_by_clientids(client_ids, projection=None):
+    """Batch fetch clients, keyed by client_id."""
+    try:
+        keys = [{"client_id": client_id} for client_id in client_ids if client_id]
+        return _batch_get_records("clients", keys, projection)
+    except Exception as e:
+        raise e
@@ -1,12 +1,12 @@
-import json, logging, boto3, re, time
+import json, logging, re, time
 from botocore.exceptions import ClientError
 
 # import from bez resources
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists
+from bez_utility.bez_utils_aws import _batch_get_records, _create_record_with_unique_id
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 int_table = dynamodb.Table("integrations")
@@ -37,23 +37,9 @@ def _check_user_access(user_id, integration_id):
         logger.error(f"Unexpected error: {error}")
         raise error
 
-def _get_int_id():
-    try:
-        int_id = _generate_uid({"n": "8"})
-        logger.info(f'Int id is: {int_id}')
-        int_id_exists = _check_record_exists({"table_name": "integrations", "keys": {"integration_id": int_id}, "gsi_name": ""})
-        if int_id_exists:
-            _get_int_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
-    logger.info(f'Unique Integration id is:{int_id}')
-    return int_id
-
-def _create_int_table_record(int_id, client_id, erp_name, int_name,user_id):
+def _create_int_table_record(client_id, erp_name, int_name,user_id):
     try:
         item = {
-            "integration_id": int_id,
             "client_id": client_id,
             "erp_name": erp_name,
             "integration_name": int_name,
@@ -62,8 +48,9 @@ def _create_int_table_record(int_id, client_id, erp_name, int_name,user_id):
             "created_at": str(int(time.time())),
             "created_by": str(user_id),
         }
-        int_table.put_item(Item=item)
-        logger.info(f"Int table record created: {item}")
+        int_id = _create_record_with_unique_id({"table_name": "integrations", "key_name": "integration_id", "item": item})
+        logger.info(f"Int table record created: {int_id} {item}")
+        return int_id
     except Exception as error:
         logger.error(f"Unexpected error: {error}")
         raise error
@@ -174,4 +161,20 @@ def _get_int_by_intid(integration_id):
             raise Exception(f"Function Error: Integration not found.")
         return integration["Item"]
     except Exception as e:
-        raise e
\ No newline at end of file
+        raise e
+
+def _get_ints_by_intids(integration_ids, projection=None):
+    """Batch fetch integrations, keyed by integration_id."""
+    try:
+        keys = [{"integration_id": integration_id} for integration_id in integration_ids if integration_id]
+        return _batch_get_records("integrations", keys, projection)
+    except Exception as e:
+        raise e
+
+def _get_int_privileges_for_user(user_id, int_client_ids):
+    """Batch fetch the user's int_privileges for (integration_id, client_id) pairs, keyed by int_privilege_id."""
+    try:
+        keys = [{"int_privilege_id": f"{integration_id}-{client_id}-{user_id}"} for integration_id, client_id in int_client_ids]
+        return _batch_get_records("int_privileges", keys)
+    except Exception as e:
+        raise e
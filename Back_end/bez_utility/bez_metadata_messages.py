@@ -1,15 +1,18 @@
-import json, time, logging
-import boto3
+import json, time, base64, logging
 from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Attr
 
 # import from bez resources
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists, _update_data_in_table, _get_record_from_table
+from bez_utility.bez_utils_aws import _create_record_with_unique_id, _send_queue_message, _update_data_in_table, _iter_query_pages, _apply_projection, _query_dynamodb, _query_dynamodb_page, _iter_query_dynamodb, _time_window, _empty_window, _batch_get_records, _run_resumable_scan
 from bez_utility.bez_metadata_agents import _check_user_agent_access
-from bez_utility.bez_metadata_chats import _check_user_chat_access, _populate_chat_theme
+from bez_utility.bez_metadata_chats import _check_user_chat_access, _populate_chat_theme, _user_agent_key, _get_chat_by_chatid, CHAT_THEME_QUEUE_URL, CHAT_THEME_DEBOUNCE_SECONDS
+from bez_utility.bez_utils_common import _generate_sortable_id, _json_default
+from bez_utility.bez_message_bodies import _body_update, _stored_text, _resolve_message_bodies, _resolve_param, AI_RESPONSE_INLINE_BYTES
+from bez_utility.bez_answer_format import _normalize_answer, ANSWER_FORMAT_VERSION
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 msgs_table = dynamodb.Table("message_details")
@@ -18,67 +21,106 @@ msgs_table = dynamodb.Table("message_details")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def _get_message_id():
-    try:
-        message_id = _generate_uid({"n": "16"})
-        print('Message id is:', message_id)
-        message_id_exists = _check_record_exists({"table_name": "message_details", "keys": {"message_id": message_id}, "gsi_name": ""})
-        # print('Chat Exists:', message_id)
-        if message_id_exists:
-            _get_message_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
-    logger.info(f'Unique Chat id is:{message_id}')
-    return message_id
-
-def _is_firstfew_message(chat_id, agent_int_uid):
-    if not agent_int_uid or not chat_id:
-        raise Exception("Function Error Required parameters missing.")
+# Sparse index: only starred messages carry starred_owner ("<user_id>#<agent_int_uid>")
+STARRED_INDEX = "starred_owner-created_at-index"
+# Every message of a restored conversation shares the root_chat_id of its first chat
+ROOT_CHAT_INDEX = "root_chat_id-created_at-index"
+# Same partition, sorted by the last write (epoch milliseconds); serves the delta feed
+ROOT_CHAT_UPDATES_INDEX = "root_chat_id-updated_at-index"
+# Index reads are eventually consistent, so each delta re-reads this much before the watermark and
+# skips what the token says was already delivered
+DELTA_OVERLAP_MS = 2000
+DELTA_MAX_ITEMS = 200
+DELTA_FIELDS = ["message_id", "created_at", "updated_at", "status", "user_input", "ai_response", "ai_response_ref",
+                "answer", "answer_ref", "answer_valid", "is_starred"]
+
+def _now_ms():
+    return str(int(time.time() * 1000))
+
+def _get_chat_message_count(chat):
+    """Messages already in the chat, from its message_count counter.
+
+    Chats created before the counter existed are counted once with a COUNT query; the result seeds
+    the counter on the next message write.
+    """
+    if "message_count" in chat:
+        return int(chat["message_count"])
     try:
-        msgs = msgs_table.query(
-            IndexName="agent_int_uid-chat_id-index",
-            KeyConditionExpression="agent_int_uid = :uid AND chat_id = :chat_id",
-            ExpressionAttributeValues={
-                ":uid": agent_int_uid,
-                ":chat_id": chat_id
-            }
-        )
-        if len(msgs.get('Items', [])) < 3:
-            logger.info(f"Proceeding to populate chat theme for agent_int_uid: {agent_int_uid} and chat_id: {chat_id}.")
-            return True
-        else:
-            logger.info(f"Skipping chat theme population for agent_int_uid: {agent_int_uid} and chat_id: {chat_id}.")
-            return False
+        query_args = {
+            "IndexName": "chat_id-created_at-index",
+            "KeyConditionExpression": "chat_id = :c_id",
+            "ExpressionAttributeValues": {":c_id": chat["chat_id"]},
+            "Select": "COUNT"
+        }
+        return sum(page.get("Count", 0) for page in _iter_query_pages(msgs_table, query_args))
     except Exception as e:
         logger.error(f"Error querying DynamoDB: {str(e)}", exc_info=True)
-        raise Exception(f"Function Error {e}") 
+        raise Exception(f"Function Error {e}")
+
+def _is_firstfew_message(message_count):
+    if message_count < 3:
+        logger.info(f"Proceeding to populate chat theme, {message_count} messages in chat.")
+        return True
+    logger.info(f"Skipping chat theme population, {message_count} messages in chat.")
+    return False
 
-def _create_message(data):
+def _request_chat_theme(chat_id, theme_request_id):
+    """Queue a theme update, delayed so messages sent in quick succession collapse into one."""
+    try:
+        _send_queue_message(CHAT_THEME_QUEUE_URL, {"chat_id": chat_id, "theme_request_id": theme_request_id},
+                            CHAT_THEME_DEBOUNCE_SECONDS)
+    except Exception as e:
+        # The message is already stored; a missing theme must not fail the request
+        logger.error(f"Could not queue chat theme for {chat_id}: {e}")
+
+def _create_message(data, ctx=None):
     try:
-        message_id = _get_message_id() 
         agent_int_uid = data.get("agent_int_uid", "")
         chat_id = data.get("chat_id", "")
         user_input = data.get("user_input", "")
-        is_first = _is_firstfew_message(chat_id, agent_int_uid)
-        if is_first:
-            chat_theme = _populate_chat_theme(chat_id, user_input)
+        chat = ctx.get_chat(chat_id) if ctx else _get_chat_by_chatid(chat_id, ["chat_id", "root_chat_id", "chat_theme", "message_count"])
+        if isinstance(chat, Exception):
+            raise chat
+        message_count = _get_chat_message_count(chat)
+        is_first = _is_firstfew_message(message_count)
+        if is_first and not CHAT_THEME_QUEUE_URL:
+            chat_theme = _populate_chat_theme(chat_id, user_input, chat)
         current_time = int(time.time())
         expiry_in_days = data.get("expiry_in_days", 30)
         logger.info(f'Expiry in days: {expiry_in_days}')
         ttl_time = current_time + (int(expiry_in_days) * 24 * 60 * 60)
         item = {
-            "message_id": message_id,
             "agent_int_uid": agent_int_uid,
             "chat_id": chat_id,
             "created_at": str(int(time.time())),
-            "ttl": str(ttl_time),
+            "ttl": ttl_time,  # numeric: DynamoDB TTL ignores string values
             "summarized": False,
-            "user_input": user_input
+            "user_input": user_input,
+            "root_chat_id": chat.get("root_chat_id") or chat_id,
+            "updated_at": _now_ms()
         }
-        logger.info(f'Item inserted to Message table: {item}')
-        response = msgs_table.put_item(Item=item)
+        # The counter moves in the same transaction as the insert, so it never drifts from the messages
+        count_update = {"Update": {
+            "TableName": "chat_details",
+            "Key": {"chat_id": chat_id},
+            "UpdateExpression": "SET message_count = if_not_exists(message_count, :base) + :one",
+            "ConditionExpression": "attribute_exists(chat_id)",
+            "ExpressionAttributeValues": {":base": message_count, ":one": 1}
+        }}
+        theme_request_id = None
+        if is_first and CHAT_THEME_QUEUE_URL:
+            # Record the input for the theme worker; a newer request id supersedes any queued one
+            theme_request_id = _generate_sortable_id()
+            count_update["Update"]["UpdateExpression"] += (", theme_request_id = :req,"
+                                                           " theme_inputs = list_append(if_not_exists(theme_inputs, :none), :input)")
+            count_update["Update"]["ExpressionAttributeValues"].update(
+                {":req": theme_request_id, ":none": [], ":input": [user_input]})
+        message_id = _create_record_with_unique_id({"table_name": "message_details", "key_name": "message_id",
+                                                    "item": item, "transact_actions": [count_update]})
+        logger.info(f'Item inserted to Message table: {message_id} {item}')
         logger.info('Message created in Messages table')
+        if theme_request_id:
+            _request_chat_theme(chat_id, theme_request_id)
         return message_id
     except ClientError as e:
         logger.error(f"Error storing Chat: {e.response['Error']['Message']}")
@@ -109,12 +151,25 @@ def _mark_star_message(event):
             return {
                 'statusCode': 400,
                 'body': 'Invalid message status, must be either true or false'}
-        _update_data_in_table({
+        update = {
             "table_name": "message_details",
             "key": "message_id",
             "key_value": str(message_id),
-            "update_data": {"is_starred": is_starred}
-        })
+            # updated_at moves the message past delta watermarks, so /chat_updates delivers the change
+            "update_data": {"is_starred": is_starred, "updated_at": _now_ms()},
+            # The message must belong to the chat the access check ran against
+            "condition_expression": Attr("chat_id").eq(chat_access["chat_id"])
+        }
+        if is_starred == 'true':
+            update["update_data"]["starred_owner"] = _user_agent_key(user_id, agent_int_uid)
+        else:
+            update["remove_attributes"] = ["starred_owner"]
+        try:
+            _update_data_in_table(update)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return {'statusCode': 400, 'body': json.dumps({'error': 'Message not found in this chat.'})}
+            raise
         result = {"message": f"Star status of message {message_id} is updated."}
         return {'statusCode': 200, 'body': json.dumps(result)}
     except Exception as e:
@@ -132,54 +187,261 @@ def _get_starred_messages(event):
         elif not agent_int_uid:
             return {"statusCode": 400, "body": "Please select an agent to continue."}
 
-        sessions = _get_record_from_table({
-            "table_name": "sessions",
-            "keys": {"user_id": user_id},
-            "gsi_name": "user_id-index"
-        })
-        session_ids = [s["session_id"] for s in sessions]
-        if not session_ids:
-            return {"statusCode": 200, "body": json.dumps({"starred_messages": []})}
-        chat_ids = []
-        for session_id in session_ids:
-            chats = _get_record_from_table({
-                "table_name": "chat_details",
-                "keys": {
-                    "session_id": session_id,
-                    "agent_int_uid": agent_int_uid
-                },
-                "gsi_name": "session_id-agent_int_uid-index"
-            })
-            chat_ids.extend([chat["chat_id"] for chat in chats])
-        if not chat_ids:
-            return {"statusCode": 200, "body": json.dumps({"starred_messages": []})}
-        # Query all starred messages for this agent in one go
-        response = msgs_table.query(
-            IndexName="agent_int_uid-is_starred-index",
-            KeyConditionExpression="agent_int_uid = :uid AND is_starred = :flag",
-            ExpressionAttributeValues={
-                ":uid": agent_int_uid,
-                ":flag": "true"
-            }
-        )
-        all_starred = response.get('Items', [])
-        # Filter only user's chats
-        starred_messages = [msg for msg in all_starred if msg.get("chat_id") in chat_ids]
-        starred_messages.sort(key=lambda x: int(x.get("created_at", 0)), reverse=True)
-        return {"statusCode": 200, "body": json.dumps({"starred_messages": starred_messages})}
+        params = event.get('queryStringParameters') or {}
+        query = {
+            "table_name": "message_details",
+            "gsi_name": STARRED_INDEX,
+            "query_params": {"starred_owner": _user_agent_key(user_id, agent_int_uid)},
+            "scan_index_forward": False
+        }
+        resolve_bodies, body_ids = _resolve_param(params.get("resolve_bodies"))
+        # Newest first; with a limit the caller pages through with next_token
+        if params.get("limit"):
+            page = _query_dynamodb_page(dict(query, limit=params["limit"], next_token=params.get("next_token")))
+            if resolve_bodies:
+                _resolve_message_bodies(page["items"], body_ids)
+            return {"statusCode": 200, "body": json.dumps({"starred_messages": page["items"],
+                                                           "next_token": page["next_token"]}, default=_json_default)}
+        starred_messages = _query_dynamodb(query)
+        if resolve_bodies:
+            _resolve_message_bodies(starred_messages, body_ids)
+        return {"statusCode": 200, "body": json.dumps({"starred_messages": starred_messages}, default=_json_default)}
     except Exception as e:
+        if "Function Error:" in str(e):
+            return {"statusCode": 400, "body": json.dumps({"error": str(e)[len("Function Error: "):]})}
         logger.error(f"Error retrieving starred messages: {str(e)}", exc_info=True)
         return {"statusCode": 500, "body": json.dumps({"error": f"Error retrieving starred messages: {str(e)}"})}
 
-def _get_messages(chat_id):
+def _backfill_starred_owners(data):
+    """Set starred_owner on messages starred before the starred index existed.
+
+    The owner comes from the chat's user_id, or its session for chats not yet backfilled.
+    One resumable batch (see _run_resumable_scan).
+    """
+    def _set_owners(messages, result):
+        chats = _batch_get_records("chat_details", [{"chat_id": msg["chat_id"]} for msg in messages
+                                                    if msg.get("chat_id")], ["user_id", "session_id"])
+        legacy_sessions = [{"session_id": chat["session_id"]} for chat in chats.values()
+                           if not chat.get("user_id") and chat.get("session_id")]
+        sessions = _batch_get_records("sessions", legacy_sessions, ["user_id"]) if legacy_sessions else {}
+        for msg in messages:
+            chat = chats.get(msg.get("chat_id"), {})
+            user_id = chat.get("user_id") or sessions.get(chat.get("session_id"), {}).get("user_id")
+            if not user_id:
+                result["skipped"] += 1
+                continue
+            _conditional_backfill(result, Key={"message_id": msg["message_id"]},
+                                  UpdateExpression="SET starred_owner = :o",
+                                  ConditionExpression="is_starred = :t AND attribute_not_exists(starred_owner)",
+                                  ExpressionAttributeValues={":t": "true",
+                                                             ":o": _user_agent_key(user_id, msg.get("agent_int_uid", ""))})
+
+    scan_args = _apply_projection({"FilterExpression": "is_starred = :t AND attribute_not_exists(starred_owner)",
+                                   "ExpressionAttributeValues": {":t": "true"}},
+                                  ["message_id", "chat_id", "agent_int_uid"])
+    return _run_resumable_scan(dict(data, table_name="message_details", scan_args=scan_args), _set_owners)
+
+def _backfill_message_roots(data):
+    """Set root_chat_id on messages written before the root index existed.
+
+    Run it before relying on lineage reads in _retrieve_chat; one resumable batch (see _run_resumable_scan).
+    """
+    def _set_roots(messages, result):
+        chats = _batch_get_records("chat_details", [{"chat_id": msg["chat_id"]} for msg in messages
+                                                    if msg.get("chat_id")], ["root_chat_id"])
+        for msg in messages:
+            if msg.get("chat_id") not in chats:
+                result["skipped"] += 1
+                continue
+            root_chat_id = chats[msg["chat_id"]].get("root_chat_id") or msg["chat_id"]
+            _conditional_backfill(result, Key={"message_id": msg["message_id"]},
+                                  UpdateExpression="SET root_chat_id = :r",
+                                  ConditionExpression="attribute_exists(message_id) AND attribute_not_exists(root_chat_id)",
+                                  ExpressionAttributeValues={":r": root_chat_id})
+
+    scan_args = _apply_projection({"FilterExpression": "attribute_not_exists(root_chat_id)"},
+                                  ["message_id", "chat_id"])
+    return _run_resumable_scan(dict(data, table_name="message_details", scan_args=scan_args), _set_roots)
+
+def _offload_large_responses(data):
+    """Move ai_response bodies over AI_RESPONSE_INLINE_BYTES that were written inline out to S3.
+
+    The item is only changed if its response is still the one that was read; updated_at is left
+    alone since the content is the same. One resumable batch (see _run_resumable_scan).
+    """
+    def _offload(messages, result):
+        for msg in messages:
+            update_data, _ = _body_update(msg["message_id"], "ai_response", msg["ai_response"])
+            if "ai_response_ref" not in update_data:
+                # Over the limit in characters but not in encoded bytes
+                result["skipped"] += 1
+                continue
+            _conditional_backfill(result, Key={"message_id": msg["message_id"]},
+                                  UpdateExpression="SET ai_response_ref = :r REMOVE ai_response",
+                                  ConditionExpression="ai_response = :old",
+                                  ExpressionAttributeValues={":r": update_data["ai_response_ref"],
+                                                             ":old": msg["ai_response"]})
+
+    scan_args = _apply_projection({"FilterExpression": "size(ai_response) > :n",
+                                   "ExpressionAttributeValues": {":n": AI_RESPONSE_INLINE_BYTES}},
+                                  ["message_id", "ai_response"])
+    return _run_resumable_scan(dict(data, table_name="message_details", scan_args=scan_args), _offload)
+
+def _backfill_answers(data):
+    """Write the canonical answer (see _answer_update) on messages stored before it existed or with an
+    older ANSWER_FORMAT_VERSION.
+
+    Responses kept in S3 are fetched in parallel per page; answer_tokens already recorded are kept. A message the workflow rewrote meanwhile is
+    left to that write. One resumable batch (see _run_resumable_scan).
+    """
+    def _normalize(messages, result):
+        _resolve_message_bodies(messages)
+        for msg in messages:
+            update_data, remove_attributes = _answer_update(msg["message_id"], msg.get("ai_response"))
+            # The usage recorded when the answer was written is not known here; keep it
+            remove_attributes.remove("answer_tokens")
+            _conditional_backfill(result, Key={"message_id": msg["message_id"]},
+                                  UpdateExpression=" ".join([
+                                      "SET " + ", ".join(f"#{k} = :{k}" for k in update_data),
+                                      "REMOVE " + ", ".join(f"#{k}" for k in remove_attributes)]),
+                                  ConditionExpression="attribute_not_exists(answer_version) OR answer_version < :version",
+                                  ExpressionAttributeNames={f"#{k}": k for k in list(update_data) + remove_attributes},
+                                  ExpressionAttributeValues=dict({f":{k}": v for k, v in update_data.items()},
+                                                                 **{":version": ANSWER_FORMAT_VERSION}))
+
+    scan_args = _apply_projection({
+        "FilterExpression": ("(attribute_exists(ai_response) OR attribute_exists(ai_response_ref)) AND "
+                             "(attribute_not_exists(answer_version) OR answer_version < :version)"),
+        "ExpressionAttributeValues": {":version": ANSWER_FORMAT_VERSION}}, ["message_id", "ai_response", "ai_response_ref"])
+    return _run_resumable_scan(dict(data, table_name="message_details", scan_args=scan_args), _normalize)
+
+def _conditional_backfill(result, **update_args):
+    try:
+        msgs_table.update_item(**update_args)
+        result["updated"] += 1
+    except ClientError as e:
+        # Changed or already backfilled by a concurrent run since the page was read
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        result["skipped"] += 1
+
+def _iter_messages(chat_id, projection=None):
+    """Yield a chat's messages oldest first, one DynamoDB page at a time."""
+    query_args = {
+        "IndexName": "chat_id-created_at-index",
+        "KeyConditionExpression": "chat_id = :c_id",
+        "ExpressionAttributeValues": {":c_id": chat_id},
+        "ScanIndexForward": True
+    }
+    _apply_projection(query_args, projection)
+    for page in _iter_query_pages(msgs_table, query_args):
+        yield from page.get('Items', [])
+
+def _lineage_filter(chat):
+    """For a restored conversation, a predicate that drops messages an ancestor received after the
+    conversation was restored from it (they belong to another branch); None for other chats.
+
+    Applied in Python because a FilterExpression cannot reference the index sort key.
+    """
+    if not chat.get("root_chat_id"):
+        return None
+    cutoffs = {link["chat_id"]: int(link["until"]) for link in chat.get("lineage", [])}
+    return lambda msg: msg["chat_id"] == chat["chat_id"] or int(msg["created_at"]) <= cutoffs.get(msg["chat_id"], -1)
+
+def _conversation_query(chat, before=None, after=None, newest_first=False):
+    """Query for every message of a chat's conversation with created_at in (after, before), plus
+    the item filter to apply; a restored conversation is read from the root index."""
+    if chat.get("root_chat_id"):
+        query = {"table_name": "message_details", "gsi_name": ROOT_CHAT_INDEX,
+                 "query_params": {"root_chat_id": chat["root_chat_id"]},
+                 "cursor_keys": ["message_id", "root_chat_id", "created_at"]}
+    else:
+        query = {"table_name": "message_details", "gsi_name": "chat_id-created_at-index",
+                 "query_params": {"chat_id": chat["chat_id"]},
+                 "cursor_keys": ["message_id", "chat_id", "created_at"]}
+    window = _time_window(before, after)
+    if window:
+        query["query_params"]["created_at"] = window[1]
+        query["comparison_ops"] = {"created_at": window[0]}
+    if newest_first:
+        query["scan_index_forward"] = False
+    return query, _lineage_filter(chat)
+
+def _iter_conversation_messages(chat, before=None, after=None):
+    """Yield every message of the chat's conversation oldest first, from one ranged query."""
+    if _empty_window(before, after):
+        return
+    query, item_filter = _conversation_query(chat, before, after)
+    messages = _iter_query_dynamodb(query)
+    yield from filter(item_filter, messages) if item_filter else messages
+
+def _get_conversation_page(chat, limit, next_token=None, before=None, after=None):
+    """The newest `limit` messages of the conversation in the window, returned oldest first.
+
+    next_token continues with the next older page.
+    """
+    if _empty_window(before, after):
+        return {"items": [], "next_token": None}
+    query, item_filter = _conversation_query(chat, before, after, newest_first=True)
+    page = _query_dynamodb_page(dict(query, limit=limit, next_token=next_token, item_filter=item_filter))
+    page["items"].reverse()
+    return page
+
+def _encode_watermark(watermark, delivered):
+    return base64.urlsafe_b64encode(json.dumps({"w": watermark, "s": sorted(delivered)},
+                                               separators=(",", ":")).encode("utf-8")).decode("utf-8")
+
+def _decode_watermark(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode("utf-8")).decode("utf-8"))
+        return int(state["w"]), set(state.get("s", []))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise Exception("Function Error: Invalid watermark. Please reload the chat and try again.")
+
+def _initial_watermark():
+    """Watermark for a client that has just read the conversation: later writes show up as deltas."""
+    return _encode_watermark(int(_now_ms()), [])
+
+def _get_conversation_delta(chat, watermark_token=None, max_items=DELTA_MAX_ITEMS, resolve_bodies=False, body_ids=None):
+    """Messages of the chat's conversation written after the watermark, as compact rows.
+
+    Reads the root_chat_id/updated_at index from just before the watermark, so the cost follows what
+    changed rather than the length of the conversation. The next watermark also records the
+    (message_id, updated_at) pairs already delivered inside the overlap window so they are not sent
+    twice. User input is only sent for messages created since the watermark; it never changes.
+    With resolve_bodies, responses stored in S3 are fetched (only those in body_ids when given).
+    """
+    watermark, delivered = _decode_watermark(watermark_token) if watermark_token else (0, set())
+    query = {"table_name": "message_details", "gsi_name": ROOT_CHAT_UPDATES_INDEX,
+             "query_params": {"root_chat_id": chat.get("root_chat_id") or chat["chat_id"],
+                              "updated_at": str(max(watermark - DELTA_OVERLAP_MS, 0))},
+             "comparison_ops": {"updated_at": "gt"}}
+    lineage_filter = _lineage_filter(chat)
+    changed, has_more = [], False
+    for msg in _iter_query_dynamodb(query):
+        if f"{msg['message_id']}:{msg['updated_at']}" in delivered or (lineage_filter and not lineage_filter(msg)):
+            continue
+        if len(changed) >= max_items:
+            has_more = True
+            break
+        changed.append(msg)
+    if resolve_bodies:
+        _resolve_message_bodies(changed, body_ids)
+    rows = []
+    for msg in changed:
+        row = {field: msg.get(field) for field in DELTA_FIELDS}
+        if int(msg["created_at"]) * 1000 < watermark - DELTA_OVERLAP_MS:
+            row["user_input"] = None
+        rows.append([row[field] for field in DELTA_FIELDS])
+        delivered.add(f"{msg['message_id']}:{msg['updated_at']}")
+        watermark = max(watermark, int(msg["updated_at"]))
+    delivered = [pair for pair in delivered if int(pair.rsplit(":", 1)[1]) > watermark - DELTA_OVERLAP_MS]
+    return {"fields": DELTA_FIELDS, "rows": rows, "has_more": has_more,
+            "watermark": _encode_watermark(watermark, delivered)}
+
+def _get_messages(chat_id, projection=None):
     try:
-        response = msgs_table.query(
-            IndexName="chat_id-created_at-index",
-            KeyConditionExpression="chat_id = :c_id",
-            ExpressionAttributeValues={":c_id": chat_id},
-            ScanIndexForward=True
-        )
-        messages = response.get('Items', [])
+        messages = list(_iter_messages(chat_id, projection))
         logger.info(f'Messages fetched for chat id {chat_id}: {messages}')
         return messages
     except ClientError as e:
@@ -192,33 +454,72 @@ def _update_msg_status(msg_id, status):
             "table_name": "message_details",
             "key": "message_id",
             "key_value": str(msg_id),
-            "update_data": {"status": status}
+            "update_data": {"status": status, "updated_at": _now_ms()}
         })
         logger.info("Successfully updated message status")
         return "Successfully updated message status"
     except Exception as e:
         raise Exception(f"Function Error {str(e)}")
 
-def _get_msg_by_msgid(msg_id):
+def _get_msg_by_msgid(msg_id, projection=None):
     try:
-        msg = msgs_table.query(
-            KeyConditionExpression= "message_id = :m_id",
-            ExpressionAttributeValues={
-                ":m_id": msg_id})
+        msg = msgs_table.query(**_apply_projection({
+            "KeyConditionExpression": "message_id = :m_id",
+            "ExpressionAttributeValues": {
+                ":m_id": msg_id}}, projection))
         logger.info(msg["Items"][0])
         return msg["Items"][0]
     except Exception as e:
         raise Exception(f"Function Error {str(e)}")
 
-def _update_msg_output(msg_id, output):
+def _answer_update(msg_id, output, usage=None, stored=None):
+    """(update_data, remove_attributes) for the canonical answer of a raw workflow output.
+
+    answer holds the plain markdown (or answer_ref when large), answer_valid is false for errors and
+    empty answers, answer_version is the ANSWER_FORMAT_VERSION and answer_tokens the model usage when known.
+    stored is the object output was written to (see _body_update); it backs a large answer only when it
+    gives back exactly that answer.
+    """
+    normalized = _normalize_answer(output, usage)
+    if stored and _stored_text(stored, output) != normalized["answer"]:
+        stored = None
+    update_data, remove_attributes = _body_update(str(msg_id), "answer", normalized["answer"], stored)
+    update_data.update({"answer_valid": normalized["valid"], "answer_version": normalized["format_version"]})
+    if normalized["tokens"]:
+        update_data["answer_tokens"] = normalized["tokens"]
+    else:
+        remove_attributes.append("answer_tokens")
+    return update_data, remove_attributes
+
+def _update_msg_output(msg_id, output, usage=None, stored=None):
     try:
+        # Large responses go to S3 and the item keeps a pointer (see bez_message_bodies); stored is the
+        # object the workflow already wrote output to
+        update_data, remove_attributes = _body_update(str(msg_id), "ai_response", output, stored)
+        answer_data, answer_removes = _answer_update(msg_id, output, usage, stored)
         _update_data_in_table({
             "table_name": "message_details",
             "key": "message_id",
             "key_value": str(msg_id),
-            "update_data": {"ai_response": output}
+            "update_data": dict(update_data, **answer_data, updated_at=_now_ms()),
+            "remove_attributes": remove_attributes + answer_removes
         })
         logger.info("Successfully updated response in msg table.")
         return "Successfully updated message output"
+    except Exception as e:
+        raise Exception(f"Function Error {str(e)}")
+
+def _update_msg_answer(msg_id, output, usage=None, stored=None):
+    """Store only the canonical answer, for workflows whose raw output lives elsewhere (the MD&A report in S3)."""
+    try:
+        update_data, remove_attributes = _answer_update(msg_id, output, usage, stored)
+        _update_data_in_table({
+            "table_name": "message_details",
+            "key": "message_id",
+            "key_value": str(msg_id),
+            "update_data": dict(update_data, updated_at=_now_ms()),
+            "remove_attributes": remove_attributes
+        })
+        return "Successfully updated message answer"
     except Exception as e:
         raise Exception(f"Function Error {str(e)}")
\ No newline at end of file
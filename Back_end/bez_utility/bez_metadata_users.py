@@ -1,13 +1,12 @@
 import json, time, logging
-import boto3
 from botocore.exceptions import ClientError
 
 #import from bez functions
-from bez_utility.bez_utils_common import _generate_uid
-from bez_utility.bez_utils_aws import _check_record_exists, _get_record_from_table
+from bez_utility.bez_utils_aws import _create_record_with_unique_id, _get_record_from_table
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 users_table = dynamodb.Table("users")
@@ -16,27 +15,9 @@ users_table = dynamodb.Table("users")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-def _get_user_id():
-    try:
-        user_id = _generate_uid({"n": "8"})
-        print('User id is:', user_id)
-        user_id_exists = _check_record_exists({"table_name": "users",
-                                                "keys": {"user_id": user_id},
-                                                "gsi_name": ""})
-        # print('User Exists:', user_id_exists)
-        if user_id_exists:
-            _get_user_id()
-    except Exception as error:
-        logger.error(f"Unexpected error: {error}")
-        raise error
-    logger.info(f'Unique User id is:{user_id}')
-    return user_id
-
 def _create_user(data):
     try:
-        user_id = _get_user_id()
         item = {
-            "user_id": user_id,
             "auth0_id": data.get("auth0_id", ""),
             "created_at": str(int(time.time())),
             "email": data.get("email", "").lower(),
@@ -46,8 +27,8 @@ def _create_user(data):
             "is_super_admin": False,
             "last_name": data.get("last_name", "")
         }
-        logger.info(f'Item inserted to User table: {item}')
-        response = users_table.put_item(Item=item)
+        user_id = _create_record_with_unique_id({"table_name": "users", "key_name": "user_id", "item": item})
+        logger.info(f'Item inserted to User table: {user_id} {item}')
         logger.info('User created in Users table')
         return user_id
     except ClientError as e:
@@ -78,7 +59,8 @@ def _get_user_by_id(data):
         user_id = data.get("user_id")
         item = _get_record_from_table({"table_name": "users",
                                     "keys": {"user_id": user_id},
-                                    "gsi_name": ""})
+                                    "gsi_name": "",
+                                    "projection": data.get("projection")})
         if item:
             return item
         else:
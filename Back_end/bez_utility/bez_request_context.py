@@ -0,0 +1,78 @@
+import logging
+
+# import from bez resources
+from bez_utility.bez_metadata_agents import _check_user_agent_access
+from bez_utility.bez_metadata_chats import _get_chat_by_chatid, _get_session_by_sessionid
+from bez_utility.bez_metadata_messages import _get_msg_by_msgid
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+class RequestContext:
+    """Caller identity plus memoized access checks and metadata reads for a single invocation.
+
+    Build one per event and hand it to the metadata helpers so that no DynamoDB item is
+    fetched twice while serving the same request.
+    """
+
+    def __init__(self, event):
+        authorizer = (event.get("requestContext") or {}).get("authorizer") or {}
+        self.user_id = authorizer.get("user_id", None)
+        self.session_id = authorizer.get("session_id", None)
+        self._agent_privileges = {}
+        self._chats = {}
+        self._sessions = {}
+        self._messages = {}
+
+    def check_agent_access(self, agent_int_uid):
+        if agent_int_uid not in self._agent_privileges:
+            self._agent_privileges[agent_int_uid] = _check_user_agent_access(self.user_id, agent_int_uid)
+        return self._agent_privileges[agent_int_uid]
+
+    def get_chat(self, chat_id):
+        if chat_id not in self._chats:
+            chat = _get_chat_by_chatid(chat_id)
+            if isinstance(chat, Exception):
+                raise chat
+            self._chats[chat_id] = chat
+        return self._chats[chat_id]
+
+    def remember_chat(self, chat):
+        """Seed the memo with a chat this request just wrote so it is never read back."""
+        self._chats[chat["chat_id"]] = chat
+
+    def get_session(self, session_id, projection=None):
+        return self._get_memoized(self._sessions, session_id, projection, _get_session_by_sessionid)
+
+    def get_message(self, message_id, projection=None):
+        return self._get_memoized(self._messages, message_id, projection, _get_msg_by_msgid)
+
+    @staticmethod
+    def _get_memoized(memo, key, projection, loader):
+        """Serve a read from the memo when the cached entry holds every requested attribute.
+
+        Entries remember which attributes they were read with (None for the full item); a request
+        for more widens the next read to the union so later callers hit the memo.
+        """
+        wanted = set(projection) if projection else None
+        if key in memo:
+            item, attributes = memo[key]
+            if attributes is None or (wanted is not None and wanted <= attributes):
+                return item
+            wanted = None if wanted is None else wanted | attributes
+        item = loader(key, sorted(wanted) if wanted else None)
+        memo[key] = (item, wanted)
+        return item
+
+    def check_chat_access(self, chat_id):
+        chat = self.get_chat(chat_id)
+        owner = chat.get("user_id")
+        if not owner:
+            # Chats created before user_id was stored on them
+            session = self.get_session(chat["session_id"], ["user_id"])
+            owner = session["user_id"] if session else None
+        if owner != self.user_id:
+            raise Exception("Function Error: User does not have access to the chat.")
+        return chat
@@ -1,21 +1,54 @@
-import boto3, json, logging, base64
+import boto3, json, logging, base64, time, random, queue, threading
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import BotoCoreError, ClientError
 from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
 from botocore.config import Config
 
+# import from bez resources
+from bez_utility.bez_utils_common import _generate_sortable_id
+from bez_utility.bez_utils_backend import _get_dynamodb_resource, _new_dynamodb_resource, _get_s3_client, _get_secrets_manager_client, _get_sqs_client
+
 # Initialize DynamoDB resource
-dynamodb = boto3.resource('dynamodb')
-secrets_manager = boto3.client('secretsmanager')
+dynamodb = _get_dynamodb_resource()
+secrets_manager = _get_secrets_manager_client()
 s3_config = Config(
     max_pool_connections=100,
     retries={'max_attempts': 10}
 )
-s3 = boto3.client('s3', config=s3_config)
+s3 = _get_s3_client(s3_config)
+sqs = _get_sqs_client()
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Upper bound on items returned by the eager (all pages) query mode
+QUERY_MAX_ITEMS = 10000
+# Items read per query when a page is filtered in Python, however few are still needed
+FILTERED_QUERY_PAGE_ITEMS = 250
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_CHUNK_SIZE = 100
+BATCH_GET_MAX_RETRIES = 6
+# TransactWriteItems accepts at most 100 actions per request
+TRANSACT_WRITE_CHUNK_SIZE = 100
+ID_ALLOCATION_MAX_ATTEMPTS = 5
+# Parallel scan: worker threads per scan and pages buffered between the workers and the consumer
+SCAN_MAX_WORKERS = 8
+SCAN_QUEUE_PAGES = 16
+# Pages one invocation of a resumable backfill handles before handing back a resume key
+BACKFILL_MAX_PAGES = 50
+type_serializer = TypeSerializer()
+type_deserializer = TypeDeserializer()
+
+
+class TransactionConditionFailed(Exception):
+    """A condition on one action cancelled a TransactWriteItems call; index is that action's position."""
+
+    def __init__(self, message, index):
+        super().__init__(message)
+        self.index = index
+
 
 # DynamoDB functions
 def _check_record_exists(data):
@@ -61,21 +94,9 @@ def _get_record_from_table(data):
             raise ValueError("Table name and at least one key are required.")
         table = dynamodb.Table(table_name)
         if gsi_name:
-            key_conditions = []
-            expression_values = {}
-            for idx, (key, value) in enumerate(keys.items()):
-                key_conditions.append(f"{key} = :val{idx}")
-                expression_values[f":val{idx}"] = value
-            key_condition_expression = " AND ".join(key_conditions)
-            response = table.query(
-                IndexName=gsi_name,
-                KeyConditionExpression=key_condition_expression,
-                ExpressionAttributeValues=expression_values
-            )
-            items = response.get("Items", [])
-            return items
+            return list(_iter_records_from_table(data))
         else:  # Use Primary Key (get_item)
-            response = table.get_item(Key=keys)
+            response = table.get_item(**_apply_projection({"Key": keys}, data.get("projection")))
             item = response.get("Item", {})
             return item
     except (BotoCoreError, ClientError) as e:
@@ -83,18 +104,83 @@ def _get_record_from_table(data):
         raise e
 
 
+def _iter_records_from_table(data):
+    """Lazily yield every item matching the GSI keys, page by page."""
+    table_name = data.get("table_name")
+    keys = data.get("keys", {})
+    gsi_name = data.get("gsi_name", None)
+    if not table_name or not keys or not gsi_name:
+        raise ValueError("Table name, gsi_name and at least one key are required.")
+    table = dynamodb.Table(table_name)
+    key_conditions = []
+    expression_values = {}
+    for idx, (key, value) in enumerate(keys.items()):
+        key_conditions.append(f"{key} = :val{idx}")
+        expression_values[f":val{idx}"] = value
+    query_args = {
+        "IndexName": gsi_name,
+        "KeyConditionExpression": " AND ".join(key_conditions),
+        "ExpressionAttributeValues": expression_values
+    }
+    _apply_projection(query_args, data.get("projection"))
+    for page in _iter_query_pages(table, query_args):
+        yield from page.get("Items", [])
+
+
+def _create_record_with_unique_id(data):
+    """Insert a new item under a freshly generated id and return the id.
+
+    Uniqueness is enforced by attribute_not_exists on the key instead of a read before the
+    write; a new id is drawn only when that condition fails. With transact_actions the put is
+    committed in one transaction together with those actions.
+    """
+    table_name = data.get("table_name")
+    key_name = data.get("key_name")
+    item = data.get("item", {})
+    id_prefix = data.get("id_prefix", "")
+    transact_actions = data.get("transact_actions", None)
+    if not table_name or not key_name:
+        raise ValueError("Table name and key name are required.")
+    table = dynamodb.Table(table_name)
+    for attempt in range(ID_ALLOCATION_MAX_ATTEMPTS):
+        record_id = f"{id_prefix}{_generate_sortable_id()}"
+        put_args = {"Item": {**item, key_name: record_id},
+                    "ConditionExpression": "attribute_not_exists(#pk)",
+                    "ExpressionAttributeNames": {"#pk": key_name}}
+        try:
+            if transact_actions:
+                _transact_write_items([{"Put": dict(put_args, TableName=table_name)}] + list(transact_actions))
+            else:
+                table.put_item(**put_args)
+            return record_id
+        except TransactionConditionFailed as e:
+            if e.index != 0:
+                raise e
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+        logger.warning(f"Id {record_id} already exists in {table_name}, retrying (attempt {attempt + 1})")
+    raise Exception(f"Function Error: Could not allocate a unique id in {table_name}. Please try again.")
+
+
 def _update_data_in_table(data):
     table_name = data.get("table_name")
     key = data.get("key")
     key_value = data.get("key_value")
-    update_data = data.get("update_data")
+    update_data = data.get("update_data") or {}
+    remove_attributes = data.get("remove_attributes") or []
+    condition_expression = data.get("condition_expression", None)
     gsi_key = data.get("gsi_key", None)
     gsi_value = data.get("gsi_value", None)
     table = dynamodb.Table(table_name)
     try:
         # Construct the update expression
-        update_expression = "SET " + ", ".join(f"#{k} = :{k}" for k in update_data.keys())
-        expression_attribute_names = {f"#{k}": k for k in update_data.keys()}
+        clauses = []
+        if update_data:
+            clauses.append("SET " + ", ".join(f"#{k} = :{k}" for k in update_data.keys()))
+        if remove_attributes:
+            clauses.append("REMOVE " + ", ".join(f"#{k}" for k in remove_attributes))
+        expression_attribute_names = {f"#{k}": k for k in list(update_data.keys()) + list(remove_attributes)}
         expression_attribute_values = {f":{k}": v for k, v in update_data.items()}
 
         # Define key condition
@@ -103,66 +189,314 @@ def _update_data_in_table(data):
             key_condition[gsi_key] = gsi_value
 
         # Perform the update
-        response = table.update_item(
-            Key=key_condition,
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attribute_names,
-            ExpressionAttributeValues=expression_attribute_values
-        )
+        update_args = {
+            "Key": key_condition,
+            "UpdateExpression": " ".join(clauses),
+            "ExpressionAttributeNames": expression_attribute_names
+        }
+        if expression_attribute_values:
+            update_args["ExpressionAttributeValues"] = expression_attribute_values
+        if condition_expression is not None:
+            # A boto3 condition object (Attr/Key), so it never clashes with the placeholders above
+            update_args["ConditionExpression"] = condition_expression
+        response = table.update_item(**update_args)
         return response
     except (BotoCoreError, ClientError) as e:
         print(f"Error updating item: {e}")
         raise e
 
 
-def _query_dynamodb(data):
-    table_name = data.get("table_name")
+def _encode_cursor(last_evaluated_key):
+    """Turn a LastEvaluatedKey into an opaque, URL safe continuation token."""
+    if not last_evaluated_key:
+        return None
+    wire_key = {k: type_serializer.serialize(v) for k, v in last_evaluated_key.items()}
+    return base64.urlsafe_b64encode(json.dumps(wire_key).encode("utf-8")).decode("utf-8")
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        wire_key = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8"))
+        return {k: type_deserializer.deserialize(v) for k, v in wire_key.items()}
+    except (ValueError, TypeError, AttributeError):
+        raise Exception("Function Error: Invalid pagination token. Please reload and try again.")
+
+
+def _iter_query_pages(table, query_args):
+    """Yield raw query responses, following LastEvaluatedKey until the result set is exhausted."""
+    query_args = dict(query_args)
+    while True:
+        response = table.query(**query_args)
+        yield response
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
+            break
+        query_args["ExclusiveStartKey"] = last_evaluated_key
+
+
+def _build_query_args(data):
     query_params = data.get("query_params")
     comparison_ops = data.get("comparison_ops", None)
     filter_params = data.get("filter_params", None)
     gsi_name = data.get("gsi_name", None)
-    # Initialize DynamoDB client
-    table = dynamodb.Table(table_name)
-    try:
-        # Construct KeyConditionExpression dynamically
-        key_conditions = None
-        for key, value in query_params.items():
-            # Apply different conditions based on comparison_ops
-            if comparison_ops and key in comparison_ops:
-                op = comparison_ops[key]
-                if op == "gte":
-                    condition = Key(key).gte(value)
-                elif op == "lte":
-                    condition = Key(key).lte(value)
-                elif op == "begins_with":
-                    condition = Key(key).begins_with(value)
-                else:  # Default to equality
-                    condition = Key(key).eq(value)
-            else:
+    # Construct KeyConditionExpression dynamically
+    key_conditions = None
+    for key, value in query_params.items():
+        # Apply different conditions based on comparison_ops
+        if comparison_ops and key in comparison_ops:
+            op = comparison_ops[key]
+            if op == "gte":
+                condition = Key(key).gte(value)
+            elif op == "lte":
+                condition = Key(key).lte(value)
+            elif op == "lt":
+                condition = Key(key).lt(value)
+            elif op == "gt":
+                condition = Key(key).gt(value)
+            elif op == "between":
+                condition = Key(key).between(*value)
+            elif op == "begins_with":
+                condition = Key(key).begins_with(value)
+            else:  # Default to equality
                 condition = Key(key).eq(value)
-            key_conditions = condition if key_conditions is None else key_conditions & condition
-            logger.info(f"Key Conditions: {key_conditions}")
-        # Construct FilterExpression (for non-key attributes)
-        filter_expression = None
-        if filter_params:
-            for key, value in filter_params.items():
-                condition = Attr(key).eq(bool(value))
-                filter_expression = condition if filter_expression is None else filter_expression & condition
-        logger.info(f"Filter Expression: {filter_expression}")
-        # Perform the query operation
-        query_args = {"KeyConditionExpression": key_conditions}
-        if filter_expression:
-            query_args["FilterExpression"] = filter_expression  # Apply filter if provided
-        if gsi_name:
-            query_args["IndexName"] = gsi_name  # Use GSI if specified
-        logger.info(f"Query Args: {query_args}")
-        response = table.query(**query_args)
-        return response.get("Items", [])
+        else:
+            condition = Key(key).eq(value)
+        key_conditions = condition if key_conditions is None else key_conditions & condition
+        logger.info(f"Key Conditions: {key_conditions}")
+    # Construct FilterExpression (for non-key attributes)
+    filter_expression = None
+    if filter_params:
+        for key, value in filter_params.items():
+            condition = Attr(key).eq(bool(value))
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+    logger.info(f"Filter Expression: {filter_expression}")
+    query_args = {"KeyConditionExpression": key_conditions}
+    if filter_expression:
+        query_args["FilterExpression"] = filter_expression  # Apply filter if provided
+    if gsi_name:
+        query_args["IndexName"] = gsi_name  # Use GSI if specified
+    if data.get("scan_index_forward") is False:
+        query_args["ScanIndexForward"] = False  # Newest first on a sort key
+    _apply_projection(query_args, data.get("projection"))
+    logger.info(f"Query Args: {query_args}")
+    return query_args
+
+
+def _iter_query_dynamodb(data):
+    """Lazy mode: yield matching items one page at a time without holding the full result set."""
+    table = dynamodb.Table(data.get("table_name"))
+    query_args = _build_query_args(data)
+    for page in _iter_query_pages(table, query_args):
+        yield from page.get("Items", [])
+
+
+def _query_dynamodb_page(data):
+    """Cursor mode: return up to `limit` items and an opaque `next_token` to resume from.
+
+    item_filter, if given, drops items in Python (for conditions a FilterExpression cannot express,
+    such as ones on key attributes). Queries then read FILTERED_QUERY_PAGE_ITEMS at a time until
+    `limit` items pass, and next_token resumes after the last item kept; it is built from that item's
+    cursor_keys (the table key plus the index keys), which filtered queries must pass.
+    """
+    table = dynamodb.Table(data.get("table_name"))
+    limit = int(data.get("limit", 50))
+    item_filter = data.get("item_filter", None)
+    if limit < 1:
+        raise ValueError("Limit must be at least 1")
+    if item_filter:
+        return _query_filtered_page(table, data, limit, item_filter)
+    try:
+        query_args = _build_query_args(data)
+        start_key = _decode_cursor(data.get("next_token"))
+        items = []
+        while True:
+            query_args["Limit"] = limit - len(items)
+            if start_key:
+                query_args["ExclusiveStartKey"] = start_key
+            response = table.query(**query_args)
+            items.extend(response.get("Items", []))
+            start_key = response.get("LastEvaluatedKey")
+            if not start_key or len(items) >= limit:
+                break
+        return {"items": items, "next_token": _encode_cursor(start_key)}
+    except Exception as e:
+        print(f"Error querying DynamoDB: {str(e)}")
+        raise e
+
+
+def _query_filtered_page(table, data, limit, item_filter):
+    cursor_keys = data.get("cursor_keys")
+    if not cursor_keys:
+        raise ValueError("cursor_keys are required with item_filter")
+    projection = data.get("projection")
+    # The cursor is built from the kept items, so their key attributes have to be read
+    extra_keys = [key for key in cursor_keys if projection and key not in projection]
+    if extra_keys:
+        data = dict(data, projection=list(projection) + extra_keys)
+    try:
+        query_args = dict(_build_query_args(data), Limit=max(limit, FILTERED_QUERY_PAGE_ITEMS))
+        start_key = _decode_cursor(data.get("next_token"))
+        items, next_key = [], None
+        while True:
+            if start_key:
+                query_args["ExclusiveStartKey"] = start_key
+            response = table.query(**query_args)
+            page_items = response.get("Items", [])
+            start_key = response.get("LastEvaluatedKey")
+            for index, item in enumerate(page_items):
+                if item_filter(item):
+                    items.append(item)
+                    if len(items) == limit:
+                        break
+            if len(items) >= limit:
+                # Resume after the last item kept, unless it closed the result set
+                if index < len(page_items) - 1 or start_key:
+                    next_key = {key: items[-1][key] for key in cursor_keys}
+                break
+            if not start_key:
+                break
+        for item in items:
+            for key in extra_keys:
+                item.pop(key, None)
+        return {"items": items, "next_token": _encode_cursor(next_key)}
+    except Exception as e:
+        print(f"Error querying DynamoDB: {str(e)}")
+        raise e
+
+
+def _empty_window(before=None, after=None):
+    """True when no whole second lies strictly between after and before, so there is nothing to query."""
+    return before is not None and after is not None and int(before) <= int(after) + 1
+
+
+def _time_window(before=None, after=None):
+    """Key condition for a window on an epoch-seconds string sort key such as created_at.
+
+    Returns (comparison op, value) for _build_query_args with before/after exclusive, or None when
+    neither bound is set. The key is compared as a string, so bounds must have the key's digit count,
+    and callers skip the query when _empty_window (DynamoDB rejects an inverted BETWEEN).
+    """
+    if before is not None and after is not None:
+        return "between", (str(int(after) + 1), str(int(before) - 1))
+    if before is not None:
+        return "lt", str(int(before))
+    if after is not None:
+        return "gt", str(int(after))
+    return None
+
+
+def _query_dynamodb(data):
+    """Eager mode: return all pages as a list, capped at `max_items`."""
+    max_items = int(data.get("max_items", QUERY_MAX_ITEMS))
+    try:
+        items = []
+        for item in _iter_query_dynamodb(data):
+            if len(items) >= max_items:
+                logger.warning(f"Query on {data.get('table_name')} truncated at {max_items} items")
+                break
+            items.append(item)
+        return items
     except Exception as e:
         print(f"Error querying DynamoDB: {str(e)}")
         raise e
 
 
+def _build_projection(attributes):
+    """Return a ProjectionExpression and its attribute names, safe for reserved words like status."""
+    names = {f"#p{idx}": attr for idx, attr in enumerate(attributes)}
+    return ", ".join(names.keys()), names
+
+
+def _apply_projection(request_args, projection):
+    """Limit a get_item/query request to the attribute names in `projection` (a list); no-op when empty."""
+    if projection:
+        projection_expression, attribute_names = _build_projection(projection)
+        request_args["ProjectionExpression"] = projection_expression
+        request_args["ExpressionAttributeNames"] = {**request_args.get("ExpressionAttributeNames", {}), **attribute_names}
+    return request_args
+
+
+def _batch_get_records(table, keys, projection=None):
+    """Fetch many items by primary key with BatchGetItem.
+
+    Keys are de-duplicated and sent in chunks of 100; UnprocessedKeys are retried with
+    exponential backoff. Returns a dict keyed by the primary key value (a tuple for composite keys).
+    """
+    unique_keys = {}
+    for key in keys:
+        if key:
+            unique_keys[tuple(key.items())] = key
+    if not unique_keys:
+        return {}
+    key_names = list(next(iter(unique_keys.values())).keys())
+    request_template = {}
+    if projection:
+        attributes = list(dict.fromkeys(key_names + list(projection)))
+        projection_expression, attribute_names = _build_projection(attributes)
+        request_template = {"ProjectionExpression": projection_expression,
+                            "ExpressionAttributeNames": attribute_names}
+    records = {}
+    key_list = list(unique_keys.values())
+    try:
+        for start in range(0, len(key_list), BATCH_GET_CHUNK_SIZE):
+            request_items = {table: {**request_template, "Keys": key_list[start:start + BATCH_GET_CHUNK_SIZE]}}
+            attempt = 0
+            while request_items:
+                response = dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get("Responses", {}).get(table, []):
+                    record_key = tuple(item.get(k) for k in key_names)
+                    records[record_key[0] if len(key_names) == 1 else record_key] = item
+                request_items = response.get("UnprocessedKeys") or {}
+                if request_items:
+                    attempt += 1
+                    if attempt > BATCH_GET_MAX_RETRIES:
+                        raise Exception(f"Unprocessed keys remain for {table} after {BATCH_GET_MAX_RETRIES} retries")
+                    time.sleep(random.uniform(0, min(0.05 * (2 ** attempt), 2)))
+        return records
+    except (BotoCoreError, ClientError) as e:
+        print(f"Error batch fetching items: {e}")
+        raise e
+
+
+def _serialize_transact_action(action):
+    """Convert one resource-style action ({"Put": {...}}, {"Update": ...}, ...) to the client wire format."""
+    (action_type, request), = action.items()
+    request = dict(request)
+    for field in ("Item", "Key", "ExpressionAttributeValues"):
+        if field in request:
+            request[field] = {k: type_serializer.serialize(v) for k, v in request[field].items()}
+    return {action_type: request}
+
+
+def _transact_write_items(actions):
+    """Commit Put/Update/Delete/ConditionCheck actions with TransactWriteItems.
+
+    Actions take plain Python values, as with the Table resource. Lists longer than 100 are sent
+    in consecutive chunks; each chunk is atomic, so put the records that must never be orphaned
+    first. A failed condition raises "Function Error" with the index of the offending action.
+    """
+    client = dynamodb.meta.client
+    wire_actions = [_serialize_transact_action(action) for action in actions]
+    for start in range(0, len(wire_actions), TRANSACT_WRITE_CHUNK_SIZE):
+        chunk = wire_actions[start:start + TRANSACT_WRITE_CHUNK_SIZE]
+        try:
+            client.transact_write_items(TransactItems=chunk)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "TransactionCanceledException":
+                raise e
+            reasons = e.response.get("CancellationReasons", [])
+            failed = [start + idx for idx, reason in enumerate(reasons)
+                      if reason.get("Code") == "ConditionalCheckFailed"]
+            if failed:
+                raise TransactionConditionFailed(
+                    f"Function Error: Record already exists or changed (transaction item {failed[0]}). Please try again.",
+                    failed[0])
+            raise e
+    return len(wire_actions)
+
+
 # Secrets functions
 def _create_secret(data):
     secret_name = data.get('secret_name', None)
@@ -192,6 +526,18 @@ def _get_secret_value(data):
         raise e
 
 
+# SQS functions
+def _send_queue_message(queue_url, body, delay_seconds=0):
+    """Send a JSON body to an SQS queue; delay_seconds (max 900) holds it back before it is delivered."""
+    try:
+        response = sqs.send_message(QueueUrl=queue_url, MessageBody=json.dumps(body),
+                                    DelaySeconds=max(0, min(int(delay_seconds), 900)))
+        return response["MessageId"]
+    except (BotoCoreError, ClientError) as e:
+        print(f"Error sending queue message: {e}")
+        raise e
+
+
 def _send_email(subject, body, user_email, source='bez_dev@futureviewsystems.com'):
     try:
         ssm_client = boto3.client('ssm')
@@ -234,24 +580,132 @@ def _update_secret(data):
     return secrets_manager.update_secret(**kwargs)
 
 
-def _scan_table_with_filter(data):
-    table_name = data.get("table_name")
-    filter_expression = data.get("filter_expression", None)
-    table = dynamodb.Table(table_name)
-    all_items = []
-    exclusive_start_key = None
+_thread_resources = threading.local()
+
+
+def _thread_dynamodb():
+    """boto3 resources are not thread safe, so each scan worker thread keeps its own."""
+    if not hasattr(_thread_resources, "dynamodb"):
+        _thread_resources.dynamodb = _new_dynamodb_resource()
+    return _thread_resources.dynamodb
+
+
+def _build_scan_args(data):
+    scan_args = {}
+    if data.get("filter_expression") is not None:
+        scan_args["FilterExpression"] = data["filter_expression"]
+    return _apply_projection(scan_args, data.get("projection"))
+
+
+def _iter_scan_pages(table, scan_args):
+    """Yield raw scan responses, following LastEvaluatedKey until the table (or segment) is exhausted."""
+    scan_args = dict(scan_args)
     while True:
-        scan_kwargs = {}
-        if filter_expression:
-            scan_kwargs['FilterExpression'] = filter_expression
-        if exclusive_start_key:
-            scan_kwargs['ExclusiveStartKey'] = exclusive_start_key
-        response = table.scan(**scan_kwargs)
-        all_items.extend(response.get('Items', []))
-        exclusive_start_key = response.get('LastEvaluatedKey')
-        if not exclusive_start_key:
+        response = table.scan(**scan_args)
+        yield response
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if not last_evaluated_key:
             break
-    return all_items
+        scan_args["ExclusiveStartKey"] = last_evaluated_key
+
+
+def _run_resumable_scan(data, process_items):
+    """Scan a table in bounded batches for jobs that outlive one Lambda invocation.
+
+    Pages of table_name (scan_args: FilterExpression, ProjectionExpression, ...) are passed to
+    process_items(items, result), which updates the result counters. Stops after max_pages and
+    returns the result with a resume_key to pass back in, or None once the table is covered.
+    With segment and total_segments only that segment of a parallel scan is covered, so a job can
+    run as total_segments concurrent invocations, each resuming its own segment.
+    """
+    table = dynamodb.Table(data.get("table_name"))
+    max_pages = int(data.get("max_pages") or BACKFILL_MAX_PAGES)
+    scan_args = dict(data.get("scan_args") or {})
+    result = {"scanned": 0, "updated": 0, "skipped": 0, "resume_key": None}
+    total_segments = int(data.get("total_segments") or 1)
+    if total_segments > 1:
+        segment = int(data.get("segment") or 0)
+        if not 0 <= segment < total_segments:
+            raise ValueError(f"segment must be between 0 and {total_segments - 1}")
+        scan_args.update(Segment=segment, TotalSegments=total_segments)
+        result.update(segment=segment, total_segments=total_segments)
+    start_key = _decode_cursor(data.get("resume_key"))
+    if start_key:
+        scan_args["ExclusiveStartKey"] = start_key
+    for page_number, page in enumerate(_iter_scan_pages(table, scan_args), start=1):
+        items = page.get("Items", [])
+        result["scanned"] += len(items)
+        if items:
+            process_items(items, result)
+        if page_number >= max_pages:
+            result["resume_key"] = _encode_cursor(page.get("LastEvaluatedKey"))
+            break
+    logger.info(f"Resumable scan of {data.get('table_name')}: {result}")
+    return result
+
+
+def _iter_scan_table(data):
+    """Stream every item of a table, optionally as a parallel segmented scan.
+
+    data: table_name, filter_expression (boto3 Attr condition), projection (list of attributes),
+    total_segments (default 1, a plain sequential scan) and max_workers.
+    Segments are scanned by a bounded thread pool and handed over through a bounded queue, so
+    memory stays flat however large the table is. Items from different segments interleave.
+    """
+    table_name = data.get("table_name")
+    total_segments = int(data.get("total_segments", 1))
+    scan_args = _build_scan_args(data)
+    if total_segments <= 1:
+        for page in _iter_scan_pages(dynamodb.Table(table_name), scan_args):
+            yield from page.get("Items", [])
+        return
+    max_workers = min(int(data.get("max_workers", SCAN_MAX_WORKERS)), total_segments)
+    pages = queue.Queue(maxsize=SCAN_QUEUE_PAGES)
+    stop = threading.Event()
+    done = object()
+
+    def _hand_over(entry):
+        # Give up if the consumer stopped reading, instead of blocking forever on a full queue
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan_segment(segment):
+        try:
+            table = _thread_dynamodb().Table(table_name)
+            for page in _iter_scan_pages(table, {**scan_args, "Segment": segment, "TotalSegments": total_segments}):
+                if not _hand_over(page.get("Items", [])):
+                    return
+        except Exception as e:
+            _hand_over(e)
+        finally:
+            _hand_over(done)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for segment in range(total_segments):
+            executor.submit(_scan_segment, segment)
+        finished = 0
+        while finished < total_segments:
+            entry = pages.get()
+            if entry is done:
+                finished += 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                yield from entry
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _scan_table_with_filter(data):
+    """Eager form of _iter_scan_table: returns every matching item as a list."""
+    return list(_iter_scan_table(data))
 
 
 def _read_s3(bucket_name, object_key):
@@ -263,6 +717,16 @@ def _read_s3(bucket_name, object_key):
         print(f"Error: The object key '{object_key}' does not exist in bucket '{bucket_name}'.")
         raise e
 
+def _read_s3_bytes(bucket_name, object_key, missing_ok=False):
+    """Raw object body; with missing_ok a missing key returns None instead of raising."""
+    try:
+        return s3.get_object(Bucket=bucket_name, Key=object_key)['Body'].read()
+    except ClientError as e:
+        if missing_ok and e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        print(f"Error reading '{object_key}' from bucket '{bucket_name}': {e}")
+        raise e
+
 def _write_s3(bucket_name, object_key, data):
     try:
         s3.put_object(
@@ -0,0 +1,48 @@
+import os, boto3
+
+# Selects where the module level AWS handles point. "aws" (default) builds real boto3 objects;
+# "memory" hands out the in-process stand-ins from bez_utils_memory_aws for local benchmarking.
+# Modules build their handles at import time, so set BEZ_AWS_BACKEND before importing any handler.
+AWS_BACKEND = os.environ.get("BEZ_AWS_BACKEND", "aws").lower()
+
+
+def _is_memory_backend():
+    return AWS_BACKEND == "memory"
+
+
+def _get_memory_aws():
+    from bez_utility.bez_utils_memory_aws import memory_aws
+    return memory_aws
+
+
+def _get_dynamodb_resource():
+    if _is_memory_backend():
+        return _get_memory_aws().dynamodb
+    return boto3.resource('dynamodb')
+
+
+def _new_dynamodb_resource():
+    """A DynamoDB resource on its own boto3 session, for use from worker threads."""
+    if _is_memory_backend():
+        return _get_memory_aws().dynamodb
+    return boto3.session.Session().resource('dynamodb')
+
+
+def _get_s3_client(config=None):
+    if _is_memory_backend():
+        return _get_memory_aws().s3
+    if config:
+        return boto3.client('s3', config=config)
+    return boto3.client('s3')
+
+
+def _get_secrets_manager_client():
+    if _is_memory_backend():
+        return _get_memory_aws().secrets_manager
+    return boto3.client('secretsmanager')
+
+
+def _get_sqs_client():
+    if _is_memory_backend():
+        return _get_memory_aws().sqs
+    return boto3.client('sqs')
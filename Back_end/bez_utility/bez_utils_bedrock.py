@@ -7,6 +7,10 @@ inference_profile_arn = "arn:aws:bedrock:us-east-1:664418992073:inference-profil
 titan_profile_arn = "arn:aws:bedrock:us-east-1:664418992073:inference-profile/amazon.titan-image-generator-v1"
 
 def _get_ai_response(data):
+    return _get_ai_response_with_usage(data)[0]
+
+def _get_ai_response_with_usage(data):
+    """(text, usage) where usage holds the input_tokens and output_tokens Bedrock reported for the call."""
     try:
         prompt = data.get("prompt")
         system_prompt = prompt
@@ -23,6 +27,7 @@ def _get_ai_response(data):
         response = bedrock.invoke_model_with_response_stream(body=body, modelId=inference_profile_arn)
         # response_body = json.loads(response['body'].read())
         result = ""
+        usage = {}
         for event in response['body']:
             chunk = event.get('chunk')
             if chunk:
@@ -30,10 +35,14 @@ def _get_ai_response(data):
 
                 if chunk_data.get('type') == 'content_block_delta':
                     result += chunk_data['delta']['text']
+                elif chunk_data.get('type') == 'message_start':
+                    usage.update(chunk_data.get('message', {}).get('usage', {}))
+                elif chunk_data.get('type') == 'message_delta':
+                    usage.update(chunk_data.get('usage', {}))
                 elif chunk_data.get('type') == 'message_stop':
                     break
         # return response_body.get("content")[0].get("text")
-        return result
+        return result, usage
     except (BotoCoreError, ClientError, Exception) as e:
         raise e
 
@@ -0,0 +1,92 @@
+import copy, logging, threading, time
+from collections import OrderedDict
+
+# import from bez resources
+from bez_utility.bez_utils_aws import _get_record_from_table, _scan_table_with_filter
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Reference tables only change when new agents ship, so entries can live across warm invocations
+CACHE_TTL_SECONDS = {
+    "agent_list": 900,
+    "list_of_llm": 900,
+    "agent_workflow_mapping": 900,
+    "report_source": 3600,
+    "mda_section_report_map_default": 3600
+}
+DEFAULT_CACHE_TTL_SECONDS = 300
+CACHE_MAX_ENTRIES = 256
+
+# Module level state survives between invocations of the same Lambda container
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def _cached_read(table_name, key, loader):
+    """Return the cached value for (table_name, key), calling loader() on a miss.
+
+    Empty results are not cached so a record created after a miss is picked up on the next call.
+    Callers get a deep copy and can mutate it freely.
+    """
+    cache_key = (table_name, key)
+    now = time.time()
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry and entry[0] > now:
+            _cache.move_to_end(cache_key)
+            _cache_stats["hits"] += 1
+            return copy.deepcopy(entry[1])
+        if entry:
+            del _cache[cache_key]
+        _cache_stats["misses"] += 1
+    value = loader()
+    if value:
+        ttl = CACHE_TTL_SECONDS.get(table_name, DEFAULT_CACHE_TTL_SECONDS)
+        with _cache_lock:
+            _cache[cache_key] = (now + ttl, copy.deepcopy(value))
+            _cache.move_to_end(cache_key)
+            while len(_cache) > CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+                _cache_stats["evictions"] += 1
+    return value
+
+
+def _invalidate_cache(table_name=None, key=None):
+    """Drop one entry, every entry of a table, or (with no arguments) the whole cache."""
+    with _cache_lock:
+        if table_name is None:
+            dropped = len(_cache)
+            _cache.clear()
+        elif key is None:
+            stale = [cache_key for cache_key in _cache if cache_key[0] == table_name]
+            for cache_key in stale:
+                del _cache[cache_key]
+            dropped = len(stale)
+        else:
+            dropped = 1 if _cache.pop((table_name, key), None) is not None else 0
+        _cache_stats["invalidations"] += dropped
+    return dropped
+
+
+def _get_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["entries"] = len(_cache)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def _get_reference_record(data):
+    """Cached _get_record_from_table for reference tables (primary key lookups and GSI queries)."""
+    table_name = data.get("table_name")
+    key = (data.get("gsi_name") or "", tuple(sorted(data.get("keys", {}).items())))
+    return _cached_read(table_name, key, lambda: _get_record_from_table(data))
+
+
+def _scan_reference_table(table_name):
+    """Cached full scan of a small reference table."""
+    return _cached_read(table_name, "scan", lambda: _scan_table_with_filter({"table_name": table_name}))
@@ -1,4 +1,5 @@
-import random, string
+import random, string, secrets, time
+from decimal import Decimal
 from datetime import datetime, timezone
 
 def _generate_uid(data):
@@ -10,6 +11,11 @@ def _generate_uid(data):
     upper_bound = (10**n) - 1  # Largest number with the given digits
     return str(random.randint(lower_bound, upper_bound))
 
+def _generate_sortable_id():
+    # returns 1742234790334048213: epoch milliseconds followed by 6 random digits,
+    # so ids sort by creation time and stay unique within the same millisecond
+    return f"{int(time.time() * 1000):013d}{secrets.randbelow(10**6):06d}"
+
 def _current_time():
     # returns 1742234790.334879
     return datetime.now(timezone.utc).timestamp()
@@ -24,3 +30,9 @@ def _date_now():
 
 def _generate_otp():
     return ''.join(random.choices(string.digits, k=6))
+
+def _json_default(value):
+    # json.dumps default= for DynamoDB items, whose numbers come back as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,1022 @@
+import copy, hashlib, io, json, logging, os, random, re, threading, time
+from collections import Counter
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import ConditionBase, AttributeBase
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.exceptions import ClientError
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# In-process stand-in for the DynamoDB, S3, Secrets Manager and SQS calls the handlers make.
+# Only the subset of the API used in this repo is implemented; anything else raises
+# NotImplementedError so a gap is obvious instead of silently returning nothing.
+
+# Key schema of every table we touch: (partition key, optional sort key) for the table and each GSI
+TABLE_SCHEMAS = {
+    "users": {"key": ("user_id",), "indexes": {"email-index": ("email",)}},
+    "sessions": {"key": ("session_id",), "indexes": {"user_id-index": ("user_id",)}},
+    "clients": {"key": ("client_id",), "indexes": {"client_short_name-index": ("client_short_name",),
+                                                   "client_name_lower-index": ("client_name_lower",)}},
+    "client_privileges": {"key": ("client_privilege_id",), "indexes": {"user_id-index": ("user_id",),
+                                                                        "client_id-index": ("client_id",)}},
+    "integrations": {"key": ("integration_id",), "indexes": {"client_id-index": ("client_id",)}},
+    "int_privileges": {"key": ("int_privilege_id",), "indexes": {"integration_id-index": ("integration_id",),
+                                                                  "user_id-index": ("user_id",)}},
+    "qb_integration_tokens": {"key": ("integration_id",), "indexes": {}},
+    "agent_list": {"key": ("agent_id",), "indexes": {"agent_status-index": ("agent_status",)}},
+    "agent_list_by_int": {"key": ("agent_int_uid",), "indexes": {}},
+    "agent_privileges": {"key": ("agent_privilege_id",), "indexes": {
+        "user_id-index": ("user_id",),
+        "agent_int_uid-index": ("agent_int_uid",),
+        "agent_int_uid-user_id-index": ("agent_int_uid", "user_id")}},
+    "agent_workflow_mapping": {"key": ("agent_id", "workflow_id"), "indexes": {"agent_id-index": ("agent_id",)}},
+    "agent_mda_section_report_map": {"key": ("agent_int_uid_secid",), "indexes": {
+        "agent_int_uid-index": ("agent_int_uid",)}},
+    "mda_section_report_map_default": {"key": ("section_id",), "indexes": {}},
+    "report_source": {"key": ("source_name",), "indexes": {}},
+    "list_of_llm": {"key": ("llm_id",), "indexes": {}},
+    "chat_details": {"key": ("chat_id",), "indexes": {
+        "agent_int_uid-index": ("agent_int_uid",),
+        "session_id-agent_int_uid-index": ("session_id", "agent_int_uid"),
+        "user_agent-created_at-index": ("user_agent", "created_at")}},
+    "message_details": {"key": ("message_id",), "indexes": {
+        "chat_id-created_at-index": ("chat_id", "created_at"),
+        "agent_int_uid-chat_id-index": ("agent_int_uid", "chat_id"),
+        "agent_int_uid-is_starred-index": ("agent_int_uid", "is_starred"),
+        "starred_owner-created_at-index": ("starred_owner", "created_at"),
+        "root_chat_id-created_at-index": ("root_chat_id", "created_at"),
+        "root_chat_id-updated_at-index": ("root_chat_id", "updated_at")}}
+}
+
+# Items returned per Query/Scan page before LastEvaluatedKey is set (stands in for the 1 MB page limit)
+DEFAULT_PAGE_SIZE = int(os.environ.get("BEZ_MEMORY_PAGE_SIZE", "100"))
+BATCH_WRITE_CHUNK_SIZE = 25
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def _client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def _normalize_item(item):
+    """Round trip through the DynamoDB type system so ints become Decimals and floats are rejected, as with boto3."""
+    return {k: _deserializer.deserialize(_serializer.serialize(v)) for k, v in item.items()}
+
+
+class LatencyModel:
+    """Per call delay: base + uniform jitter + a small cost per item touched, all in milliseconds."""
+
+    def __init__(self, base_ms=0.0, jitter_ms=0.0, per_item_ms=0.0):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.per_item_ms = per_item_ms
+
+    def delay(self, items=0):
+        millis = self.base_ms + random.uniform(0, self.jitter_ms) + self.per_item_ms * items
+        if millis > 0:
+            time.sleep(millis / 1000.0)
+
+
+class CallStats:
+    """Thread safe counters of service calls, keyed both by operation and by operation:resource."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.items = Counter()
+
+    def record(self, service, operation, resource=None, items=0):
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+            if resource:
+                self.calls[f"{service}.{operation}:{resource}"] += 1
+            self.items[f"{service}.{operation}"] += items
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.items.clear()
+
+    def snapshot(self):
+        with self._lock:
+            totals = {key: value for key, value in self.calls.items() if ":" not in key}
+            return {"round_trips": sum(totals.values()),
+                    "calls": dict(self.calls),
+                    "items": dict(self.items)}
+
+
+# Expression parsing (condition, key condition, filter, update and projection expressions)
+_TOKEN_RE = re.compile(r"\s*(?:(<>|<=|>=|=|<|>|\(|\)|,|\+|-|\[|\])|([#:]?[A-Za-z_]\w*|\.#?[A-Za-z_]\w*|\d+))")
+_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IN", "SET", "REMOVE", "ADD", "DELETE"}
+_MISSING = object()
+
+
+def _tokenize(expression):
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise _client_error("ValidationException", f"Invalid expression near: {expression[pos:]}", "Expression")
+        tokens.append(match.group(1) or match.group(2))
+        pos = match.end()
+        while pos < len(expression) and expression[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def peek_keyword(self):
+        token = self.peek()
+        return token.upper() if token and token.upper() in _KEYWORDS else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected and token.upper() != expected):
+            raise _client_error("ValidationException", f"Expected {expected}, got {token}", "Expression")
+        self.pos += 1
+        return token
+
+    def done(self):
+        return self.pos >= len(self.tokens)
+
+    # condition := or_expr
+    def condition(self):
+        node = self.and_expr()
+        while self.peek_keyword() == "OR":
+            self.take()
+            node = ("or", node, self.and_expr())
+        return node
+
+    def and_expr(self):
+        node = self.not_expr()
+        while self.peek_keyword() == "AND":
+            self.take()
+            node = ("and", node, self.not_expr())
+        return node
+
+    def not_expr(self):
+        if self.peek_keyword() == "NOT":
+            self.take()
+            return ("not", self.not_expr())
+        return self.predicate()
+
+    def predicate(self):
+        if self.peek() == "(":
+            self.take()
+            node = self.condition()
+            self.take(")")
+            return node
+        lhs = self.operand()
+        token = self.peek()
+        if token in ("=", "<>", "<", "<=", ">", ">="):
+            self.take()
+            return ("cmp", token, lhs, self.operand())
+        keyword = self.peek_keyword()
+        if keyword == "BETWEEN":
+            self.take()
+            low = self.operand()
+            self.take("AND")
+            return ("between", lhs, low, self.operand())
+        if keyword == "IN":
+            self.take()
+            self.take("(")
+            values = [self.operand()]
+            while self.peek() == ",":
+                self.take()
+                values.append(self.operand())
+            self.take(")")
+            return ("in", lhs, values)
+        if lhs[0] == "func":
+            return lhs
+        raise _client_error("ValidationException", f"Invalid condition near {token}", "Expression")
+
+    def operand(self):
+        token = self.take()
+        if token.startswith(":"):
+            return ("value", token)
+        if self.peek() == "(":
+            self.take()
+            args = []
+            if self.peek() != ")":
+                args.append(self.value_expr())
+                while self.peek() == ",":
+                    self.take()
+                    args.append(self.value_expr())
+            self.take(")")
+            return ("func", token, args)
+        return ("path", self.path_rest(token))
+
+    def path_rest(self, first):
+        segments = [first]
+        while True:
+            if self.peek() == "[":
+                self.take()
+                segments.append(int(self.take()))
+                self.take("]")
+            elif self.pos < len(self.tokens) and self.peek().startswith("."):
+                segments.append(self.take()[1:])
+            else:
+                return segments
+
+    # value_expr := operand (('+' | '-') operand)?  (used by SET actions)
+    def value_expr(self):
+        node = self.operand()
+        if self.peek() in ("+", "-"):
+            op = self.take()
+            node = ("arith", op, node, self.operand())
+        return node
+
+
+def _split_path(path):
+    """Split 'a.b[0]' style paths the tokenizer leaves joined by dots."""
+    segments = []
+    for segment in path:
+        if isinstance(segment, int):
+            segments.append(segment)
+        else:
+            segments.extend(segment.split("."))
+    return segments
+
+
+class _Evaluator:
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, segment):
+        if isinstance(segment, str) and segment.startswith("#"):
+            if segment not in self.names:
+                raise _client_error("ValidationException", f"Undefined attribute name {segment}", "Expression")
+            return self.names[segment]
+        return segment
+
+    def resolve_path(self, path):
+        return [self.name(segment) for segment in _split_path(path)]
+
+    def get_path(self, item, path):
+        current = item
+        for segment in self.resolve_path(path):
+            if isinstance(segment, int):
+                if not isinstance(current, list) or segment >= len(current):
+                    return _MISSING
+                current = current[segment]
+            else:
+                if not isinstance(current, dict) or segment not in current:
+                    return _MISSING
+                current = current[segment]
+        return current
+
+    def operand(self, item, node):
+        kind = node[0]
+        if kind == "value":
+            if node[1] not in self.values:
+                raise _client_error("ValidationException", f"Undefined attribute value {node[1]}", "Expression")
+            return self.values[node[1]]
+        if kind == "literal":
+            return node[1]
+        if kind == "path":
+            return self.get_path(item, node[1])
+        if kind == "func":
+            return self.function(item, node[1], node[2])
+        if kind == "arith":
+            left, right = self.operand(item, node[2]), self.operand(item, node[3])
+            if left is _MISSING or right is _MISSING:
+                raise _client_error("ValidationException",
+                                    "An operand in the update expression has an incorrect data type", "UpdateItem")
+            return left + right if node[1] == "+" else left - right
+        raise _client_error("ValidationException", f"Unsupported operand {kind}", "Expression")
+
+    def function(self, item, name, args):
+        if name == "attribute_exists":
+            return self.operand(item, args[0]) is not _MISSING
+        if name == "attribute_not_exists":
+            return self.operand(item, args[0]) is _MISSING
+        if name == "begins_with":
+            value, prefix = self.operand(item, args[0]), self.operand(item, args[1])
+            return isinstance(value, str) and isinstance(prefix, str) and value.startswith(prefix)
+        if name == "contains":
+            value, member = self.operand(item, args[0]), self.operand(item, args[1])
+            if value is _MISSING:
+                return False
+            try:
+                return member in value
+            except TypeError:
+                return False
+        if name == "size":
+            value = self.operand(item, args[0])
+            return _MISSING if value is _MISSING else len(value)
+        if name == "attribute_type":
+            value = self.operand(item, args[0])
+            return value is not _MISSING and _serializer.serialize(value).keys() == {self.operand(item, args[1])}
+        if name == "if_not_exists":
+            value = self.operand(item, args[0])
+            return self.operand(item, args[1]) if value is _MISSING else value
+        if name == "list_append":
+            return list(self.operand(item, args[0])) + list(self.operand(item, args[1]))
+        raise NotImplementedError(f"Expression function {name} is not supported by the memory backend")
+
+    def condition(self, item, node):
+        kind = node[0]
+        if kind == "and":
+            return self.condition(item, node[1]) and self.condition(item, node[2])
+        if kind == "or":
+            return self.condition(item, node[1]) or self.condition(item, node[2])
+        if kind == "not":
+            return not self.condition(item, node[1])
+        if kind == "func":
+            return bool(self.function(item, node[1], node[2]))
+        if kind == "cmp":
+            return _compare(node[1], self.operand(item, node[2]), self.operand(item, node[3]))
+        if kind == "between":
+            value = self.operand(item, node[1])
+            return _compare(">=", value, self.operand(item, node[2])) and _compare("<=", value, self.operand(item, node[3]))
+        if kind == "in":
+            value = self.operand(item, node[1])
+            return any(_compare("=", value, self.operand(item, option)) for option in node[2])
+        raise _client_error("ValidationException", f"Unsupported condition {kind}", "Expression")
+
+
+def _compare(op, left, right):
+    if left is _MISSING or right is _MISSING:
+        return op == "<>"
+    try:
+        if op == "=":
+            return left == right
+        if op == "<>":
+            return left != right
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+    except TypeError:
+        return False
+    raise _client_error("ValidationException", f"Unsupported comparator {op}", "Expression")
+
+
+_CONDITION_OPERATORS = {"=": "cmp", "<>": "cmp", "<": "cmp", "<=": "cmp", ">": "cmp", ">=": "cmp"}
+
+
+def _condition_object_to_ast(condition):
+    """Translate a boto3 Key()/Attr() condition object into the same tree the string parser builds."""
+    expression = condition.get_expression()
+    operator, values = expression["operator"], expression["values"]
+    if operator in _CONDITION_OPERATORS:
+        return ("cmp", operator, _condition_operand(values[0]), _condition_operand(values[1]))
+    if operator == "AND":
+        return ("and", _condition_object_to_ast(values[0]), _condition_object_to_ast(values[1]))
+    if operator == "OR":
+        return ("or", _condition_object_to_ast(values[0]), _condition_object_to_ast(values[1]))
+    if operator == "NOT":
+        return ("not", _condition_object_to_ast(values[0]))
+    if operator == "BETWEEN":
+        return ("between",) + tuple(_condition_operand(value) for value in values)
+    if operator == "IN":
+        return ("in", _condition_operand(values[0]), [("literal", value) for value in values[1]])
+    return ("func", operator, [_condition_operand(value) for value in values])
+
+
+def _condition_operand(value):
+    if isinstance(value, AttributeBase):
+        return ("path", [value.name])
+    if isinstance(value, ConditionBase):
+        return _condition_object_to_ast(value)
+    return ("literal", value)
+
+
+def _parse_condition(expression):
+    if expression is None:
+        return None
+    if isinstance(expression, ConditionBase):
+        return _condition_object_to_ast(expression)
+    parser = _Parser(expression)
+    node = parser.condition()
+    if not parser.done():
+        raise _client_error("ValidationException", f"Unexpected token {parser.peek()}", "Expression")
+    return node
+
+
+def _parse_update(expression):
+    """Return a list of (action, path, value_node) tuples for SET/REMOVE/ADD/DELETE clauses."""
+    parser = _Parser(expression)
+    actions = []
+    while not parser.done():
+        clause = parser.take().upper()
+        if clause not in ("SET", "REMOVE", "ADD", "DELETE"):
+            raise _client_error("ValidationException", f"Invalid update clause {clause}", "UpdateItem")
+        while True:
+            path = parser.path_rest(parser.take())
+            if clause == "SET":
+                parser.take("=")
+                actions.append(("SET", path, parser.value_expr()))
+            elif clause == "REMOVE":
+                actions.append(("REMOVE", path, None))
+            else:
+                actions.append((clause, path, parser.operand()))
+            if parser.peek() != ",":
+                break
+            parser.take()
+    return actions
+
+
+def _parse_projection(expression, names):
+    if not expression:
+        return None
+    evaluator = _Evaluator(names)
+    attributes = []
+    for part in expression.split(","):
+        attributes.append(evaluator.name(part.strip().split(".")[0].split("[")[0]))
+    return attributes
+
+
+def _project(item, attributes):
+    if attributes is None:
+        return copy.deepcopy(item)
+    return {name: copy.deepcopy(item[name]) for name in attributes if name in item}
+
+
+class FakeTable:
+    def __init__(self, backend, name, key, indexes):
+        self._backend = backend
+        self.name = name
+        self.table_name = name
+        self.key = key
+        self.indexes = indexes
+        self._items = {}
+
+    # helpers
+    def _key_of(self, item, attributes=None):
+        attributes = attributes or self.key
+        try:
+            return tuple(item[attribute] for attribute in attributes)
+        except KeyError as e:
+            raise _client_error("ValidationException",
+                                f"The provided key element does not match the schema: missing {e}", "Key")
+
+    def _key_dict(self, item, attributes=None):
+        return {attribute: item[attribute] for attribute in (attributes or self.key)}
+
+    def _check_condition(self, expression, item, names, values, operation):
+        node = _parse_condition(expression)
+        if node is not None and not _Evaluator(names, values).condition(item or {}, node):
+            raise _client_error("ConditionalCheckFailedException", "The conditional request failed", operation)
+
+    def _call(self, operation, items=0):
+        self._backend.stats.record("dynamodb", operation, self.name, items)
+        self._backend.latency.delay(items)
+
+    # item operations
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        with self._backend.lock:
+            item = self._items.get(self._key_of(Key))
+            item = _project(item, _parse_projection(ProjectionExpression, ExpressionAttributeNames)) if item else None
+        self._call("GetItem", 1 if item else 0)
+        return {"Item": item} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues="NONE", **kwargs):
+        item = _normalize_item(Item)
+        key = self._key_of(item)
+        # Failed conditional writes are still a round trip, so count before evaluating the condition
+        self._call("PutItem", 1)
+        with self._backend.lock:
+            old = self._items.get(key)
+            self._check_condition(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues, "PutItem")
+            self._items[key] = item
+        return {"Attributes": copy.deepcopy(old)} if ReturnValues == "ALL_OLD" and old else {}
+
+    def update_item(self, Key, UpdateExpression=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", **kwargs):
+        key = self._key_of(Key)
+        names, values = ExpressionAttributeNames or {}, _normalize_item(ExpressionAttributeValues or {})
+        self._call("UpdateItem", 1)
+        with self._backend.lock:
+            old = self._items.get(key)
+            self._check_condition(ConditionExpression, old, names, values, "UpdateItem")
+            item = copy.deepcopy(old) if old else _normalize_item(Key)
+            updated = self._apply_update(item, UpdateExpression or "", names, values)
+            self._items[key] = _normalize_item(item)
+        if ReturnValues == "ALL_NEW":
+            return {"Attributes": copy.deepcopy(item)}
+        if ReturnValues == "ALL_OLD":
+            return {"Attributes": copy.deepcopy(old)} if old else {}
+        if ReturnValues == "UPDATED_NEW":
+            return {"Attributes": {name: copy.deepcopy(item[name]) for name in updated if name in item}}
+        return {}
+
+    def _apply_update(self, item, expression, names, values):
+        evaluator = _Evaluator(names, values)
+        # Every operand is evaluated against the pre-update image, as DynamoDB does
+        before = copy.deepcopy(item)
+        updated = []
+        for action, path, node in _parse_update(expression):
+            segments = evaluator.resolve_path(path)
+            parent = item
+            for segment in segments[:-1]:
+                parent = parent[segment]
+            leaf = segments[-1]
+            if leaf in self.key and parent is item:
+                raise _client_error("ValidationException", f"Cannot update attribute {leaf}. This attribute is part of the key", "UpdateItem")
+            updated.append(segments[0])
+            if action == "SET":
+                parent[leaf] = evaluator.operand(before, node)
+            elif action == "REMOVE":
+                if isinstance(parent, list):
+                    if leaf < len(parent):
+                        parent.pop(leaf)
+                else:
+                    parent.pop(leaf, None)
+            elif action == "ADD":
+                value = evaluator.operand(before, node)
+                current = parent.get(leaf, _MISSING) if isinstance(parent, dict) else _MISSING
+                if current is _MISSING:
+                    parent[leaf] = value
+                elif isinstance(current, set):
+                    parent[leaf] = current | set(value)
+                else:
+                    parent[leaf] = current + value
+            elif action == "DELETE":
+                current = parent.get(leaf)
+                if isinstance(current, set):
+                    remaining = current - set(evaluator.operand(before, node))
+                    if remaining:
+                        parent[leaf] = remaining
+                    else:
+                        parent.pop(leaf)
+        return updated
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues="NONE", **kwargs):
+        key = self._key_of(Key)
+        self._call("DeleteItem", 1)
+        with self._backend.lock:
+            old = self._items.get(key)
+            self._check_condition(ConditionExpression, old, ExpressionAttributeNames, ExpressionAttributeValues, "DeleteItem")
+            self._items.pop(key, None)
+        return {"Attributes": copy.deepcopy(old)} if ReturnValues == "ALL_OLD" and old else {}
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return FakeBatchWriter(self)
+
+    # reads over many items
+    def _page(self, candidates, operation, key_attributes, Limit=None, ExclusiveStartKey=None,
+              FilterExpression=None, ProjectionExpression=None, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, Select=None):
+        names, values = ExpressionAttributeNames or {}, ExpressionAttributeValues or {}
+        if ExclusiveStartKey:
+            start = self._key_of(ExclusiveStartKey, key_attributes)
+            for position, item in enumerate(candidates):
+                if self._key_of(item, key_attributes) == start:
+                    candidates = candidates[position + 1:]
+                    break
+        page_size = min(Limit or DEFAULT_PAGE_SIZE, DEFAULT_PAGE_SIZE)
+        page, more = copy.deepcopy(candidates[:page_size]), len(candidates) > page_size
+        filter_node = _parse_condition(FilterExpression)
+        evaluator = _Evaluator(names, values)
+        matched = [item for item in page if filter_node is None or evaluator.condition(item, filter_node)]
+        projection = _parse_projection(ProjectionExpression, names)
+        response = {"Count": len(matched), "ScannedCount": len(page)}
+        if Select != "COUNT":
+            response["Items"] = [_project(item, projection) for item in matched]
+        if more and page:
+            response["LastEvaluatedKey"] = self._key_dict(page[-1], key_attributes)
+        self._call(operation, len(page))
+        return response
+
+    def _index_schema(self, index_name):
+        if not index_name:
+            return self.key
+        if index_name not in self.indexes:
+            raise _client_error("ValidationException",
+                                f"The table does not have the specified index: {index_name}", "Query")
+        return self.indexes[index_name]
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, ExpressionAttributeNames=None,
+              ExpressionAttributeValues=None, **kwargs):
+        index_key = self._index_schema(IndexName)
+        key_node = _parse_condition(KeyConditionExpression)
+        evaluator = _Evaluator(ExpressionAttributeNames, ExpressionAttributeValues)
+        with self._backend.lock:
+            # GSIs are sparse: items without the index key attributes are not in the index
+            candidates = [item for item in self._items.values()
+                          if all(attribute in item for attribute in index_key) and evaluator.condition(item, key_node)]
+        if len(index_key) > 1:
+            candidates.sort(key=lambda item: item[index_key[1]], reverse=not ScanIndexForward)
+        # Pagination keys of a GSI carry the index key plus the table key
+        key_attributes = tuple(dict.fromkeys(index_key + self.key))
+        return self._page(candidates, "Query", key_attributes, ExpressionAttributeNames=ExpressionAttributeNames,
+                          ExpressionAttributeValues=ExpressionAttributeValues, **kwargs)
+
+    def scan(self, Segment=None, TotalSegments=None, IndexName=None, **kwargs):
+        index_key = self._index_schema(IndexName)
+        with self._backend.lock:
+            candidates = [item for item in self._items.values()
+                          if all(attribute in item for attribute in index_key)
+                          and (not TotalSegments or _segment_of(self._key_of(item), TotalSegments) == Segment)]
+        key_attributes = tuple(dict.fromkeys(index_key + self.key))
+        return self._page(candidates, "Scan", key_attributes, **kwargs)
+
+    # bulk load for local seeding, bypasses stats and latency
+    def load(self, items):
+        with self._backend.lock:
+            for item in items:
+                item = _normalize_item(item)
+                self._items[self._key_of(item)] = item
+
+    def all_items(self):
+        with self._backend.lock:
+            return [copy.deepcopy(item) for item in self._items.values()]
+
+
+def _segment_of(key, total_segments):
+    digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+    return int(digest, 16) % total_segments
+
+
+class FakeBatchWriter:
+    def __init__(self, table):
+        self._table = table
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._flush()
+        return False
+
+    def put_item(self, Item):
+        self._pending.append(("put", _normalize_item(Item)))
+        if len(self._pending) >= BATCH_WRITE_CHUNK_SIZE:
+            self._flush()
+
+    def delete_item(self, Key):
+        self._pending.append(("delete", Key))
+        if len(self._pending) >= BATCH_WRITE_CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        table = self._table
+        with table._backend.lock:
+            for action, payload in self._pending:
+                if action == "put":
+                    table._items[table._key_of(payload)] = payload
+                else:
+                    table._items.pop(table._key_of(payload), None)
+        table._call("BatchWriteItem", len(self._pending))
+        self._pending = []
+
+
+class FakeDynamoDBClient:
+    """The low level client reached through resource.meta.client; only TransactWriteItems is needed."""
+
+    def __init__(self, resource):
+        self._resource = resource
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        backend = self._resource._backend
+        if len(TransactItems) > 100:
+            raise _client_error("ValidationException", "Member must have length less than or equal to 100", "TransactWriteItems")
+        backend.stats.record("dynamodb", "TransactWriteItems", None, len(TransactItems))
+        backend.latency.delay(len(TransactItems))
+        plain = []
+        for action in TransactItems:
+            (action_type, request), = action.items()
+            request = dict(request)
+            for field in ("Item", "Key", "ExpressionAttributeValues"):
+                if field in request:
+                    request[field] = {k: _deserializer.deserialize(v) for k, v in request[field].items()}
+            plain.append((action_type, request))
+        with backend.lock:
+            # Evaluate every condition before applying anything, so the transaction is all or nothing
+            reasons, failed = [], False
+            for action_type, request in plain:
+                table = self._resource.Table(request["TableName"])
+                key = table._key_of(request.get("Item") or request["Key"])
+                node = _parse_condition(request.get("ConditionExpression"))
+                evaluator = _Evaluator(request.get("ExpressionAttributeNames"), request.get("ExpressionAttributeValues"))
+                if node is not None and not evaluator.condition(table._items.get(key) or {}, node):
+                    reasons.append({"Code": "ConditionalCheckFailed", "Message": "The conditional request failed"})
+                    failed = True
+                else:
+                    reasons.append({"Code": "None"})
+            if failed:
+                error = ClientError({"Error": {"Code": "TransactionCanceledException",
+                                               "Message": "Transaction cancelled, please refer cancellation reasons for specific reasons"},
+                                     "CancellationReasons": reasons}, "TransactWriteItems")
+                raise error
+            for action_type, request in plain:
+                table = self._resource.Table(request["TableName"])
+                if action_type == "Put":
+                    item = _normalize_item(request["Item"])
+                    table._items[table._key_of(item)] = item
+                elif action_type == "Delete":
+                    table._items.pop(table._key_of(request["Key"]), None)
+                elif action_type == "Update":
+                    key = table._key_of(request["Key"])
+                    item = copy.deepcopy(table._items.get(key)) or _normalize_item(request["Key"])
+                    table._apply_update(item, request["UpdateExpression"], request.get("ExpressionAttributeNames") or {},
+                                        request.get("ExpressionAttributeValues") or {})
+                    table._items[key] = _normalize_item(item)
+        return {}
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class FakeDynamoDBResource:
+    def __init__(self, backend):
+        self._backend = backend
+        self._tables = {}
+        self.meta = _Meta(FakeDynamoDBClient(self))
+        for name, schema in TABLE_SCHEMAS.items():
+            self.create_table(name, schema["key"], schema.get("indexes", {}))
+
+    def create_table(self, name, key, indexes=None):
+        self._tables[name] = FakeTable(self._backend, name, tuple(key),
+                                       {index: tuple(schema) for index, schema in (indexes or {}).items()})
+        return self._tables[name]
+
+    def Table(self, name):
+        if name not in self._tables:
+            raise _client_error("ResourceNotFoundException", f"Requested resource not found: Table: {name}", "DescribeTable")
+        return self._tables[name]
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        responses = {}
+        total = 0
+        for table_name, request in RequestItems.items():
+            if len(request.get("Keys", [])) > 100:
+                raise _client_error("ValidationException", "Too many items requested for the BatchGetItem call", "BatchGetItem")
+            table = self.Table(table_name)
+            projection = _parse_projection(request.get("ProjectionExpression"), request.get("ExpressionAttributeNames"))
+            found = []
+            with self._backend.lock:
+                for key in request.get("Keys", []):
+                    item = table._items.get(table._key_of(key))
+                    if item:
+                        found.append(_project(item, projection))
+            responses[table_name] = found
+            total += len(found)
+        self._backend.stats.record("dynamodb", "BatchGetItem", None, total)
+        self._backend.latency.delay(total)
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+
+class _Body:
+    """Minimal StreamingBody: read() once, optionally in chunks."""
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read(amt) if amt else self._stream.read()
+
+    def close(self):
+        self._stream.close()
+
+
+class _S3Exceptions:
+    class NoSuchKey(ClientError):
+        pass
+
+    class NoSuchBucket(ClientError):
+        pass
+
+
+class FakeS3Client:
+    exceptions = _S3Exceptions
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._objects = {}
+
+    def _call(self, operation, bucket, items=0):
+        self._backend.stats.record("s3", operation, bucket, items)
+        self._backend.latency.delay(items)
+
+    def put_object(self, Bucket, Key, Body=b"", ContentType=None, Metadata=None, **kwargs):
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        etag = hashlib.md5(Body).hexdigest()
+        with self._backend.lock:
+            self._objects[(Bucket, Key)] = {"Body": bytes(Body), "ContentType": ContentType or "binary/octet-stream",
+                                            "Metadata": dict(Metadata or {}), "ETag": f'"{etag}"',
+                                            "LastModified": datetime.now(timezone.utc),
+                                            "ContentEncoding": kwargs.get("ContentEncoding")}
+        self._call("PutObject", Bucket, 1)
+        return {"ETag": f'"{etag}"'}
+
+    def _get(self, Bucket, Key, operation):
+        with self._backend.lock:
+            stored = self._objects.get((Bucket, Key))
+        if stored is None:
+            self._call(operation, Bucket)
+            error = {"Error": {"Code": "NoSuchKey", "Message": "The specified key does not exist."}}
+            if operation == "HeadObject":
+                error = {"Error": {"Code": "404", "Message": "Not Found"}}
+                raise ClientError(error, operation)
+            raise _S3Exceptions.NoSuchKey(error, operation)
+        self._call(operation, Bucket, 1)
+        response = {"ContentLength": len(stored["Body"]), "ContentType": stored["ContentType"],
+                    "Metadata": dict(stored["Metadata"]), "ETag": stored["ETag"],
+                    "LastModified": stored["LastModified"]}
+        if stored["ContentEncoding"]:
+            response["ContentEncoding"] = stored["ContentEncoding"]
+        return stored, response
+
+    def get_object(self, Bucket, Key, **kwargs):
+        stored, response = self._get(Bucket, Key, "GetObject")
+        response["Body"] = _Body(stored["Body"])
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return self._get(Bucket, Key, "HeadObject")[1]
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self._backend.lock:
+            self._objects.pop((Bucket, Key), None)
+        self._call("DeleteObject", Bucket, 1)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, ContinuationToken=None, StartAfter=None, **kwargs):
+        with self._backend.lock:
+            keys = sorted(key for bucket, key in self._objects if bucket == Bucket and key.startswith(Prefix))
+            start_after = ContinuationToken or StartAfter
+            if start_after:
+                keys = [key for key in keys if key > start_after]
+            page = keys[:MaxKeys]
+            contents = [{"Key": key, "Size": len(self._objects[(Bucket, key)]["Body"]),
+                         "ETag": self._objects[(Bucket, key)]["ETag"],
+                         "LastModified": self._objects[(Bucket, key)]["LastModified"]} for key in page]
+        self._call("ListObjectsV2", Bucket, len(page))
+        response = {"Name": Bucket, "Prefix": Prefix, "KeyCount": len(page), "MaxKeys": MaxKeys,
+                    "IsTruncated": len(keys) > MaxKeys}
+        if contents:
+            response["Contents"] = contents
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        # Signing is local in boto3 as well, so this is not counted as a round trip
+        Params = Params or {}
+        return f"memory://{Params.get('Bucket')}/{Params.get('Key')}?method={ClientMethod}&expires={ExpiresIn}"
+
+
+class _SecretsExceptions:
+    class ResourceNotFoundException(ClientError):
+        pass
+
+    class ResourceExistsException(ClientError):
+        pass
+
+
+class FakeSecretsManagerClient:
+    exceptions = _SecretsExceptions
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._secrets = {}
+
+    def _call(self, operation, name):
+        self._backend.stats.record("secretsmanager", operation, None, 1)
+        self._backend.latency.delay(1)
+
+    def _arn(self, name):
+        return f"arn:aws:secretsmanager:local:000000000000:secret:{name}"
+
+    def create_secret(self, Name, SecretString=None, SecretBinary=None, **kwargs):
+        self._call("CreateSecret", Name)
+        with self._backend.lock:
+            if Name in self._secrets:
+                raise _SecretsExceptions.ResourceExistsException(
+                    {"Error": {"Code": "ResourceExistsException", "Message": f"The secret {Name} already exists."}},
+                    "CreateSecret")
+            self._secrets[Name] = {"SecretString": SecretString, "SecretBinary": SecretBinary}
+        return {"ARN": self._arn(Name), "Name": Name}
+
+    def _existing(self, SecretId, operation):
+        if SecretId not in self._secrets:
+            raise _SecretsExceptions.ResourceNotFoundException(
+                {"Error": {"Code": "ResourceNotFoundException",
+                           "Message": "Secrets Manager can't find the specified secret."}}, operation)
+        return self._secrets[SecretId]
+
+    def get_secret_value(self, SecretId, **kwargs):
+        self._call("GetSecretValue", SecretId)
+        with self._backend.lock:
+            secret = dict(self._existing(SecretId, "GetSecretValue"))
+        response = {"ARN": self._arn(SecretId), "Name": SecretId}
+        response.update({key: value for key, value in secret.items() if value is not None})
+        return response
+
+    def update_secret(self, SecretId, SecretString=None, SecretBinary=None, **kwargs):
+        self._call("UpdateSecret", SecretId)
+        with self._backend.lock:
+            self._existing(SecretId, "UpdateSecret")
+            self._secrets[SecretId] = {"SecretString": SecretString, "SecretBinary": SecretBinary}
+        return {"ARN": self._arn(SecretId), "Name": SecretId}
+
+    put_secret_value = update_secret
+
+
+class FakeSQSClient:
+    """Standard queues keyed by URL; DelaySeconds and visibility timeouts run on the wall clock."""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._queues = {}
+        self._sequence = 0
+
+    def _call(self, operation, queue_url, items=0):
+        self._backend.stats.record("sqs", operation, queue_url.rsplit("/", 1)[-1], items)
+        self._backend.latency.delay(items)
+
+    def send_message(self, QueueUrl, MessageBody, DelaySeconds=0, **kwargs):
+        self._call("SendMessage", QueueUrl, 1)
+        with self._backend.lock:
+            self._sequence += 1
+            message_id = f"msg-{self._sequence}"
+            self._queues.setdefault(QueueUrl, []).append(
+                {"MessageId": message_id, "Body": MessageBody, "visible_at": time.time() + int(DelaySeconds)})
+        return {"MessageId": message_id}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, VisibilityTimeout=30, **kwargs):
+        now = time.time()
+        with self._backend.lock:
+            ready = [message for message in self._queues.get(QueueUrl, []) if message["visible_at"] <= now]
+            ready = ready[:min(int(MaxNumberOfMessages), 10)]
+            for message in ready:
+                message["visible_at"] = now + int(VisibilityTimeout)
+                message["ReceiptHandle"] = f"{message['MessageId']}:{now}"
+            messages = [{key: message[key] for key in ("MessageId", "ReceiptHandle", "Body")} for message in ready]
+        self._call("ReceiveMessage", QueueUrl, len(messages))
+        return {"Messages": messages} if messages else {}
+
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        self._call("DeleteMessage", QueueUrl)
+        with self._backend.lock:
+            self._queues[QueueUrl] = [message for message in self._queues.get(QueueUrl, [])
+                                      if message.get("ReceiptHandle") != ReceiptHandle]
+        return {}
+
+    def drain(self, QueueUrl, ignore_delay=False):
+        """Remove and return every queued message as a Lambda SQS event, optionally skipping DelaySeconds."""
+        now = time.time()
+        with self._backend.lock:
+            queued = self._queues.get(QueueUrl, [])
+            ready = [message for message in queued if ignore_delay or message["visible_at"] <= now]
+            self._queues[QueueUrl] = [message for message in queued if message not in ready]
+        return {"Records": [{"messageId": message["MessageId"], "body": message["Body"], "eventSource": "aws:sqs"}
+                            for message in ready]}
+
+
+class MemoryAWS:
+    """One process wide set of fake services sharing a lock, latency model and call counters."""
+
+    def __init__(self, latency=None):
+        self.lock = threading.RLock()
+        self.stats = CallStats()
+        self.latency = latency or LatencyModel(
+            base_ms=float(os.environ.get("BEZ_MEMORY_LATENCY_MS", "0")),
+            jitter_ms=float(os.environ.get("BEZ_MEMORY_JITTER_MS", "0")),
+            per_item_ms=float(os.environ.get("BEZ_MEMORY_PER_ITEM_MS", "0")))
+        self.dynamodb = FakeDynamoDBResource(self)
+        self.s3 = FakeS3Client(self)
+        self.secrets_manager = FakeSecretsManagerClient(self)
+        self.sqs = FakeSQSClient(self)
+
+    def seed(self, tables=None, objects=None, secrets=None):
+        """Load fixtures without touching the counters: {table: [items]}, {(bucket, key): body}, {name: value}."""
+        for table_name, items in (tables or {}).items():
+            self.dynamodb.Table(table_name).load(items)
+        for (bucket, key), body in (objects or {}).items():
+            self.s3.put_object(Bucket=bucket, Key=key, Body=body)
+        for name, value in (secrets or {}).items():
+            self.secrets_manager.create_secret(Name=name, SecretString=value if isinstance(value, str) else json.dumps(value))
+        self.stats.reset()
+
+
+memory_aws = MemoryAWS()
@@ -1,11 +1,14 @@
-import boto3, logging
+import logging
 # import pandas as pd
 import csv
 from io import BytesIO
 from io import StringIO
 
+# import from bez resources
+from bez_utility.bez_utils_backend import _get_s3_client
+
 # Initialize DynamoDB resource
-s3 = boto3.client('s3')
+s3 = _get_s3_client()
 
 # Configure logging
 logger = logging.getLogger()
@@ -31,7 +34,6 @@ def _read_csv_s3(bucket_name, object_key):
         # with BytesIO(response['Body'].read()) as file_stream:
         #     df = pd.read_csv(file_stream, encoding='utf-8')
         # return df.to_dict(orient='records')
-        s3 = boto3.client("s3")
         response = s3.get_object(Bucket=bucket_name, Key=object_key)
         content = response['Body'].read().decode('utf-8')
         csv_reader = csv.DictReader(StringIO(content))
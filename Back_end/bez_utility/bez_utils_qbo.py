@@ -1,13 +1,19 @@
-import json, logging, boto3, time, os
+import json, logging, time, os, threading, random, re
 import http.client
 import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
 
 # import from bez resources
 from bez_utility.bez_utils_aws import _get_record_from_table, _get_secret_value, _update_data_in_table, _write_s3
+from bez_utility.bez_utils_backend import _get_dynamodb_resource
+from bez_utility.bez_utils_common import _generate_sortable_id
+from bez_utility.bez_utils_qbo_report_cache import _get_cached_report, _put_cached_report, _get_report_cache_stats
+from bez_utility.bez_utils_qbo_report_format import _flatten_qbo_report
 
 # Initialize resources
-dynamodb = boto3.resource('dynamodb')
+dynamodb = _get_dynamodb_resource()
 
 # Calling resources
 qb_integration_tokens_table = dynamodb.Table("qb_integration_tokens")
@@ -16,6 +22,32 @@ qb_integration_tokens_table = dynamodb.Table("qb_integration_tokens")
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Access tokens live for an hour. They are stored with their expiry on the qb_integration_tokens item and
+# reused until ACCESS_TOKEN_MARGIN_SECONDS before it; only the caller holding the refresh lease rotates
+# the refresh token, the rest wait for the token it writes.
+ACCESS_TOKEN_MARGIN_SECONDS = 300
+# Fields dropped from the item whenever the refresh token or credentials change outside the lease
+ACCESS_TOKEN_FIELDS = ["access_token", "access_token_expires_at", "realm_id", "sandbox"]
+REFRESH_LEASE_SECONDS = 30
+LEASE_POLL_SECONDS = 0.25
+# A container's own copy is re-read from the table after this long, so a credentials change is seen
+IN_PROCESS_TOKEN_SECONDS = 300
+_token_cache = {}
+_token_lock = threading.Lock()
+
+# Entity lookups: QBO's /batch endpoint takes up to 30 operations per request; larger sets are split and
+# the requests run concurrently, each worker thread reusing its own keep-alive connection
+QBO_BATCH_MAX_ITEMS = 30
+ENTITY_LOOKUP_WORKERS = 4
+# QBO returns at most 1000 rows per query; larger results are read page by page with STARTPOSITION
+QBO_QUERY_PAGE_SIZE = 1000
+ENTITY_LOOKUP_MAX_RESULTS = QBO_QUERY_PAGE_SIZE
+QBO_MAX_RETRIES = 3
+QBO_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Entity names reach the query text, so only plain identifiers are accepted
+QBO_ENTITY_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9]*$")
+_qbo_connections = threading.local()
+
 def _get_secret_from_intid(integration_id):
     try:
         integration = _get_record_from_table({"table_name": "integrations", "keys": {"integration_id": integration_id}, "gsi_name": ""})
@@ -67,6 +99,11 @@ def _get_refresh_token_from_intid(integration_id):
         raise Exception(f"Unexpected error getting refresh token: {str(e)}")
 
 def _get_new_refresh_token(client_id, client_secret, refresh_token):
+    tokens = _request_qbo_tokens(client_id, client_secret, refresh_token)
+    return tokens.get("refresh_token"), tokens.get("access_token")
+
+def _request_qbo_tokens(client_id, client_secret, refresh_token):
+    """Rotate the refresh token with Intuit; returns the token response (access_token, expires_in, refresh_token, ...)."""
     try:
         base_url = "oauth.platform.intuit.com"
         path = "/oauth2/v1/tokens/bearer"
@@ -90,26 +127,30 @@ def _get_new_refresh_token(client_id, client_secret, refresh_token):
             raise Exception(f"Function Error: Failed to get new refresh token: {data}")
         else:
             logger.info(f"Response: {data}")
-            new_refresh_token = json.loads(data).get("refresh_token")
-            logger.info(f"New refresh token: {new_refresh_token}")
-            access_token = json.loads(data).get("access_token")
-            return new_refresh_token, access_token
+            return json.loads(data)
     except Exception as e:
         raise e
 
 def _save_updated_refresh_token(refresh_token, new_refresh_token, integration_id):
     try:
+        # Credentials may have changed with it, so the stored access token is dropped and the next
+        # workflow refreshes through the lease
+        _invalidate_qbo_access_token(integration_id)
         if refresh_token != new_refresh_token:
             response = _update_data_in_table({"table_name": "qb_integration_tokens", 
                                             "key": "integration_id",
                                             "key_value": integration_id,
                                             "update_data": {"refresh_token": new_refresh_token, "old_refresh_token": refresh_token},
+                                            "remove_attributes": ACCESS_TOKEN_FIELDS,
                                             "gsi_key": "",
                                             "gsi_value": ""})
             logger.info(f"Response: {response}")
         else:
-            response = {"Refresh token not updated"}
-            logger.info(f"Response: {response}")
+            response = _update_data_in_table({"table_name": "qb_integration_tokens",
+                                            "key": "integration_id",
+                                            "key_value": integration_id,
+                                            "remove_attributes": ACCESS_TOKEN_FIELDS})
+            logger.info("Refresh token not updated")
         return response
     except ClientError as e:
         raise Exception(f"Failed to update refresh token: {e.response['Error']['Message']}")
@@ -144,76 +185,310 @@ def _create_qbo_refresh_token_record(integration_id, user_id, session_id, refres
             "created_at": str(int(time.time())),
             "updated_at": str(int(time.time()))
         }
+        # Replaces the whole item, stored access token included
         qb_integration_tokens_table.put_item(Item=item)
+        _invalidate_qbo_access_token(integration_id)
         logger.info(f"Refresh token updated in qbo_integration_tokens table.")
     except Exception as error:
         logger.error(f"Unexpected error: {error}")
         raise error
 
+def _token_is_fresh(token):
+    return bool(token.get("access_token")) and int(token.get("access_token_expires_at", 0)) - ACCESS_TOKEN_MARGIN_SECONDS > time.time()
+
+def _invalidate_qbo_access_token(integration_id):
+    with _token_lock:
+        _token_cache.pop(integration_id, None)
+
+def _acquire_refresh_lease(integration_id, owner):
+    try:
+        qb_integration_tokens_table.update_item(
+            Key={"integration_id": integration_id},
+            UpdateExpression="SET refresh_lease_owner = :owner, refresh_lease_until = :until",
+            ConditionExpression="attribute_exists(refresh_token) AND (attribute_not_exists(refresh_lease_until) OR refresh_lease_until < :now)",
+            ExpressionAttributeValues={":owner": owner, ":until": int(time.time()) + REFRESH_LEASE_SECONDS, ":now": int(time.time())})
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        return False
+
+def _refresh_under_lease(integration_id, owner):
+    """Rotate the refresh token and store the new access token; the caller holds the lease."""
+    try:
+        token = qb_integration_tokens_table.get_item(Key={"integration_id": integration_id}, ConsistentRead=True).get("Item", {})
+        if _token_is_fresh(token):
+            # Refreshed by the previous lease holder between our read and the lease
+            qb_integration_tokens_table.update_item(
+                Key={"integration_id": integration_id}, UpdateExpression="REMOVE refresh_lease_owner, refresh_lease_until",
+                ConditionExpression="refresh_lease_owner = :owner", ExpressionAttributeValues={":owner": owner})
+            return token
+        client_id, client_secret, realm_id, sandbox = _get_qbo_creds_from_secret(_get_secret_from_intid(integration_id))
+        tokens = _request_qbo_tokens(client_id, client_secret, token["refresh_token"])
+        fresh = {"access_token": tokens["access_token"],
+                 "access_token_expires_at": int(time.time()) + int(tokens.get("expires_in", 3600)),
+                 "realm_id": realm_id, "sandbox": sandbox}
+        update_data = dict(fresh, refresh_token=tokens.get("refresh_token") or token["refresh_token"],
+                           old_refresh_token=token["refresh_token"], updated_at=str(int(time.time())))
+        try:
+            qb_integration_tokens_table.update_item(
+                Key={"integration_id": integration_id},
+                UpdateExpression=("SET " + ", ".join(f"#{k} = :{k}" for k in update_data)
+                                  + " REMOVE refresh_lease_owner, refresh_lease_until"),
+                ConditionExpression="refresh_lease_owner = :owner",
+                ExpressionAttributeNames={f"#{k}": k for k in update_data},
+                ExpressionAttributeValues=dict({f":{k}": v for k, v in update_data.items()}, **{":owner": owner}))
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            # The lease ran out and another caller took over. Intuit has already rotated the refresh token,
+            # so save it anyway unless that caller has stored a newer one; the lease stays theirs
+            logger.warning(f"Refresh lease for integration {integration_id} expired before the token was saved.")
+            try:
+                qb_integration_tokens_table.update_item(
+                    Key={"integration_id": integration_id},
+                    UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in update_data),
+                    ConditionExpression="refresh_token = :used",
+                    ExpressionAttributeNames={f"#{k}": k for k in update_data},
+                    ExpressionAttributeValues=dict({f":{k}": v for k, v in update_data.items()},
+                                                   **{":used": token["refresh_token"]}))
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                logger.warning(f"Refresh token for integration {integration_id} was already replaced; keeping the stored one.")
+        return fresh
+    except Exception:
+        # Let the next caller try straight away rather than wait out the lease
+        try:
+            qb_integration_tokens_table.update_item(
+                Key={"integration_id": integration_id}, UpdateExpression="REMOVE refresh_lease_owner, refresh_lease_until",
+                ConditionExpression="refresh_lease_owner = :owner", ExpressionAttributeValues={":owner": owner})
+        except ClientError:
+            pass
+        raise
+
+def _get_qbo_access_token(integration_id):
+    """{"access_token", "realm_id", "sandbox"} for the integration, refreshing with Intuit only when needed.
+
+    Served from this container's copy, else from the token stored on qb_integration_tokens. When that has
+    expired, one caller takes the refresh lease (a conditional update) and rotates the refresh token while
+    the others poll the item for the token it writes, taking over if the lease runs out.
+    """
+    with _token_lock:
+        cached = _token_cache.get(integration_id)
+    if cached and cached[0] > time.time() and _token_is_fresh(cached[1]):
+        return dict(cached[1])
+    owner = _generate_sortable_id()
+    deadline = time.time() + 2 * REFRESH_LEASE_SECONDS
+    while True:
+        token = qb_integration_tokens_table.get_item(Key={"integration_id": integration_id}, ConsistentRead=True).get("Item", {})
+        if not token.get("refresh_token"):
+            raise Exception("Function Error: Refresh token not found in qb_integration_tokens")
+        if not _token_is_fresh(token) and _acquire_refresh_lease(integration_id, owner):
+            token = _refresh_under_lease(integration_id, owner)
+        if _token_is_fresh(token):
+            fresh = {"access_token": token["access_token"], "access_token_expires_at": int(token["access_token_expires_at"]),
+                     "realm_id": token.get("realm_id"), "sandbox": token.get("sandbox", "false")}
+            with _token_lock:
+                _token_cache[integration_id] = (time.time() + IN_PROCESS_TOKEN_SECONDS, fresh)
+            return dict(fresh)
+        if time.time() > deadline:
+            raise Exception(f"Timed out waiting for the QBO token refresh of integration {integration_id}")
+        time.sleep(LEASE_POLL_SECONDS)
+
 def _qbo_create_connection(event):
     try:
         logger.info(f"Creating QBO Connection with: {event}")
         integration_id = event.get("integration_id")
         user_id = event.get("user_id")
         session_id = event.get("session_id")
-        secret_name = _get_secret_from_intid(integration_id)
-        client_id, client_secret, realm_id, sandbox = _get_qbo_creds_from_secret(secret_name)
-        refresh_token = _get_refresh_token_from_intid(integration_id)
-        new_refresh_token, access_token = _get_new_refresh_token(client_id, client_secret, refresh_token)
-        _save_updated_refresh_token(refresh_token, new_refresh_token, integration_id)
-        return {"realm_id": realm_id,
-                "access_token": access_token,
-                "sandbox": sandbox}
+        token = _get_qbo_access_token(integration_id)
+        return {"realm_id": token["realm_id"],
+                "access_token": token["access_token"],
+                "sandbox": token["sandbox"]}
     except Exception as e:
         raise Exception(str(e))
 
+def _qbo_base_url(sandbox):
+    return "sandbox-quickbooks.api.intuit.com" if str(sandbox).lower() == "true" else "quickbooks.api.intuit.com"
+
+def _qbo_request(base_url, method, path, headers, body=None):
+    """(status, decoded body) over this thread's keep-alive connection to base_url.
+
+    A connection the server closed is reopened once; throttling and 5xx responses are retried with
+    exponential backoff.
+    """
+    connections = getattr(_qbo_connections, "by_host", None)
+    if connections is None:
+        connections = _qbo_connections.by_host = {}
+    attempt = 0
+    while True:
+        conn = connections.get(base_url)
+        reused = conn is not None
+        if conn is None:
+            conn = connections[base_url] = http.client.HTTPSConnection(base_url, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read().decode("utf-8")
+        except (http.client.HTTPException, ConnectionError, OSError):
+            conn.close()
+            connections.pop(base_url, None)
+            if reused:
+                # Idle keep-alive connection dropped by the server; retry on a new one
+                continue
+            raise
+        if response.status in QBO_RETRY_STATUSES and attempt < QBO_MAX_RETRIES:
+            attempt += 1
+            time.sleep(random.uniform(0, min(0.25 * (2 ** attempt), 4)))
+            continue
+        return response.status, data
+
+def _escape_qbo_literal(value):
+    """Quote-safe text for a QBO query string literal."""
+    value = "".join(ch for ch in str(value) if ch >= " ")
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def _entity_lookup_where(name):
+    return f"DisplayName LIKE '%{_escape_qbo_literal(name)}%'"
+
+def _qbo_query_text(entity, fields="*", where=None, start_position=None, max_results=None):
+    query = f"SELECT {fields} FROM {entity}" + (f" WHERE {where}" if where else "")
+    if start_position is not None:
+        query += f" STARTPOSITION {start_position} MAXRESULTS {max_results}"
+    return query
+
+def _entity_lookup_query(entity, name):
+    return _qbo_query_text(entity, "Id, DisplayName", _entity_lookup_where(name), 1, ENTITY_LOOKUP_MAX_RESULTS)
+
+def _qbo_query(qbo_creds, query):
+    """QueryResponse of one QBO query."""
+    headers = {"Authorization": f"Bearer {qbo_creds.get('access_token')}", "Accept": "application/json"}
+    params = urllib.parse.urlencode({"query": query})
+    status, data = _qbo_request(_qbo_base_url(qbo_creds.get("sandbox")), "GET",
+                                f"/v3/company/{qbo_creds.get('realm_id')}/query?{params}", headers)
+    if status != 200:
+        raise Exception(f"QBO query failed ({status}): {data}")
+    return json.loads(data).get("QueryResponse", {})
+
+def _count_qbo_query(qbo_creds, entity, where=None):
+    return int(_qbo_query(qbo_creds, _qbo_query_text(entity, "COUNT(*)", where)).get("totalCount", 0))
+
+def _iter_qbo_query(qbo_creds, entity, fields="*", where=None, start_position=1, page_size=QBO_QUERY_PAGE_SIZE,
+                    count_first=False):
+    """Yield every row of a QBO query, following STARTPOSITION until a short page.
+
+    Rows are streamed page by page, so memory stays at a few pages however large the result. With
+    count_first a COUNT(*) query sizes the result first and the pages are then fetched concurrently,
+    at most ENTITY_LOOKUP_WORKERS ahead of the consumer and still yielded in order. Rows added after
+    the count are picked up by continuing past the last counted page.
+    """
+    if not QBO_ENTITY_NAME.match(entity or ""):
+        raise Exception(f"Function Error: Invalid QBO entity {entity!r}")
+    fetch = lambda position: _qbo_query(qbo_creds, _qbo_query_text(entity, fields, where, position, page_size)).get(entity, [])
+    position, rows = start_position, None
+    if count_first:
+        total = _count_qbo_query(qbo_creds, entity, where)
+        positions = range(start_position, total + 1, page_size)
+        if len(positions) > 1:
+            with ThreadPoolExecutor(max_workers=min(ENTITY_LOOKUP_WORKERS, len(positions))) as executor:
+                pending = deque()
+                for page_position in positions:
+                    pending.append(executor.submit(fetch, page_position))
+                    if len(pending) >= ENTITY_LOOKUP_WORKERS:
+                        rows = pending.popleft().result()
+                        yield from rows
+                while pending:
+                    rows = pending.popleft().result()
+                    yield from rows
+            if len(rows) < page_size:
+                return
+            position = positions[-1] + page_size
+    while True:
+        rows = fetch(position)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        position += page_size
+
+def _lookup_matches(entity, query_response):
+    return [{"name": item.get("DisplayName"), "id": item.get("Id")} for item in (query_response or {}).get(entity, [])]
+
+def _run_entity_batch(qbo_creds, entity, names):
+    """{name: matches} for up to QBO_BATCH_MAX_ITEMS names in one /batch request.
+
+    Falls back to one query per name if the batch request itself is refused; names whose operation
+    faulted are left out.
+    """
+    headers = {"Authorization": f"Bearer {qbo_creds.get('access_token')}", "Accept": "application/json",
+               "Content-Type": "application/json"}
+    body = json.dumps({"BatchItemRequest": [{"bId": str(i), "Query": _entity_lookup_query(entity, name)}
+                                            for i, name in enumerate(names)]})
+    status, data = _qbo_request(_qbo_base_url(qbo_creds.get("sandbox")), "POST",
+                                f"/v3/company/{qbo_creds.get('realm_id')}/batch", headers, body)
+    if status != 200:
+        logger.warning(f"Batch lookup of {entity} failed ({status}), querying one by one: {data}")
+        return {name: matches for name in names for matches in [_run_entity_query(qbo_creds, entity, name)]
+                if matches is not None}
+    results = {}
+    for item in json.loads(data).get("BatchItemResponse", []):
+        name = names[int(item["bId"])]
+        if "Fault" in item:
+            logger.warning(f"Error fetching {name}: {item['Fault']}")
+            continue
+        results[name] = _complete_matches(qbo_creds, entity, name, _lookup_matches(entity, item.get("QueryResponse")))
+    return results
+
+def _run_entity_query(qbo_creds, entity, name):
+    try:
+        matches = _lookup_matches(entity, _qbo_query(qbo_creds, _entity_lookup_query(entity, name)))
+    except Exception as e:
+        logger.warning(f"Error fetching {name}: {e}")
+        return None
+    return _complete_matches(qbo_creds, entity, name, matches)
+
+def _complete_matches(qbo_creds, entity, name, matches):
+    """A full first page means there may be more: count them and read the remaining pages concurrently."""
+    if len(matches) < ENTITY_LOOKUP_MAX_RESULTS:
+        return matches
+    rest = _iter_qbo_query(qbo_creds, entity, "Id, DisplayName", _entity_lookup_where(name),
+                           start_position=ENTITY_LOOKUP_MAX_RESULTS + 1, count_first=True)
+    return matches + _lookup_matches(entity, {entity: list(rest)})
+
+def _resolve_entity_names(qbo_creds, entity, names):
+    """{name: [{"name", "id"}, ...]} for every name that could be looked up.
+
+    Names are de-duplicated and sent through /batch in groups of QBO_BATCH_MAX_ITEMS, so up to 30 names
+    resolve in a single round trip; further groups run concurrently on ENTITY_LOOKUP_WORKERS threads.
+    """
+    if not QBO_ENTITY_NAME.match(entity or ""):
+        raise Exception(f"Function Error: Invalid QBO entity {entity!r}")
+    unique_names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+    if not unique_names:
+        return {}
+    groups = [unique_names[i:i + QBO_BATCH_MAX_ITEMS] for i in range(0, len(unique_names), QBO_BATCH_MAX_ITEMS)]
+    if len(groups) == 1:
+        return _run_entity_batch(qbo_creds, entity, groups[0])
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(ENTITY_LOOKUP_WORKERS, len(groups))) as executor:
+        for group_results in executor.map(lambda group: _run_entity_batch(qbo_creds, entity, group), groups):
+            results.update(group_results)
+    return results
+
 def _get_qbo_query_data_with_filter(event):
     try:
         logger.info(event)
         entity = event.get("query_object")
-        names = event.get("names")
+        names = event.get("names") or []
         qbo_creds = event.get("qbo_creds")
-        realm_id = qbo_creds.get("realm_id")
-        access_token = qbo_creds.get("access_token")
-        sandbox = qbo_creds.get("sandbox")
-        start_position = 1
-        max_results = 1000
         query_objects = {}
         st = time.time()
-        base_url = "sandbox-quickbooks.api.intuit.com" if sandbox == "true" else "quickbooks.api.intuit.com"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/json"
-        }
+        resolved = _resolve_entity_names(qbo_creds, entity, names)
         for name in names:
-            name_dict = {}
-            query = f"SELECT * FROM {entity} WHERE DisplayName LIKE '%{name}%'"
-            logger.info(query)
-            paginated_query = f"{query} STARTPOSITION {start_position} MAXRESULTS {max_results}"                
-            params = urllib.parse.urlencode({"query": paginated_query})
-            path = f"/v3/company/{realm_id}/query?{params}"
-            # Make the API call
-            conn = http.client.HTTPSConnection(base_url)
-            conn.request("GET", path, headers=headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            if response.status != 200:
-                print(f"Error fetching {name}: {data}")
-            else:
-                # Parse and handle the response
-                data = json.loads(data)
-                entity_response = data.get("QueryResponse", {}).get(entity, [])
-                logger.info(f"Entity_response for '{name}': {entity_response}")
-
-                if len(entity_response) > 0:
-                    if entity not in query_objects:
-                        query_objects[entity] = []
-                    for item in entity_response:
-                        name_dict = {
-                            "name": item.get("DisplayName"),
-                            "id": item.get("Id")
-                        }
-                        query_objects[entity].append(name_dict)
+            matches = resolved.get((name or "").strip())
+            logger.info(f"Entity_response for '{name}': {matches}")
+            if matches:
+                query_objects.setdefault(entity, []).extend(matches)
 
         total_time = time.time() - st
         # Return the matched entities and time taken
@@ -275,18 +550,23 @@ def _get_qbo_report_data(event):
         # Debugging output
         print(f"Request URL: https://{base_url}{path}")
         print(f"Headers: {headers}")
-        # Send GET request
-        conn = http.client.HTTPSConnection(base_url)
-        conn.request("GET", path, headers=headers)
-        res = conn.getresponse()
-        data = res.read()
-        write_data = json.loads(data.decode("utf-8"))
-        print(f"Response: {res.status} {res.reason}")
+        # Repeat questions and closed periods are served from the report cache without calling QBO
+        write_data, cache_key = _get_cached_report(realm_id, report_name, params_json)
+        params_output["report_cache"] = "hit" if write_data is not None else "miss"
+        if write_data is None:
+            status, data = _qbo_request(base_url, "GET", path, headers)
+            write_data = json.loads(data)
+            print(f"Response: {status}")
+            if status == 200 and "Fault" not in write_data:
+                _put_cached_report(realm_id, report_name, params_json, write_data)
+        logger.info(f"Report cache {params_output['report_cache']} for {report_name} ({cache_key}): {_get_report_cache_stats()}")
         map_index = event.get("map_index", 0)
         suffix = f"{map_index}"
         s3_key = f"{integration_id}/{execution_id}_{report_name}_{suffix}"
         s3_bucket = 'bez-dev'
-        _write_s3(s3_bucket, s3_key, json.dumps(write_data))
+        # Reports are stored flattened to the columnar table the prompts render from; error bodies as they came
+        table = _flatten_qbo_report(write_data)
+        _write_s3(s3_bucket, s3_key, json.dumps(table if table else write_data, separators=(",", ":")))
         params_output["s3_key"] = s3_key
         params_output["map_index"]=map_index
         return params_output
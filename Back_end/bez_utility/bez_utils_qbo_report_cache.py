@@ -0,0 +1,121 @@
+import json, os, gzip, hashlib, logging, threading, time, datetime
+
+# import from bez resources
+from bez_utility.bez_utils_aws import _read_s3_bytes, _write_s3
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# QBO report responses cached in S3, one gzipped object per (realm, report, canonical params):
+#   <prefix>/<realm_id>/<report_name>/<sha256 of the request>.json.gz
+# Reports whose period ended on or before the close date never expire; anything else (open
+# periods, relative date macros) is kept for REPORT_CACHE_OPEN_TTL_SECONDS.
+REPORT_CACHE_BUCKET = os.environ.get("QBO_REPORT_CACHE_BUCKET", "bez-dev")
+REPORT_CACHE_PREFIX = "qbo_report_cache"
+REPORT_CACHE_OPEN_TTL_SECONDS = int(os.environ.get("QBO_REPORT_CACHE_OPEN_TTL_SECONDS", "900"))
+# Books are treated as closed through QBO_REPORT_CLOSE_DATE (YYYY-MM-DD) when set, otherwise through
+# this many days ago
+REPORT_CLOSE_LAG_DAYS = int(os.environ.get("QBO_REPORT_CLOSE_LAG_DAYS", "45"))
+# Parameters that date the period a report covers
+PERIOD_END_PARAMS = ("end_date", "report_date", "end_duedate")
+
+# The cache is an optimisation only: a failed read counts as a miss and a failed write is skipped
+# (both counted in "errors"), and the report is fetched from QBO as usual.
+# Module level state survives between invocations of the same Lambda container
+_report_cache_stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "skipped_stores": 0, "errors": 0}
+_report_cache_lock = threading.Lock()
+
+
+def _canonical_report_params(params):
+    """Query params in a stable form: lower-case keys, trimmed values, empty values dropped, id lists sorted."""
+    canonical = {}
+    for key, value in (params or {}).items():
+        value = str(value).strip()
+        if not value:
+            continue
+        parts = [part.strip() for part in value.split(",")]
+        if len(parts) > 1 and all(part.isdigit() for part in parts):
+            value = ",".join(sorted(parts, key=int))
+        canonical[str(key).strip().lower()] = value
+    return dict(sorted(canonical.items()))
+
+
+def _report_cache_key(realm_id, report_name, params):
+    request = json.dumps({"realm_id": str(realm_id), "report": report_name, "params": params}, sort_keys=True)
+    return f"{REPORT_CACHE_PREFIX}/{realm_id}/{report_name}/{hashlib.sha256(request.encode('utf-8')).hexdigest()}.json.gz"
+
+
+def _report_close_date():
+    if os.environ.get("QBO_REPORT_CLOSE_DATE"):
+        return datetime.date.fromisoformat(os.environ["QBO_REPORT_CLOSE_DATE"])
+    return datetime.date.today() - datetime.timedelta(days=REPORT_CLOSE_LAG_DAYS)
+
+
+def _report_expires_at(params, now):
+    """None for a report over a closed period, otherwise when the cached copy goes stale."""
+    if "date_macro" not in params:
+        for key in PERIOD_END_PARAMS:
+            if key in params:
+                try:
+                    if datetime.date.fromisoformat(params[key]) <= _report_close_date():
+                        return None
+                except ValueError:
+                    pass
+                break
+    return int(now) + REPORT_CACHE_OPEN_TTL_SECONDS
+
+
+def _count(stat):
+    with _report_cache_lock:
+        _report_cache_stats[stat] += 1
+
+
+def _get_cached_report(realm_id, report_name, params):
+    """(report, cache_key); report is None on a miss, when the cached copy has expired or can't be read."""
+    params = _canonical_report_params(params)
+    key = _report_cache_key(realm_id, report_name, params)
+    try:
+        body = _read_s3_bytes(REPORT_CACHE_BUCKET, key, missing_ok=True)
+        entry = json.loads(gzip.decompress(body)) if body is not None else None
+        if entry is not None and "report" not in entry:
+            raise ValueError("cached entry has no report")
+    except Exception as e:
+        # Access, throttling or a corrupt object: go to QBO instead
+        logger.warning(f"Report cache read of {key} failed: {e}")
+        _count("errors")
+        entry = None
+    if entry is None:
+        _count("misses")
+        return None, key
+    if entry.get("expires_at") is not None and entry["expires_at"] <= time.time():
+        _count("expired")
+        _count("misses")
+        return None, key
+    _count("hits")
+    return entry["report"], key
+
+
+def _put_cached_report(realm_id, report_name, params, report):
+    params = _canonical_report_params(params)
+    now = time.time()
+    entry = {"realm_id": str(realm_id), "report_name": report_name, "params": params, "cached_at": int(now),
+             "expires_at": _report_expires_at(params, now), "report": report}
+    key = _report_cache_key(realm_id, report_name, params)
+    try:
+        _write_s3(REPORT_CACHE_BUCKET, key, gzip.compress(json.dumps(entry, separators=(",", ":")).encode("utf-8")))
+    except Exception as e:
+        logger.warning(f"Report cache write of {key} failed: {e}")
+        _count("errors")
+        _count("skipped_stores")
+        return None
+    _count("stores")
+    return key
+
+
+def _get_report_cache_stats():
+    with _report_cache_lock:
+        stats = dict(_report_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
@@ -0,0 +1,99 @@
+import json, logging
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# QBO reports (ProfitAndLoss, BalanceSheet, CashFlow, Aged*, TransactionList, ...) nest their rows as
+# Rows/Row/{Header, Rows, Summary, ColData}. They are stored flattened to one row per account line in
+# a columnar layout:
+#   labels[i]   first column of row i (account, customer, date, ...)
+#   parents[i]  index of the section row i sits under, -1 at the top
+#   kinds[i]    "s" section header, "d" data, "t" section total
+#   values[c]   the cells of data column c, one per row
+REPORT_FORMAT = "qbo-columnar"
+REPORT_FORMAT_VERSION = 1
+KIND_SECTION, KIND_DATA, KIND_TOTAL = "s", "d", "t"
+
+
+def _column_titles(columns, prefix=""):
+    """Leaf column titles; nested column groups (comparisons, by class, ...) become "group / title"."""
+    titles = []
+    for column in columns:
+        title = column.get("ColTitle", "") or column.get("ColType", "")
+        nested = column.get("Columns", {}).get("Column", [])
+        full_title = f"{prefix}{title}"
+        if nested:
+            titles.extend(_column_titles(nested, f"{full_title} / " if title else prefix))
+        else:
+            titles.append(full_title)
+    return titles
+
+
+def _flatten_qbo_report(report):
+    """Columnar table of a QBO report response; None when it has no report rows (a Fault, for one)."""
+    if not isinstance(report, dict) or "Header" not in report or "Fault" in report:
+        return None
+    header = report["Header"]
+    titles = _column_titles(report.get("Columns", {}).get("Column", []))
+    columns = titles[1:]
+    table = {"format": REPORT_FORMAT, "version": REPORT_FORMAT_VERSION, "report": header.get("ReportName", ""),
+             "start": header.get("StartPeriod", ""), "end": header.get("EndPeriod", ""),
+             "basis": header.get("ReportBasis", ""), "currency": header.get("Currency", ""),
+             "label": (titles[0] if titles else "") or "Account", "columns": columns,
+             "labels": [], "parents": [], "kinds": [], "values": [[] for _ in columns]}
+
+    def _add(parent, kind, col_data):
+        cells = [cell.get("value", "") for cell in col_data]
+        cells += [""] * (len(columns) + 1 - len(cells))
+        table["labels"].append(cells[0])
+        table["parents"].append(parent)
+        table["kinds"].append(kind)
+        for index, value in enumerate(cells[1:len(columns) + 1]):
+            table["values"][index].append(value)
+        return len(table["labels"]) - 1
+
+    def _walk(rows, parent):
+        for row in rows:
+            if "ColData" in row:
+                _add(parent, KIND_DATA, row["ColData"])
+                continue
+            section = _add(parent, KIND_SECTION, row["Header"]["ColData"]) if "Header" in row else parent
+            _walk(row.get("Rows", {}).get("Row", []), section)
+            if "Summary" in row:
+                _add(parent, KIND_TOTAL, row["Summary"]["ColData"])
+
+    _walk(report.get("Rows", {}).get("Row", []), -1)
+    return table
+
+
+def _render_report_tsv(table):
+    """Dense tab separated text for prompts: one title line, one header line, one line per row.
+
+    Rows are indented two spaces per section level instead of repeating the account path, empty
+    trailing cells are dropped and section headers without values carry just their label.
+    """
+    period = f"{table['start']}..{table['end']}" if table.get("start") or table.get("end") else ""
+    title = " ".join(part for part in [table["report"], period, table.get("basis", ""), table.get("currency", "")] if part)
+    lines = [f"# {title}", "\t".join([table["label"]] + table["columns"])]
+    depths = []
+    for index, label in enumerate(table["labels"]):
+        parent = table["parents"][index]
+        depth = 0 if parent == -1 else depths[parent] + 1
+        depths.append(depth)
+        cells = [values[index] for values in table["values"]]
+        lines.append("\t".join(["  " * depth + label] + cells).rstrip("\t"))
+    return "\n".join(lines)
+
+
+def _report_prompt_text(stored):
+    """Prompt form of a report read from S3: columnar tables and raw QBO responses are rendered as TSV,
+    anything else (error bodies) is passed through unchanged."""
+    try:
+        data = json.loads(stored)
+    except (TypeError, ValueError):
+        return stored
+    if isinstance(data, dict) and data.get("format") == REPORT_FORMAT:
+        return _render_report_tsv(data)
+    table = _flatten_qbo_report(data)
+    return _render_report_tsv(table) if table else stored
@@ -2,7 +2,8 @@ import json, logging
 
 # import from bez resources
 from bez_utility.bez_utils_aws import _read_s3, _write_s3
-from bez_utility.bez_utils_bedrock import _get_ai_response
+from bez_utility.bez_utils_bedrock import _get_ai_response_with_usage
+from bez_utility.bez_metadata_messages import _update_msg_answer
 
 # Configure logging
 logger = logging.getLogger()
@@ -25,11 +26,16 @@ def _wf_final_mda_report(event):
         # logger.info(full_response)
         prompt = _read_s3(s3_bucket, s3_key)
         prompt += f"The report created by your team is as follows: {full_response}"
-        edited_response = {"Answer": _get_ai_response({"prompt": prompt})}
+        report_text, usage = _get_ai_response_with_usage({"prompt": prompt})
+        edited_response = {"Answer": report_text.strip()}
         logger.info(full_response==edited_response)
         message_id= event.get("message_id")
         report_S3_key =f"{integration_id}/{agent_int_uid}/chat_history/{message_id}"
         _write_s3(BUCKET_NAME, report_S3_key, json.dumps(edited_response))
+        if message_id:
+            # A long report's answer points at the object above instead of being stored again
+            _update_msg_answer(message_id, json.dumps(edited_response), usage,
+                               stored={"bucket": BUCKET_NAME, "key": report_S3_key, "json_field": "Answer"})
         return report_S3_key
     except Exception as e:
         raise Exception(f"Workflow Error: {str(e)}")
\ No newline at end of file
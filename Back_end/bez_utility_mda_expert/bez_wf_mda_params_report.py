@@ -2,7 +2,7 @@ import json, logging, datetime
 from dateutil.relativedelta import relativedelta
 
 # import from bez resources
-from bez_utility.bez_utils_aws import _get_record_from_table
+from bez_utility.bez_utils_aws import _iter_records_from_table
 
 # Configure logging
 logger = logging.getLogger()
@@ -53,8 +53,7 @@ def _wf_mda_params_report(event):
             "keys": {"agent_int_uid": agent_int_uid},
             "gsi_name": "agent_int_uid-index"
         }
-        records = _get_record_from_table(data)
-        print(f"Records:{records}")
+        records = _iter_records_from_table(data)
 
         sections = []
         reports = []
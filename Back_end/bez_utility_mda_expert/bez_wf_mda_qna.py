@@ -1,17 +1,16 @@
-import json, logging, boto3
+import json, logging
 
 # import from bez resources
 from bez_utility.bez_utils_aws import _read_s3, _write_s3,_get_files_s3
-from bez_utility.bez_utils_bedrock import _get_ai_response
+from bez_utility.bez_utils_bedrock import _get_ai_response_with_usage
+from bez_utility.bez_metadata_messages import _update_msg_output
+from bez_utility.bez_utils_qbo_report_format import _report_prompt_text
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 BUCKET_NAME = "bez-dev"
 
-dynamodb = boto3.resource('dynamodb')
-message_table = dynamodb.Table('message_details')
-
 
 system_instruction_template = """
     You are a Financial Analyst with a deep understanding of Financial KPIs.
@@ -41,20 +40,16 @@ def _wf_mda_qna(event):
         prompt = ""
         for object in objects:
             print(prompt)
-            data = _read_s3(bucket_name, object)
+            data = _report_prompt_text(_read_s3(bucket_name, object))
             report_name = str(object).split('.')[0]
             prompt += f"""This is the report name: {report_name}
             Here is the data:
             {data}"""
         full_prompt = f"{system_instruction_template} {prompt}, here is the user's question {user_prompt}"
-        response_text = _get_ai_response({"prompt": full_prompt})
+        response_text, usage = _get_ai_response_with_usage({"prompt": full_prompt})
 
         if message_id:
-            message_table.update_item(
-                Key={"message_id": message_id},
-                UpdateExpression="SET ai_response = :resp",
-                ExpressionAttributeValues={":resp": json.dumps(response_text)}
-            )
+            _update_msg_output(message_id, json.dumps(response_text), usage)
 
         return {
             "statusCode": 200,
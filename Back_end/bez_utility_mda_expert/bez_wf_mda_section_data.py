@@ -3,6 +3,7 @@ import json, logging
 # import from bez resources
 from bez_utility.bez_utils_aws import _read_s3, _write_s3
 from bez_utility.bez_utils_bedrock import _get_ai_response
+from bez_utility.bez_utils_qbo_report_format import _report_prompt_text
 
 # Configure logging
 logger = logging.getLogger()
@@ -31,8 +32,8 @@ def _wf_mda_section_data(event):
             for report in report_data:
                 if report.get("map_index") == section_report["report_id"]:
                     section_report['s3_key'] = report['s3_key']
-                    report_s3_data = _read_s3(BUCKET_NAME, section_report['s3_key'])
-                    prompt += f"Report data: {report_s3_data}"
+                    report_s3_data = _report_prompt_text(_read_s3(BUCKET_NAME, section_report['s3_key']))
+                    prompt += f"Report data:\n{report_s3_data}\n"
         prompt += (f"\n\nProvide your analysis in Markdown format, but start with Heading Level 2 since Heading Level 1 uses text that is too large. "
                    f"In addition to sentences, please use tables and bullets points where it makes sense.  "
                    f"Do not insert 'Management Discussion & Analysis (MD&A)' as a section header.")
@@ -2,6 +2,7 @@ import json
 import logging, time
 from bez_utility.bez_utils_bedrock import _get_ai_response
 from bez_utility.bez_utils_aws import _get_files_s3, _read_s3
+from bez_utility.bez_utils_qbo_report_format import _report_prompt_text
 from bez_utility.bez_metadata_agents import _get_details_for_agentintuid
 
 # Set up logging
@@ -41,7 +42,7 @@ def _wf_qbo_expert_summarize(event):
         all_data = []
         for object in objects:
             data = _read_s3(bucket_name, object)
-            all_data.append(data)
+            all_data.append(_report_prompt_text(data))
         dt3 = time.time() - st1 - dt2
         logger.info(f"Time to read s3: {dt3}")
         if not user_prompt:
@@ -49,7 +50,7 @@ def _wf_qbo_expert_summarize(event):
                 "statusCode": 400,
                 "body": json.dumps({"error": "User prompt is a required field."})
             }
-        system_instruction = system_instruction_template.format(content=all_data)
+        system_instruction = system_instruction_template.format(content="\n\n".join(all_data))
         full_prompt = f"{user_prompt} {system_instruction}"
         dt4 = time.time() - st1 - dt2 - dt3
         logger.info(f"Time to read prompt: {dt4}")
@@ -0,0 +1,185 @@
+"""Run every API route of the Lambdas against the in-memory AWS backend and report latency and round trips.
+
+Usage:
+    python local_bench.py [--iterations N] [--messages N] [--latency-ms MS] [--lambdas Bez-Agent-Common ...] [--json]
+
+Routes that reach services outside the stand-in (Bedrock, Step Functions, Auth0, QuickBooks) report the
+error they hit; the DynamoDB/S3/Secrets Manager calls made before that point are still counted.
+"""
+import argparse, importlib.util, json, os, socket, statistics, sys, time
+
+# The backend is chosen when modules are imported, so this has to happen first
+os.environ["BEZ_AWS_BACKEND"] = "memory"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from bez_utility.bez_utils_backend import _get_memory_aws
+
+LAMBDAS = ["Bez-Agent-Common", "Bez-Agent-Setup", "Bez-Agent-MDAExpert", "Bez-OfficeNinja", "Bez-Skill-Auth0"]
+
+USER_ID = "1700000000000100001"
+SESSION_ID = "1700000000000200001"
+CLIENT_ID = "1700000000000300001"
+INT_ID = "1700000000000400001"
+AGENT_ID = "001"
+AGENT_INT_UID = f"{AGENT_ID}-{INT_ID}-1700000000000500001"
+CHAT_ID = "1700000000000600001"
+BUCKET = "bez"
+
+# Parameters every route may look for; each handler picks the ones it needs
+COMMON_PARAMS = {
+    "agent_int_uid": AGENT_INT_UID, "agent_id": AGENT_ID, "chat_id": CHAT_ID, "client_id": CLIENT_ID,
+    "int_id": INT_ID, "integration_id": INT_ID, "erp": "quickbooks", "source_name": "qbo", "llm_id": "llm-1"
+}
+ROUTE_OVERRIDES = {
+    "/star_msg": {"body": {"is_starred": "true"}},
+    "/mda_expert": {"body": {"reporting_date": "2024-06"}},
+    "/secure_chat": {"body": {"user_prompt": "Summarize the last quarter"}},
+    "/create_client": {"body": {"client_name": "Bench Client"}},
+    "/create_int": {"body": {"integration_name": "Bench", "erp_name": "quickbooks"}},
+    "/save_agent_profile": {"body": {"agent_name": "Ada", "agent_age": "30", "agent_gender": "female"}}
+}
+
+
+def _seed(messages):
+    now = int(time.time())
+    message_items = [{"message_id": f"{CHAT_ID}{i:06d}", "chat_id": CHAT_ID, "agent_int_uid": AGENT_INT_UID,
+                      "created_at": str(now - messages + i), "updated_at": str((now - messages + i) * 1000), "ttl": now + 86400, "summarized": False,
+                      "root_chat_id": CHAT_ID, "user_input": f"question {i}", "ai_response": json.dumps({"answer": f"answer {i}"}),
+                      "status": "completed", "is_starred": "true" if i % 10 == 0 else "false"}
+                     for i in range(messages)]
+    for item in message_items[::10]:
+        item["starred_owner"] = f"{USER_ID}#{AGENT_INT_UID}"
+    _get_memory_aws().seed(tables={
+        "users": [{"user_id": USER_ID, "email": "bench@example.com", "first_name": "Bench", "last_name": "User",
+                   "is_deleted": False, "is_super_admin": False, "email_verified": True, "created_at": str(now)}],
+        "sessions": [{"session_id": SESSION_ID, "user_id": USER_ID, "created_at": str(now)}],
+        "clients": [{"client_id": CLIENT_ID, "client_name": "Bench", "client_name_lower": "bench",
+                     "client_short_name": "bench", "created_by": USER_ID}],
+        "client_privileges": [{"client_privilege_id": f"{CLIENT_ID}-{USER_ID}", "client_id": CLIENT_ID,
+                               "user_id": USER_ID, "is_owner": True, "is_active": True, "is_deleted": False}],
+        "integrations": [{"integration_id": INT_ID, "client_id": CLIENT_ID, "erp_name": "quickbooks",
+                          "integration_name": "Bench QBO", "created_by": USER_ID}],
+        "int_privileges": [{"int_privilege_id": f"{INT_ID}-{CLIENT_ID}-{USER_ID}", "integration_id": INT_ID,
+                            "client_id": CLIENT_ID, "user_id": USER_ID, "is_owner": True, "is_active": True,
+                            "is_deleted": False}],
+        "agent_list": [{"agent_id": AGENT_ID, "agent_name": "MD&A Expert", "agent_status": "active",
+                        "agent_type": "mda", "welcome_prompt": "Hello", "skillset": "mda"},
+                       {"agent_id": "admin", "agent_name": "Admin", "agent_status": "inactive",
+                        "welcome_prompt": "Welcome"}],
+        "agent_list_by_int": [{"agent_int_uid": AGENT_INT_UID, "agent_name": "Ada", "agent_type": "mda",
+                               "int_id": INT_ID, "skillset": "mda", "welcome_prompt": "Hello",
+                               "profile_pic": "profile.png"}],
+        "agent_privileges": [{"agent_privilege_id": "1700000000000700001", "agent_int_uid": AGENT_INT_UID,
+                              "user_id": USER_ID, "agent_persona": "", "llm_id": "llm-1", "is_active": True, "is_deleted": False,
+                              "is_owner": True}],
+        "agent_workflow_mapping": [{"agent_id": AGENT_ID, "workflow_id": "1", "workflow_name": "_wf_mda_params_report"}],
+        "mda_section_report_map_default": [{"section_id": "1", "section_order": 1, "instruction": "Summarize",
+                                            "report_data": ["ProfitAndLoss"], "section_title": "Overview"}],
+        "agent_mda_section_report_map": [{"agent_int_uid_secid": f"{AGENT_INT_UID}-1", "agent_int_uid": AGENT_INT_UID,
+                                          "section_order": 1, "instruction": "Summarize",
+                                          "report_data": ["ProfitAndLoss"], "section_title": "Overview"}],
+        "report_source": [{"source_name": "qbo", "source_report_params": ["ProfitAndLoss", "BalanceSheet"]}],
+        "list_of_llm": [{"llm_id": "llm-1", "llm_name": "Bench LLM", "model_id": "bench"}],
+        "chat_details": [{"chat_id": CHAT_ID, "agent_int_uid": AGENT_INT_UID, "session_id": SESSION_ID,
+                          "user_id": USER_ID, "user_agent": f"{USER_ID}#{AGENT_INT_UID}",
+                          "created_at": str(now - messages), "ttl": now + 86400, "summarized": False,
+                          "hist_chat_id": "", "chat_theme": "Bench chat"}],
+        "message_details": message_items
+    }, objects={(BUCKET, f"{INT_ID}/{AGENT_INT_UID}/chat_history/{item['message_id']}"): item["ai_response"]
+                for item in message_items})
+    return message_items[-1]["message_id"] if message_items else ""
+
+
+def _load_lambda(folder):
+    spec = importlib.util.spec_from_file_location(folder.replace("-", "_"), os.path.join(BASE_DIR, folder, "lambda_function.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _routes(module):
+    route_map = getattr(module, "ROUTE_MAP", None) or getattr(module, "PATH_MAP", None) or {}
+    for path, methods in route_map.items():
+        for method, handler in methods.items():
+            # Auth0 nests several handlers under one method, picked by the "func" query parameter
+            funcs = handler.keys() if isinstance(handler, dict) else [None]
+            for func in funcs:
+                yield path, method, func
+
+
+def _event(path, method, func, message_id):
+    params = dict(COMMON_PARAMS, message_id=message_id)
+    override = ROUTE_OVERRIDES.get(path, {})
+    query = dict(params, **override.get("query", {}))
+    if func:
+        query["func"] = func
+    body = dict(params, **override.get("body", {}))
+    return {"resource": path, "httpMethod": method, "queryStringParameters": query, "body": json.dumps(body),
+            "requestContext": {"authorizer": {"user_id": USER_ID, "session_id": SESSION_ID}}}
+
+
+def _run_route(module, path, method, func, message_id, iterations):
+    memory_aws = _get_memory_aws()
+    latencies, round_trips, statuses = [], [], set()
+    snapshot = {}
+    for _ in range(iterations):
+        memory_aws.stats.reset()
+        started = time.perf_counter()
+        try:
+            response = module.lambda_handler(_event(path, method, func, message_id), None)
+            statuses.add(str(response.get("statusCode", "-")))
+        except Exception as e:
+            statuses.add(type(e).__name__)
+        latencies.append((time.perf_counter() - started) * 1000)
+        snapshot = memory_aws.stats.snapshot()
+        round_trips.append(snapshot["round_trips"])
+    latencies.sort()
+    return {"route": f"{method} {path}" + (f"?func={func}" if func else ""),
+            "status": ",".join(sorted(statuses)),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+            "round_trips": max(round_trips),
+            "calls": {key: value for key, value in snapshot.get("calls", {}).items() if ":" not in key}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=50, help="messages seeded into the bench chat")
+    parser.add_argument("--latency-ms", type=float, default=None, help="simulated per call latency")
+    parser.add_argument("--lambdas", nargs="*", default=LAMBDAS)
+    parser.add_argument("--json", action="store_true", help="print machine readable results")
+    args = parser.parse_args()
+
+    # Anything that tries to reach the network should fail fast rather than hang the run
+    socket.setdefaulttimeout(2)
+    memory_aws = _get_memory_aws()
+    if args.latency_ms is not None:
+        memory_aws.latency.base_ms = args.latency_ms
+    message_id = _seed(args.messages)
+    if not args.json:
+        import logging
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    for folder in args.lambdas:
+        module = _load_lambda(folder)
+        for path, method, func in _routes(module):
+            result = _run_route(module, path, method, func, message_id, args.iterations)
+            result["lambda"] = folder
+            results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'lambda':<20} {'route':<45} {'status':<12} {'p50 ms':>8} {'p95 ms':>8} {'round trips':>12}")
+    for result in results:
+        print(f"{result['lambda']:<20} {result['route']:<45} {result['status']:<12} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['round_trips']:>12}")
+
+
+if __name__ == "__main__":
+    main()
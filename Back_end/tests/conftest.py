@@ -0,0 +1,23 @@
+import os, sys
+
+import pytest
+
+# Modules build their AWS handles at import time, so the in-memory backend has to be chosen first
+os.environ["BEZ_AWS_BACKEND"] = "memory"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_EC2_METADATA_DISABLED", "true")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bez_utility.bez_utils_backend import _get_memory_aws
+
+
+@pytest.fixture
+def memory_aws():
+    """The in-memory AWS backend, emptied before the test."""
+    aws = _get_memory_aws()
+    with aws.lock:
+        for table in aws.dynamodb._tables.values():
+            table._items.clear()
+        aws.s3._objects.clear()
+    aws.stats.reset()
+    return aws
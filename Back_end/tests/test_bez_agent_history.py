@@ -0,0 +1,57 @@
+import json
+
+import local_bench as lb
+from bez_agent_modules.bez_agent_history import ARCHIVE_TOKEN_PREFIX, _archived_page, _retrieve_chat
+from bez_utility.bez_metadata_archive import _write_manifest, _write_segment
+
+ARCHIVED_CHAT_ID = "1700000000000600099"
+
+
+def _messages(count):
+    return [{"message_id": f"{ARCHIVED_CHAT_ID}{i:03d}", "chat_id": ARCHIVED_CHAT_ID,
+             "created_at": str(1700000000 + i // 2), "user_input": f"q{i}"} for i in range(count)]
+
+
+def _boundary(token):
+    created_at, message_id = token[len(ARCHIVE_TOKEN_PREFIX):].split(".", 1)
+    return int(created_at), message_id
+
+
+def test_archived_page_token_continues_without_gaps():
+    messages = _messages(11)
+    pages, boundary = [], None
+    while True:
+        page, token = _archived_page(messages, None, None, 3, boundary)
+        pages = page + pages
+        if not token:
+            break
+        boundary = _boundary(token)
+    assert pages == messages
+
+
+def test_archived_page_without_limit_returns_the_window():
+    page, token = _archived_page(_messages(11), 1700000004, 1700000001, None)
+    assert [msg["created_at"] for msg in page] == ["1700000002"] * 2 + ["1700000003"] * 2
+    assert token is None
+
+
+def test_retrieve_chat_pages_through_an_archived_chat(memory_aws):
+    lb._seed(1)
+    chat = {"chat_id": ARCHIVED_CHAT_ID, "agent_int_uid": lb.AGENT_INT_UID, "user_id": lb.USER_ID,
+            "created_at": "1700000000", "chat_theme": "archived"}
+    messages = _messages(9)
+    _write_manifest(lb.USER_ID, lb.AGENT_INT_UID, {"version": 1, "segments": [
+        _write_segment(lb.USER_ID, lb.AGENT_INT_UID, [chat], {ARCHIVED_CHAT_ID: messages})]})
+    received, token = [], None
+    while True:
+        event = lb._event("/retrieve_chat", "GET", None, "")
+        event["queryStringParameters"].pop("message_id")
+        event["queryStringParameters"].update(chat_id=ARCHIVED_CHAT_ID, limit="4", **({"next_token": token} if token else {}))
+        response = _retrieve_chat(event)
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        received = body["data"] + received
+        token = body["next_token"]
+        if not token:
+            break
+    assert [msg["message_id"] for msg in received] == [msg["message_id"] for msg in messages]
@@ -0,0 +1,24 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bez_utility.bez_answer_format import _normalize_answer
+
+
+def test_example_fence_inside_answer_is_kept():
+    text = 'Here is how errors look:\n```json\n{"error": "bad"}\n```\nand more text'
+    result = _normalize_answer(text)
+    assert result["answer"] == text
+    assert result["valid"] is True
+
+
+def test_whole_text_fence_is_unwrapped():
+    result = _normalize_answer('```json\n{"Answer": "### Revenue\\nUp 4%"}\n```')
+    assert result["answer"] == "### Revenue\nUp 4%"
+    assert result["valid"] is True
+
+
+def test_non_numeric_status_code_is_invalid():
+    result = _normalize_answer({"statusCode": "OK", "body": "x"})
+    assert result["answer"] == "x"
+    assert result["valid"] is False
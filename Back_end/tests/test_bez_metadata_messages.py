@@ -0,0 +1,78 @@
+from bez_utility.bez_metadata_messages import (DELTA_FIELDS, DELTA_OVERLAP_MS, _decode_watermark, _encode_watermark,
+                                               _get_conversation_delta, _get_conversation_page, _iter_conversation_messages)
+
+WATERMARK = 1700000000000
+
+
+def _message(message_id, chat_id, created_at, updated_at, root_chat_id="R1"):
+    return {"message_id": message_id, "chat_id": chat_id, "root_chat_id": root_chat_id,
+            "created_at": str(created_at), "updated_at": str(updated_at), "user_input": f"q {message_id}"}
+
+
+def _ids(delta):
+    return [row[DELTA_FIELDS.index("message_id")] for row in delta["rows"]]
+
+
+def test_truncated_delta_resumes_without_gaps_or_repeats(memory_aws):
+    memory_aws.seed(tables={"message_details": [
+        _message(f"m{i}", "R1", 1700000001, WATERMARK + 100 * (i + 1)) for i in range(5)]})
+    chat = {"chat_id": "R1"}
+    token, seen = _encode_watermark(WATERMARK, []), []
+    first = _get_conversation_delta(chat, token, max_items=2)
+    assert first["has_more"] and _ids(first) == ["m0", "m1"]
+    delta = first
+    while delta["has_more"]:
+        seen += _ids(delta)
+        delta = _get_conversation_delta(chat, delta["watermark"], max_items=2)
+    seen += _ids(delta)
+    assert seen == [f"m{i}" for i in range(5)]
+
+
+def test_delta_skips_duplicates_within_the_overlap(memory_aws):
+    memory_aws.seed(tables={"message_details": [_message("m1", "R1", 1700000001, WATERMARK + 10)]})
+    chat = {"chat_id": "R1"}
+    first = _get_conversation_delta(chat, _encode_watermark(WATERMARK, []))
+    assert _ids(first) == ["m1"]
+    # Still inside the overlap window of the new watermark, but already delivered
+    assert _get_conversation_delta(chat, first["watermark"])["rows"] == []
+    # A later write to the same message is delivered again
+    memory_aws.dynamodb.Table("message_details").update_item(
+        Key={"message_id": "m1"}, UpdateExpression="SET updated_at = :u",
+        ExpressionAttributeValues={":u": str(WATERMARK + 20)})
+    assert _ids(_get_conversation_delta(chat, first["watermark"])) == ["m1"]
+
+
+def test_delta_prunes_delivered_pairs_older_than_the_overlap(memory_aws):
+    later = WATERMARK + DELTA_OVERLAP_MS + 500
+    memory_aws.seed(tables={"message_details": [_message("m1", "R1", 1700000001, WATERMARK + 10),
+                                                _message("m2", "R1", 1700000003, later)]})
+    delta = _get_conversation_delta({"chat_id": "R1"}, _encode_watermark(WATERMARK, []))
+    watermark, delivered = _decode_watermark(delta["watermark"])
+    assert watermark == later
+    assert delivered == {f"m2:{later}"}
+
+
+def _lineage_fixture(memory_aws):
+    # R1 (the root) was restored as C2 at 1700000010; R1 then carried on in its own branch
+    memory_aws.seed(tables={"message_details": [
+        _message("a1", "R1", 1700000005, WATERMARK + 1),
+        _message("a2", "R1", 1700000010, WATERMARK + 2),
+        _message("a3", "R1", 1700000020, WATERMARK + 3),
+        _message("c1", "C2", 1700000015, WATERMARK + 4),
+        _message("c2", "C2", 1700000025, WATERMARK + 5)]})
+    return {"chat_id": "C2", "root_chat_id": "R1", "lineage": [{"chat_id": "R1", "until": "1700000010"}]}
+
+
+def test_lineage_filter_drops_the_other_branch(memory_aws):
+    chat = _lineage_fixture(memory_aws)
+    assert [msg["message_id"] for msg in _iter_conversation_messages(chat)] == ["a1", "a2", "c1", "c2"]
+    pages, token = [], None
+    while True:
+        page = _get_conversation_page(chat, 1, token)
+        pages = page["items"] + pages
+        token = page["next_token"]
+        if not token:
+            break
+    assert [msg["message_id"] for msg in pages] == ["a1", "a2", "c1", "c2"]
+    delta = _get_conversation_delta(chat, _encode_watermark(WATERMARK - DELTA_OVERLAP_MS, []))
+    assert sorted(_ids(delta)) == ["a1", "a2", "c1", "c2"]
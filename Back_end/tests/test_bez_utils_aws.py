@@ -0,0 +1,76 @@
+import pytest
+
+from bez_utility.bez_utils_aws import _time_window, _empty_window, _query_dynamodb_page
+
+
+def test_time_window_bounds_are_exclusive():
+    assert _time_window() is None
+    assert _time_window(before=1700000010) == ("lt", "1700000010")
+    assert _time_window(after=1700000010) == ("gt", "1700000010")
+    assert _time_window(before=1700000020, after=1700000010) == ("between", ("1700000011", "1700000019"))
+
+
+def test_empty_window():
+    assert _empty_window(before=1700000011, after=1700000010)
+    assert _empty_window(before=1700000005, after=1700000010)
+    assert not _empty_window(before=1700000012, after=1700000010)
+    assert not _empty_window(before=1700000012)
+    assert not _empty_window(after=1700000010)
+
+
+def _seed_messages(memory_aws, count):
+    memory_aws.seed(tables={"message_details": [
+        {"message_id": f"m{i:03d}", "chat_id": "C1", "created_at": str(1700000000 + i), "user_input": f"q{i}"}
+        for i in range(count)]})
+
+
+def _filtered_query(**extra):
+    return dict({"table_name": "message_details", "gsi_name": "chat_id-created_at-index",
+                 "query_params": {"chat_id": "C1"}, "cursor_keys": ["message_id", "chat_id", "created_at"],
+                 "item_filter": lambda msg: int(msg["created_at"]) % 7 == 0}, **extra)
+
+
+def _read_all(query, limit):
+    items, token, pages = [], None, 0
+    while True:
+        page = _query_dynamodb_page(dict(query, limit=limit, next_token=token))
+        items += page["items"]
+        pages += 1
+        token = page["next_token"]
+        if not token:
+            return items, pages
+
+
+def test_filtered_page_resumes_after_last_kept_item(memory_aws):
+    _seed_messages(memory_aws, 600)
+    expected = [f"m{i:03d}" for i in range(600) if (1700000000 + i) % 7 == 0]
+    items, pages = _read_all(_filtered_query(), 10)
+    assert [item["message_id"] for item in items] == expected
+    assert pages == -(-len(expected) // 10)
+
+
+def test_filtered_page_reads_full_pages(memory_aws):
+    _seed_messages(memory_aws, 600)
+    page = _query_dynamodb_page(dict(_filtered_query(), limit=10))
+    assert len(page["items"]) == 10
+    assert memory_aws.stats.snapshot()["calls"]["dynamodb.Query"] == 1
+
+
+def test_filtered_page_ending_on_last_item_has_no_token(memory_aws):
+    _seed_messages(memory_aws, 600)
+    # The last message (created_at 1700000599) is the only one kept
+    query = _filtered_query(item_filter=lambda msg: msg["message_id"] == "m599")
+    page = _query_dynamodb_page(dict(query, limit=1))
+    assert [item["message_id"] for item in page["items"]] == ["m599"]
+    assert page["next_token"] is None
+
+
+def test_filtered_page_drops_cursor_keys_outside_projection(memory_aws):
+    _seed_messages(memory_aws, 50)
+    items, _ = _read_all(_filtered_query(projection=["message_id", "user_input"]), 2)
+    assert items and all(set(item) == {"message_id", "user_input"} for item in items)
+
+
+def test_filtered_page_needs_cursor_keys(memory_aws):
+    with pytest.raises(ValueError):
+        _query_dynamodb_page(dict(_filtered_query(), cursor_keys=None, limit=5))